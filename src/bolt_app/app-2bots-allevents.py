@@ -1,12 +1,13 @@
 import os
 import requests
 import pandas as pd
+import time
 import threading
 from slack_sdk import WebClient
 from slack_sdk.socket_mode import SocketModeClient
-from slack_sdk.socket_mode.request import SocketModeRequest
-from slack_sdk.socket_mode.response import SocketModeResponse
 from dotenv import load_dotenv
+import interactive
+import shutdown
 
 # Load environment variables
 load_dotenv()
@@ -27,13 +28,14 @@ bot_configs = pd.DataFrame([
     }
 ])
 
-def process_events(client: SocketModeClient, req: SocketModeRequest, ping_url: str):
-    # Acknowledge the request
-    response = SocketModeResponse(envelope_id=req.envelope_id)
-    client.send_socket_mode_response(response)
+# On SIGTERM every bot stops acking (Slack redelivers elsewhere), running work gets
+# SHUTDOWN_DEADLINE_SECONDS to finish, and queued work is spooled for the next instance
+coordinator = shutdown.from_env("app-2bots-allevents")
+dispatchers = {}  # bot name -> interactive.Dispatcher
 
-    # Extract the message from the payload
-    event = req.payload.get("event", {})
+def process_events(payload: dict, ping_url: str):
+    # Extract the message from the payload (already acked by the dispatcher)
+    event = payload.get("event", {})
     message_text = event.get("text", "")
 
     data = {
@@ -68,10 +70,12 @@ def start_bot(bot_name, bot_token, app_token, ping_url):
         web_client=client
     )
 
-    # Add a listener for events
-    socket_mode_client.socket_mode_request_listeners.append(
-        lambda client, req: process_events(client, req, ping_url)
-    )
+    # Acks every request type at once, then runs events, slash commands, block actions,
+    # shortcuts and modal submissions on separate pools (results go to response_url)
+    dispatcher = interactive.from_env(bot_name, ping_url, client, lambda payload: process_events(payload, ping_url))
+    socket_mode_client.socket_mode_request_listeners.append(dispatcher.handle)
+    dispatchers[bot_name] = dispatcher
+    coordinator.add_handler(socket_mode_client)
 
     print(f"Info: Starting {bot_name} in Socket Mode!")
     socket_mode_client.connect()
@@ -84,4 +88,23 @@ if __name__ == "__main__":
         thread.start()
 
     for thread in threads:
-        thread.join()
\ No newline at end of file
+        thread.join()
+
+    def drain(timeout):
+        # Every bot stops acking before any of them waits
+        end = time.monotonic() + timeout
+        unstarted = [entry for dispatcher in dispatchers.values() for entry in dispatcher.stop()]
+        for dispatcher in dispatchers.values():
+            dispatcher.wait(max(0.0, end - time.monotonic()))
+        return unstarted
+
+    def replay(entry):
+        dispatchers[entry["bot"]].replay(entry)
+
+    # Requests a previous instance had queued but not started when it was stopped
+    threading.Thread(
+        target=shutdown.replay_spool, args=(coordinator.spool_dir, coordinator.name, replay), name="spool-replay", daemon=True
+    ).start()
+    coordinator.add_drain("requests", drain)
+    coordinator.install()
+    coordinator.wait()  # Blocks until SIGTERM/SIGINT and the drain that follows
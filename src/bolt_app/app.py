@@ -1,9 +1,18 @@
 import os
+import json
+import asyncio
 import logging
-import requests
+import threading
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
 import openai
 from dotenv import load_dotenv
 from slack_bolt import App
+from geocoding import get_geocoder
+from weather import get_weather_client
+import async_runtime
+import intent_classifier
+from completion_cache import get_completion_cache, cache_key
 
 # Load environment variables
 load_dotenv()
@@ -28,58 +37,68 @@ app = App(
 
 # Initialize OpenAI client
 client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+async_client = openai.AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+SPECULATIVE_CHAT = os.environ.get("SPECULATIVE_CHAT", "false").lower() == "true"
+# Stream chat answers into Slack, editing one message at most every STREAM_UPDATE_INTERVAL seconds
+# (chat.update is a Tier 3 method, so ~1 edit/second per message stays well inside the limit)
+STREAM_REPLIES = os.environ.get("STREAM_REPLIES", "false").lower() == "true"
+STREAM_UPDATE_INTERVAL = float(os.environ.get("STREAM_UPDATE_INTERVAL", 1.0))
+
+# Multi-location weather questions are looked up concurrently, at most WEATHER_FANOUT_LIMIT
+# at a time; Nominatim and NWS politeness limits still apply (geocoding.py, weather.py)
+WEATHER_FANOUT_LIMIT = int(os.environ.get("WEATHER_FANOUT_LIMIT", 4))
+WEATHER_MAX_LOCATIONS = int(os.environ.get("WEATHER_MAX_LOCATIONS", 10))
+weather_pool = ThreadPoolExecutor(max_workers=WEATHER_FANOUT_LIMIT, thread_name_prefix="weather")
 
 # Function to get weather data from api.weather.gov
-def get_weather(latitude, longitude):
-    logging.info(f"Fetching weather for coordinates: Lat {latitude}, Lon {longitude}")
-    points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
-    
+# Grid lookups and forecasts are cached per NWS caching headers (see weather.py),
+# and the period matching `time` ("tonight", "tomorrow", ...) is picked from the cached forecast
+def get_weather(latitude, longitude, time=None):
+    logging.info(f"Fetching weather for coordinates: Lat {latitude}, Lon {longitude}, time: {time}")
     try:
-        logging.info(f"Making request to: {points_url}")
-        response = requests.get(points_url)
-        logging.info(f"NWS points response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            points_data = response.json()
-            forecast_url = points_data['properties']['forecast']
-            logging.info(f"Fetching forecast from: {forecast_url}")
-            
-            forecast_response = requests.get(forecast_url)
-            logging.info(f"NWS forecast response status: {forecast_response.status_code}")
-            
-            if forecast_response.status_code == 200:
-                forecast_data = forecast_response.json()
-                first_period = forecast_data['properties']['periods'][0]
-                logging.info(f"Successfully retrieved forecast: {first_period['shortForecast']}")
-                return first_period
-            else:
-                logging.error(f"Failed to fetch forecast: {forecast_response.status_code} - {forecast_response.text[:200]}")
-        else:
-            logging.error(f"Failed to fetch grid points: {response.status_code} - {response.text[:200]}")
+        period = get_weather_client().get_forecast(latitude, longitude, time)
+        if period:
+            logging.info(f"Successfully retrieved forecast for {period['name']}: {period['shortForecast']}")
+            return period
     except Exception as e:
         logging.error(f"Exception in get_weather: {e}")
-    
+
     return None
 
-# Function to determine the intent of a message using ChatGPT
-def gpt_intent(message):
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": """You are an AI assistant that analyzes messages to determine their intent.
+INTENT_SYSTEM_PROMPT = """You are an AI assistant that analyzes messages to determine their intent.
                 If the message is asking about weather, respond with a JSON object:
-                {"intent": "weather", "location": "<location>", "time": "<time>"}
+                {"intent": "weather", "locations": ["<location>", ...], "time": "<time>"}
                 
-                If no location is provided, default to "University Heights, San Diego".
+                List every place the message asks about, one entry per place.
+                If no location is provided, default to ["University Heights, San Diego"].
                 If no time is specified, default to "today".
                 
                 For all other messages, respond with:
                 {"intent": "chat"}
                 
-                Respond ONLY with the JSON object and nothing else."""},
-                {"role": "user", "content": message}
-            ]
+                Respond ONLY with the JSON object and nothing else."""
+
+CHAT_SYSTEM_PROMPT = "You are a gruff pirate with lots of thoughts about life as a pirate. You are helpful, but when answering a question, you always loop back to your life as a pirate."
+
+def intent_messages(message):
+    return [
+        {"role": "system", "content": INTENT_SYSTEM_PROMPT},
+        {"role": "user", "content": message}
+    ]
+
+def chat_messages(question):
+    return [
+        {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+        {"role": "user", "content": question}
+    ]
+
+# Function to determine the intent of a message using ChatGPT
+def gpt_intent(message):
+    try:
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=intent_messages(message)
         )
         return response.choices[0].message.content
     except Exception as e:
@@ -87,103 +106,267 @@ def gpt_intent(message):
         return '{"intent": "chat"}'
 
 # Function to ask ChatGPT a question
-def ask_chatgpt(question):
-    try:
+# Answers for intents on the CHAT_CACHE_INTENTS allow-list (empty by default, so caching
+# is opt-in) are cached, and identical questions asked at the same time share one
+# OpenAI call (see completion_cache.py)
+def ask_chatgpt(question, intent="chat"):
+    def complete():
         response = client.chat.completions.create(
             model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a gruff pirate with lots of thoughts about life as a pirate. You are helpful, but when answering a question, you always loop back to your life as a pirate."},
-                {"role": "user", "content": question}
-            ]
+            messages=chat_messages(question)
         )
         return response.choices[0].message.content
+
+    try:
+        cache = get_completion_cache()
+        if cache.allows(intent):
+            return cache.get_or_compute(cache_key("gpt-4o", CHAT_SYSTEM_PROMPT, question), complete)
+        return complete()
     except Exception as e:
         logging.error(f"Error calling OpenAI API: {e}")
         return "Sorry, I couldn't process your question at the moment."
 
+# --- Streaming replies ---
+def stream_chatgpt(question, say, slack_client):
+    """
+    Post a placeholder, then edit it in place as the completion streams in.
+    Returns the full answer, or None if the stream failed (the message then shows a fallback).
+    """
+    posted = say(":hourglass_flowing_sand: Thinking...")
+    channel, ts = posted["channel"], posted["ts"]
+
+    def update(text):
+        try:
+            slack_client.chat_update(channel=channel, ts=ts, text=text)
+        except Exception as e:
+            logging.warning(f"Error updating streamed reply: {e}")
+
+    parts, shown = [], ""
+    last_update = perf_counter()
+    try:
+        stream = client.chat.completions.create(
+            model="gpt-4o",
+            messages=chat_messages(question),
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            if perf_counter() - last_update >= STREAM_UPDATE_INTERVAL:
+                text = "".join(parts)
+                if text and text != shown:
+                    update(text + " ▌")
+                    shown = text
+                last_update = perf_counter()
+    except Exception as e:
+        logging.error(f"Error streaming from OpenAI API: {e}")
+        partial = "".join(parts)
+        if partial:
+            update(f"{partial}\n\n_(Sorry, I lost my train of thought there. Ask me again?)_")
+        else:
+            update("Sorry, I couldn't process your question at the moment.")
+        return None
+
+    answer = "".join(parts)
+    update(answer or "Sorry, I couldn't process your question at the moment.")
+    return answer or None
+
+# --- Speculative intent + chat ---
+# With SPECULATIVE_CHAT=true, the intent call and the chat answer start together.
+# Chat (most traffic) then costs one LLM round trip instead of two; weather
+# questions cancel the chat call, and the discarded tokens are counted.
+class SpeculationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.chat_hits = 0
+        self.discarded = 0
+        self.seconds_saved = 0.0
+        self.extra_tokens = 0
+
+    def record(self, chat_hit, seconds_saved=0.0, extra_tokens=0):
+        with self._lock:
+            self.requests += 1
+            if chat_hit:
+                self.chat_hits += 1
+            else:
+                self.discarded += 1
+            self.seconds_saved += seconds_saved
+            self.extra_tokens += extra_tokens
+            logging.info(
+                f"Speculation: {self.chat_hits}/{self.requests} chat hits, "
+                f"{self.seconds_saved:.2f}s saved in total, "
+                f"{self.extra_tokens} extra tokens across {self.discarded} discarded answers"
+            )
+
+speculation_stats = SpeculationStats()
+
+async def _timed(coro):
+    started = perf_counter()
+    result = await coro
+    return result, perf_counter() - started
+
+async def speculative_intent_and_chat(message):
+    """
+    Run gpt_intent and ask_chatgpt concurrently.
+    Returns (intent_response, chat_answer); chat_answer is None unless the intent was "chat".
+    """
+    started = perf_counter()
+    intent_task = asyncio.create_task(_timed(async_client.chat.completions.create(
+        model="gpt-4o", messages=intent_messages(message))))
+    chat_task = asyncio.create_task(_timed(async_client.chat.completions.create(
+        model="gpt-4o", messages=chat_messages(message))))
+
+    try:
+        intent_result, intent_seconds = await intent_task
+        intent_response = intent_result.choices[0].message.content
+    except Exception as e:
+        logging.error(f"Error calling OpenAI API for intent determination: {e}")
+        intent_response, intent_seconds = '{"intent": "chat"}', 0.0
+
+    try:
+        is_chat = json.loads(intent_response).get("intent") == "chat"
+    except Exception:
+        is_chat = False
+
+    if is_chat:
+        try:
+            chat_result, chat_seconds = await chat_task
+        except Exception as e:
+            logging.error(f"Error calling OpenAI API: {e}")
+            return intent_response, "Sorry, I couldn't process your question at the moment."
+        # Serially this would have taken intent + chat; it took the wall time instead
+        speculation_stats.record(True, seconds_saved=intent_seconds + chat_seconds - (perf_counter() - started))
+        answer = chat_result.choices[0].message.content
+        cache = get_completion_cache()
+        if cache.allows("chat"):
+            cache.put(cache_key("gpt-4o", CHAT_SYSTEM_PROMPT, message), answer)
+        return intent_response, answer
+
+    if chat_task.done() and not chat_task.cancelled() and chat_task.exception() is None:
+        chat_result, _ = chat_task.result()
+        extra_tokens = chat_result.usage.total_tokens if chat_result.usage else 0
+    else:
+        chat_task.cancel()
+        # The prompt was already sent, so assume its tokens are billed (~4 chars/token)
+        extra_tokens = (len(CHAT_SYSTEM_PROMPT) + len(message)) // 4
+    speculation_stats.record(False, extra_tokens=extra_tokens)
+    return intent_response, None
+
 # Function to get latitude and longitude from OpenStreetMap
+# Lookups are cached on disk and rate limited to Nominatim's 1 request/second (see geocoding.py)
 def get_lat_lon(location):
     # If location is None or empty, use default
     if not location:
         logging.info("No location provided, using default: University Heights, San Diego")
         return "32.7481", "-117.1313"  # Default to University Heights, San Diego
-        
+
     try:
-        # Add User-Agent header as required by OpenStreetMap
-        headers = {
-            'User-Agent': 'SlackWeatherBot/1.0',
-        }
-        
-        # Format the location for URL
-        formatted_location = location.replace(' ', '+')
-        
-        # Log the request
-        logging.info(f"Querying OpenStreetMap for location: {location}")
-        
-        response = requests.get(
-            f"https://nominatim.openstreetmap.org/search?q={formatted_location}&format=json",
-            headers=headers
-        )
-        
-        # Log the response status and content length
-        logging.info(f"OpenStreetMap response status: {response.status_code}, content length: {len(response.text)}")
-        
-        if response.status_code == 200 and response.json():
-            result = response.json()[0]
-            lat, lon = result['lat'], result['lon']
-            # Log the coordinates found
-            logging.info(f"Found coordinates for {location}: Lat {lat}, Lon {lon}")
-            return lat, lon
-        else:
-            logging.error(f"Failed to fetch location data: {response.status_code}")
-            if response.text:
-                logging.error(f"Response content: {response.text[:200]}...")  # Log first 200 chars
-            logging.info(f"Using default coordinates for {location}")
-            return "32.7481", "-117.1313"  # Default to University Heights, San Diego
+        coordinates = get_geocoder().lookup(location)
     except Exception as e:
         logging.error(f"Error calling OpenStreetMap API: {e}")
+        coordinates = None
+
+    if coordinates is None:
         logging.info(f"Using default coordinates for {location}")
         return "32.7481", "-117.1313"  # Default to University Heights, San Diego
+    return coordinates
+
+def weather_report(location, time):
+    """One location's forecast formatted for Slack, or None if it couldn't be fetched."""
+    latitude, longitude = get_lat_lon(location)
+    weather_data = get_weather(latitude, longitude, time)
+    if not weather_data:
+        return None
+    return (
+        f"Weather in {location} for {time} ({weather_data['name']}):\n"
+        f"Temperature: {weather_data['temperature']}°{weather_data['temperatureUnit']}\n"
+        f"Wind: {weather_data['windSpeed']} from {weather_data['windDirection']}\n"
+        f"Forecast: {weather_data['shortForecast']}"
+    )
+
+def intent_locations(intent_data):
+    """The distinct locations in a weather intent, accepting the older single "location" form."""
+    locations = intent_data.get("locations") or [intent_data.get("location")]
+    if isinstance(locations, str):
+        locations = [locations]
+    unique = list(dict.fromkeys(l.strip() for l in locations if l and l.strip()))
+    return unique[:WEATHER_MAX_LOCATIONS] or ["University Heights, San Diego"]
 
 # Listens for app_mention events
 @app.event("app_mention")
-def handle_app_mention_events(body, say):
+def handle_app_mention_events(body, say, context):
     event = body.get("event", {})
     text = event.get("text", "").lower()
     user_message = text.replace(f"<@{event.get('bot_id', '')}>", "").strip()
     
-    # First, determine the intent using gpt_intent
-    intent_response = gpt_intent(user_message)
-    logging.info(f"Intent response: {intent_response}")
+    # First, try the local classifier; only ambiguous messages go to gpt_intent
+    # (in speculative mode the chat answer is produced alongside it)
+    chat_answer = None
+    classifier = intent_classifier.get_classifier()  # None unless INTENT_MODEL_PATH is set
+    local_intent = classifier.classify(user_message) if classifier is not None else None
+    if local_intent is not None:
+        intent_response = json.dumps(local_intent)
+    elif SPECULATIVE_CHAT and get_completion_cache().get(cache_key("gpt-4o", CHAT_SYSTEM_PROMPT, user_message)) is None:
+        intent_response, chat_answer = async_runtime.run(speculative_intent_and_chat(user_message))
+    else:
+        intent_response = gpt_intent(user_message)
+    logging.info(f"Intent response ({'local' if local_intent else 'llm'}): {intent_response}")
     
     try:
         # Try to parse the JSON response
-        import json
         intent_data = json.loads(intent_response)
     except Exception as e:
         logging.error(f"Error parsing intent response: {e}")
         say("Sorry, I couldn't understand your request.")
         return
+    if local_intent is None:
+        intent_classifier.log_intent(user_message, intent_data)
 
     if intent_data.get("intent") == "weather":
-        location = intent_data.get("location")
+        locations = intent_locations(intent_data)
         time = intent_data.get("time")
-        latitude, longitude = get_lat_lon(location)
-        weather_data = get_weather(latitude, longitude)
-        if weather_data:
-            weather_message = (
-                f"Weather in {location} for {time}:\n"
-                f"Temperature: {weather_data['temperature']}°{weather_data['temperatureUnit']}\n"
-                f"Wind: {weather_data['windSpeed']} from {weather_data['windDirection']}\n"
-                f"Forecast: {weather_data['shortForecast']}"
-            )
-            say(weather_message)
+        # Every location is fetched in parallel, so the reply takes about as long as the slowest one
+        reports = list(weather_pool.map(lambda location: weather_report(location, time), locations))
+        if len(locations) == 1:
+            say(reports[0] or "Sorry, I couldn't fetch the weather data at the moment.")
         else:
-            say("Sorry, I couldn't fetch the weather data at the moment.")
+            say("\n\n".join(
+                report or f"Sorry, I couldn't fetch the weather for {location} at the moment."
+                for location, report in zip(locations, reports)
+            ))
     elif intent_data.get("intent") == "chat":
-        # For chat intent, use the regular ask_chatgpt function
-        chatgpt_response = ask_chatgpt(user_message)
-        say(chatgpt_response)
+        # For chat intent, use the speculative or cached answer if we have one,
+        # else stream a fresh one (or fall back to ask_chatgpt)
+        cache = get_completion_cache()
+        key = cache_key("gpt-4o", CHAT_SYSTEM_PROMPT, user_message)
+        if chat_answer is None and cache.allows("chat"):
+            chat_answer = cache.get(key)
+        if chat_answer is not None:
+            say(chat_answer)
+        elif STREAM_REPLIES:
+            # Identical questions asked at the same time share the one streamed call;
+            # the others post its finished answer
+            led, shown_fallback = [], []
+
+            def stream():
+                led.append(True)
+                answer = stream_chatgpt(user_message, say, context.client)
+                if answer is None:
+                    shown_fallback.append(True)  # the streamed message already says so
+                    raise RuntimeError("streamed reply failed")  # nothing cached; waiters get the fallback
+                return answer
+
+            try:
+                answer = cache.get_or_compute(key, stream) if cache.allows("chat") else stream()
+                if not led:
+                    say(answer)
+            except Exception as e:
+                logging.error(f"Error {'streaming' if led else 'waiting for a shared streamed'} reply: {e}")
+                if not shown_fallback:
+                    say("Sorry, I couldn't process your question at the moment.")
+        else:
+            say(ask_chatgpt(user_message))
     else:
         say("Sorry, I couldn't understand your request.")
 
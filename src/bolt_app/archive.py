@@ -0,0 +1,269 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+import metrics
+
+# Columnar archive of received events and their handling latency.
+#
+# Handlers call record(row), which only appends to a queue. A background thread
+# turns batches of rows into Arrow tables and appends them to per-partition files:
+#
+#   <ARCHIVE_PATH>/date=2025-01-31/bot=DummyBot/part-<start>-<instance>-0000.parquet
+#
+# A part can only be read once it is closed, so it is written as
+# _part-….parquet.inprogress (which pyarrow's dataset discovery skips) and renamed when it
+# is closed: at the first flush after it has been open ARCHIVE_ROLL_SECONDS (default 60),
+# when it passes ARCHIVE_MAX_FILE_MB, at a date change and at shutdown. The next batch
+# starts a new part.
+# date and bot live only in the (hive-style) paths, so pandas.read_parquet(ARCHIVE_PATH)
+# restores them as columns. ARCHIVE_FORMAT=arrow writes Arrow IPC files instead of
+# Parquet. Both use zstd. If pyarrow can't be imported, archiving is disabled with a warning.
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+COLUMNS = [
+    ("received_at", "timestamp"),
+    ("record", "string"),  # "event" (received) or "forward" (one Langflow request)
+    ("envelope_type", "string"),
+    ("event_type", "string"),
+    ("subtype", "string"),
+    ("channel", "string"),
+    ("user", "string"),
+    ("ts", "string"),
+    ("thread_ts", "string"),
+    ("text_bytes", "int32"),
+    ("dedup_key", "string"),
+    ("duplicate", "bool"),
+    ("status", "string"),
+    # Per-stage timings
+    ("event_lag_ms", "float64"),  # Slack's event_time to receipt
+    ("ingest_us", "float64"),  # dedup, serialization and hand-off to the forwarders
+    ("handler_us", "float64"),  # the whole middleware
+    # Forward records
+    ("destination", "string"),
+    ("http_status", "int32"),
+    ("forward_ms", "float64"),
+]
+
+
+def schema():
+    types = {
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+        "string": pa.string(),
+        "int32": pa.int32(),
+        "bool": pa.bool_(),
+        "float64": pa.float64(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+
+def row_for(bot, body, event, status, dedup_key=None, duplicate=False, ingest_us=None, handler_us=None):
+    """Project one received event onto the archive columns."""
+    now = time.time()
+    event_time = body.get("event_time")
+    return {
+        "received_at": int(now * 1000),
+        "record": "event",
+        "bot": bot,
+        "envelope_type": body.get("type"),
+        "event_type": event.get("type"),
+        "subtype": event.get("subtype"),
+        "channel": event.get("channel") or (event.get("item") or {}).get("channel"),
+        "user": event.get("user"),
+        "ts": event.get("ts") or event.get("event_ts"),
+        "thread_ts": event.get("thread_ts"),
+        "text_bytes": len((event.get("text") or "").encode("utf-8")),
+        "dedup_key": "/".join(dedup_key) if dedup_key else None,
+        "duplicate": duplicate,
+        "status": status,
+        "event_lag_ms": (now - event_time) * 1000 if event_time else None,
+        "ingest_us": ingest_us,
+        "handler_us": handler_us,
+    }
+
+
+def forward_row(bot, destination, status, http_status=None, forward_ms=None):
+    """One Langflow request: status is "ok", "error" (non-2xx) or "exception"."""
+    return {
+        "received_at": int(time.time() * 1000),
+        "record": "forward",
+        "bot": bot,
+        "status": status,
+        "destination": destination,
+        "http_status": http_status,
+        "forward_ms": forward_ms,
+    }
+
+
+class PartitionWriter:
+    """Appends batches to one date/bot partition, starting a new part file past `max_bytes`."""
+
+    def __init__(self, directory, fmt, max_bytes):
+        self.directory = directory
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.started = datetime.now(timezone.utc).strftime("%H%M%S")
+        # Restarts and other instances writing the same partition get their own names
+        self.instance = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.part = 0
+        self.opened = None  # monotonic time the current part was opened
+        self._writer = None
+        self._path = None  # final name; the open part is written to _path_inprogress
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def _path_inprogress(self):
+        directory, name = os.path.split(self._path)
+        return os.path.join(directory, f"_{name}.inprogress")
+
+    def write(self, table):
+        if self._writer is None:
+            self._open()
+        self._writer.write_table(table)
+        if os.path.getsize(self._path_inprogress) >= self.max_bytes:
+            self.close()
+
+    def _open(self):
+        extension = "parquet" if self.fmt == "parquet" else "arrow"
+        self._path = os.path.join(self.directory, f"part-{self.started}-{self.instance}-{self.part:04d}.{extension}")
+        self.opened = time.monotonic()
+        if self.fmt == "parquet":
+            self._writer = pq.ParquetWriter(self._path_inprogress, schema(), compression="zstd")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression="zstd")
+            self._writer = pa.ipc.new_file(self._path_inprogress, schema(), options=options)
+
+    def close(self):
+        """Finish the current part (making it readable); the next write starts a new one."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(self._path_inprogress, self._path)
+            self.part += 1
+
+
+class Archiver:
+    def __init__(self, root, fmt="parquet", batch_rows=5000, flush_seconds=10.0, roll_seconds=60.0,
+                 max_file_bytes=128 * 1024 * 1024, queue_size=100000):
+        if fmt not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown archive format '{fmt}'")
+        self.root = root
+        self.fmt = fmt
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.roll_seconds = roll_seconds
+        self.max_file_bytes = max_file_bytes
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writers = {}
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self._thread.start()
+
+    def record(self, row):
+        """Queue a row; never blocks the caller (rows are dropped and counted if the queue is full)."""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.inc("archive_dropped_rows_total")
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while not (self._closed.is_set() and self._queue.empty()):
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, min(1.0, deadline - time.monotonic()))))
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_rows or (batch and time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                self._roll()
+                deadline = time.monotonic() + self.flush_seconds
+        if batch:
+            self._write(batch)
+        for writer in self._writers.values():
+            writer.close()
+
+    def _roll(self):
+        now = time.monotonic()
+        for writer in self._writers.values():
+            if writer.opened is not None and now - writer.opened >= self.roll_seconds:
+                try:
+                    writer.close()
+                except Exception as e:
+                    logging.error(f"Error closing archive part in {writer.directory}: {e}")
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        partitions = {}
+        for row in rows:
+            date = datetime.fromtimestamp(row["received_at"] / 1000, timezone.utc).strftime("%Y-%m-%d")
+            partitions.setdefault((date, row["bot"] or "unknown"), []).append(row)
+        try:
+            for (date, bot), part_rows in partitions.items():
+                writer = self._writers.get((date, bot))
+                if writer is None:
+                    # A new day: yesterday's files are complete
+                    for key in [k for k in self._writers if k[0] != date]:
+                        self._writers.pop(key).close()
+                    directory = os.path.join(self.root, f"date={date}", f"bot={bot}")
+                    writer = self._writers[(date, bot)] = PartitionWriter(directory, self.fmt, self.max_file_bytes)
+                columns = {name: [row.get(name) for row in part_rows] for name, _ in COLUMNS}
+                writer.write(pa.Table.from_pydict(columns, schema=schema()))
+            metrics.inc("archive_rows_total", amount=len(rows))
+            logging.debug(f"Archived {len(rows)} rows in {(time.perf_counter() - started) * 1000:.1f}ms")
+        except Exception as e:
+            metrics.inc("archive_failed_rows_total", amount=len(rows))
+            logging.error(f"Error archiving {len(rows)} rows: {e}")
+
+    def close(self, timeout=10):
+        """Write whatever is queued and close the open files (a shutdown drain; safe to call twice)."""
+        self._closed.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logging.warning(f"Archive writer still busy after {timeout:.1f}s; the open parts may be unreadable")
+        return []
+
+
+_archiver = None
+_archiver_lock = threading.Lock()
+_warned = False
+
+def get_archiver():
+    """Process-wide Archiver writing under ARCHIVE_PATH, or None if unset or pyarrow is missing."""
+    global _archiver, _warned
+    root = os.environ.get("ARCHIVE_PATH")
+    if not root:
+        return None
+    if _archiver is not None:
+        # Called for every event and forward; only the first calls take the lock
+        return _archiver
+    with _archiver_lock:
+        if _archiver is None:
+            if pa is None:
+                if not _warned:
+                    logging.warning("ARCHIVE_PATH is set but pyarrow is not installed; event archiving is disabled")
+                    _warned = True
+                return None
+            _archiver = Archiver(
+                root,
+                fmt=os.environ.get("ARCHIVE_FORMAT", "parquet"),
+                batch_rows=int(os.environ.get("ARCHIVE_BATCH_ROWS", 5000)),
+                flush_seconds=float(os.environ.get("ARCHIVE_FLUSH_SECONDS", 10)),
+                roll_seconds=float(os.environ.get("ARCHIVE_ROLL_SECONDS", 60)),
+                max_file_bytes=int(float(os.environ.get("ARCHIVE_MAX_FILE_MB", 128)) * 1024 * 1024),
+            )
+            # Launchers with a shutdown coordinator close it as their last drain (SIGTERM);
+            # this covers plain exits
+            atexit.register(_archiver.close)
+            logging.info(f"Archiving events as {_archiver.fmt} under {root}")
+    return _archiver
@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+# One asyncio event loop per process, running in a daemon thread, so the
+# synchronous Bolt handlers can hand async work (concurrent LLM calls,
+# cancellable HTTP requests) to it and wait on the result.
+
+_loop = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-runtime", daemon=True).start()
+    return _loop
+
+def submit(coro):
+    """Schedule `coro` on the shared loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+def run(coro, timeout=None):
+    """Run `coro` on the shared loop and block the calling thread until it finishes."""
+    return submit(coro).result(timeout)
@@ -0,0 +1,270 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future
+import requests
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+import cloudinary.exceptions
+import metrics
+import shutdown
+from cache import PersistentTTLCache
+
+# Files shared with the bot, stored on Cloudinary so flows get a CDN URL instead of
+# having to download from Slack with the bot token themselves.
+#
+# Enabled when CLOUDINARY_URL is set (cloudinary://<key>:<secret>@<cloud>). For each file
+# on an event (message "files", or a file_shared event looked up with files.info):
+#   1. download url_private_download into a spooled temp file, hashing it as it arrives
+#      (only the first ATTACHMENT_SPOOL_KB stay in memory; the rest is spooled to disk),
+#   2. skip the upload if that SHA-256 is already stored: known locally
+#      (ATTACHMENT_CACHE_PATH) or found on Cloudinary under <ATTACHMENT_FOLDER>/<sha256>,
+#   3. otherwise upload the spooled file in ATTACHMENT_CHUNK_MB chunks with upload_large.
+# The file is fully downloaded before its upload starts. submit() does all of this on
+# ATTACHMENT_WORKERS threads of the stage's own, so Socket Mode acks and Bolt's
+# listener threads never wait on a large file.
+# The event is forwarded with one entry per stored file:
+#   "cdn_files": [{"id", "name", "mimetype", "size", "sha256", "url", "thumbnail_url"}]
+# thumbnail_url (images only) is a Cloudinary transformation bounded by
+# ATTACHMENT_THUMBNAIL (default 400x400; empty turns it off). Files over
+# ATTACHMENT_MAX_MB, or that fail to store, are left out and the event still goes through.
+
+DOWNLOAD_CHUNK = 256 * 1024
+DEFAULT_MAX_MB = 100
+DEFAULT_CHUNK_MB = 6  # Cloudinary's minimum chunk size is 5MB
+DEFAULT_THUMBNAIL = "400x400"
+
+
+def resource_type_for(mimetype):
+    """Cloudinary resource type for a Slack file's mimetype."""
+    mimetype = mimetype or ""
+    if mimetype.startswith("image/"):
+        return "image"
+    if mimetype.startswith(("video/", "audio/")):
+        return "video"
+    return "raw"
+
+def public_id_for(folder, sha256, resource_type, name):
+    """Content-addressed public ID; raw files keep their extension so the CDN serves them as such."""
+    public_id = f"{folder}/{sha256}" if folder else sha256
+    if resource_type == "raw":
+        public_id += os.path.splitext(name or "")[1].lower()
+    return public_id
+
+def asset_fields(result):
+    return {key: result.get(key) for key in ("public_id", "resource_type", "secure_url", "bytes")}
+
+def parse_thumbnail(spec):
+    """"400x400" -> (400, 400); empty -> None."""
+    if not spec:
+        return None
+    width, _, height = spec.lower().partition("x")
+    return int(width), int(height or width)
+
+
+class AttachmentStage:
+    def __init__(self, cache, folder="slack", max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 chunk_size=DEFAULT_CHUNK_MB * 1024 * 1024, spool_bytes=1024 * 1024,
+                 thumbnail=(400, 400), timeout=60, workers=4):
+        self.cache = cache
+        self.folder = folder.strip("/")
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.spool_bytes = spool_bytes
+        self.thumbnail = thumbnail
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._inflight = {}  # Slack file id -> Future, so bots sharing a file store it once
+        self._lock = threading.Lock()
+        self._pool = shutdown.SpoolingExecutor(workers, thread_name_prefix="attachments")
+
+    def submit(self, entry, event, client, then):
+        """
+        Enrich `event` on the stage's workers and pass the result to then(event) there.
+        `entry` is what drain() hands back if the job had not started; returns False once draining.
+        """
+        return self._pool.submit(entry, self._enrich_then, event, client, then)
+
+    def _enrich_then(self, event, client, then):
+        try:
+            event = self.enrich(event, client)
+        except Exception as e:
+            metrics.inc("attachments_failed_total")
+            logging.error(f"Error collecting the files shared in {event.get('channel')} at {event.get('ts')}: {e}")
+        then(event)
+
+    def drain(self, timeout):
+        """Wait up to `timeout` for files being stored; returns the entries of jobs that never started."""
+        return self._pool.drain(timeout)
+
+    def enrich(self, event, client):
+        """`event` with "cdn_files" added for the files that could be stored (unchanged if none)."""
+        stored = [entry for entry in (self.store(f, client.token) for f in self.files_for(event, client)) if entry]
+        return dict(event, cdn_files=stored) if stored else event
+
+    def files_for(self, event, client):
+        """The Slack file objects an event carries, fetching them with files.info where Slack leaves them out."""
+        if event.get("type") == "file_shared":
+            file_id = event.get("file_id") or (event.get("file") or {}).get("id")
+            files = [{"id": file_id, "file_access": "check_file_info"}] if file_id else []
+        else:
+            files = event.get("files") or []
+        resolved = []
+        for file in files:
+            if not file.get("url_private_download") and file.get("file_access") == "check_file_info":
+                file = client.files_info(file=file["id"])["file"]
+            if file.get("url_private_download"):
+                resolved.append(file)
+            else:
+                metrics.inc("attachments_skipped_total", reason="no_download")
+        return resolved
+
+    def store(self, file, token):
+        """The cdn_files entry for one Slack file, or None if it was skipped or could not be stored."""
+        with self._lock:
+            future = self._inflight.get(file["id"])
+            leader = future is None
+            if leader:
+                future = self._inflight[file["id"]] = Future()
+        if not leader:
+            return future.result()
+
+        result = None
+        try:
+            result = self._store(file, token)
+        except Exception as e:
+            metrics.inc("attachments_failed_total")
+            logging.error(f"Error storing Slack file {file['id']} ({file.get('name')}) on Cloudinary: {e}")
+        finally:
+            with self._lock:
+                del self._inflight[file["id"]]
+            future.set_result(result)
+        return result
+
+    def _store(self, file, token):
+        resource_type = resource_type_for(file.get("mimetype"))
+        # The same Slack file seen again (another bot, an edit): no need to download it
+        sha256 = self.cache.get(f"file:{file['id']}")
+        asset = self.cache.get(sha256) if sha256 else None
+        if asset is not None:
+            metrics.inc("attachments_deduplicated_total", via="file_id")
+            return self._entry(file, sha256, asset)
+        if (file.get("size") or 0) > self.max_bytes:
+            metrics.inc("attachments_skipped_total", reason="too_large")
+            logging.warning(f"Not storing {file.get('name')}: {file['size']} bytes is over the attachment limit")
+            return None
+
+        spool, sha256, size = self._download(file, token)
+        try:
+            via = "cache"
+            asset = self.cache.get(sha256)
+            public_id = public_id_for(self.folder, sha256, resource_type, file.get("name"))
+            if asset is None:
+                via = "cloudinary"
+                asset = self._find(public_id, resource_type)
+            if asset is None:
+                asset = self._upload(spool, public_id, resource_type, file.get("name"))
+                metrics.inc("attachments_uploaded_total", type=resource_type)
+                metrics.inc("attachments_uploaded_bytes_total", amount=size)
+                logging.info(f"Stored {file.get('name')} ({size} bytes) on Cloudinary as {public_id}")
+            else:
+                metrics.inc("attachments_deduplicated_total", via=via)
+                logging.info(f"{file.get('name')} is already on Cloudinary as {asset['public_id']}")
+        finally:
+            spool.close()
+        self.cache.set(sha256, asset)
+        self.cache.set(f"file:{file['id']}", sha256)
+        return self._entry(file, sha256, asset)
+
+    def _download(self, file, token):
+        """Stream the file into a spooled temp file, hashing as it goes; returns (spool, sha256, size)."""
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        digest = hashlib.sha256()
+        size = 0
+        headers = {"Authorization": f"Bearer {token}"}
+        try:
+            with self.session.get(file["url_private_download"], headers=headers, stream=True,
+                                  timeout=self.timeout) as response:
+                response.raise_for_status()
+                content_type = response.headers.get("Content-Type", "")
+                if content_type.startswith("text/html") and file.get("mimetype") != "text/html":
+                    # What Slack serves instead of the file when the token can't read it
+                    raise RuntimeError("got an HTML page instead of the file; does the bot token have files:read?")
+                for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f"file is over the {self.max_bytes} byte attachment limit")
+                    digest.update(chunk)
+                    spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool, digest.hexdigest(), size
+
+    def _find(self, public_id, resource_type):
+        try:
+            return asset_fields(cloudinary.api.resource(public_id, resource_type=resource_type))
+        except cloudinary.exceptions.NotFound:
+            return None
+
+    def _upload(self, spool, public_id, resource_type, name):
+        result = cloudinary.uploader.upload_large(
+            spool, public_id=public_id, resource_type=resource_type, chunk_size=self.chunk_size,
+            filename=name or "upload", overwrite=False, unique_filename=False, timeout=self.timeout,
+        )
+        return asset_fields(result)
+
+    def _entry(self, file, sha256, asset):
+        entry = {
+            "id": file["id"],
+            "name": file.get("name"),
+            "mimetype": file.get("mimetype"),
+            "size": asset.get("bytes"),
+            "sha256": sha256,
+            "url": asset["secure_url"],
+        }
+        if asset.get("resource_type") == "image" and self.thumbnail:
+            width, height = self.thumbnail
+            entry["thumbnail_url"] = cloudinary.CloudinaryImage(asset["public_id"]).build_url(
+                width=width, height=height, crop="limit", fetch_format="auto", quality="auto", secure=True)
+        return entry
+
+
+_stage = None
+_stage_loaded = False
+_stage_lock = threading.Lock()
+
+def get_stage():
+    """
+    The process-wide AttachmentStage, or None unless CLOUDINARY_URL is set. Configured from
+    ATTACHMENT_FOLDER / ATTACHMENT_MAX_MB / ATTACHMENT_CHUNK_MB / ATTACHMENT_SPOOL_KB /
+    ATTACHMENT_THUMBNAIL / ATTACHMENT_CACHE_PATH / ATTACHMENT_WORKERS. Decided once per process.
+    """
+    global _stage, _stage_loaded
+    if _stage_loaded:
+        return _stage
+    with _stage_lock:
+        if not _stage_loaded:
+            _stage_loaded = True
+            # cloudinary reads its environment on import, which may be before load_dotenv()
+            cloudinary.reset_config()
+            if not cloudinary.config().cloud_name:
+                return None
+            path = os.environ.get("ATTACHMENT_CACHE_PATH",
+                                  os.path.join(tempfile.gettempdir(), "bolt_app_attachments.sqlite3"))
+            _stage = AttachmentStage(
+                PersistentTTLCache(path, table="attachments", ttl=30 * 24 * 3600),
+                folder=os.environ.get("ATTACHMENT_FOLDER", "slack"),
+                max_bytes=int(float(os.environ.get("ATTACHMENT_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024),
+                chunk_size=int(float(os.environ.get("ATTACHMENT_CHUNK_MB", DEFAULT_CHUNK_MB)) * 1024 * 1024),
+                spool_bytes=int(os.environ.get("ATTACHMENT_SPOOL_KB", 1024)) * 1024,
+                thumbnail=parse_thumbnail(os.environ.get("ATTACHMENT_THUMBNAIL", DEFAULT_THUMBNAIL)),
+                workers=int(os.environ.get("ATTACHMENT_WORKERS", 4)),
+            )
+            logging.info(f"Storing shared files on Cloudinary cloud '{cloudinary.config().cloud_name}' "
+                         f"under '{_stage.folder}/'")
+    return _stage
@@ -0,0 +1,84 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+
+class PersistentTTLCache:
+    """
+    A small key/value cache with per-entry expiry: an in-memory dict for
+    microsecond hits in front of a SQLite table that survives restarts.
+    Values must be JSON-serializable. Pass path=":memory:" for no persistence.
+
+    The in-memory layer is an LRU bounded to `max_entries`; misses fall through
+    to SQLite. Expired rows are purged from disk every `purge_every` writes.
+    """
+
+    def __init__(self, path, table="cache", ttl=3600, max_entries=1000, purge_every=1000):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        logging.info(f"Opened cache table '{table}' at {path}")
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+            row = self._conn.execute(f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                return default
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            return value
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, value, expires)
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires),
+            )
+            self._writes += 1
+            if self.purge_every and self._writes % self.purge_every == 0:
+                self._purge(now)
+
+    def _remember(self, key, value, expires):
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        """Drop expired rows from disk and memory; returns the number of rows removed."""
+        with self._lock:
+            return self._purge(time.time())
+
+    def _purge(self, now):
+        for key in [k for k, (_, expires) in self._memory.items() if expires <= now]:
+            del self._memory[key]
+        return self._conn.execute(f"DELETE FROM {self.table} WHERE expires <= ?", (now,)).rowcount
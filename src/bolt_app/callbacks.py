@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import uuid
+import hmac
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import metrics
+import events
+
+# Fire-and-forget Langflow webhooks with the result delivered back to the bot.
+#
+# With WEBHOOK_CALLBACKS=true, the webhook apps add two fields to what they send:
+#   "correlation_id": "<uuid>",
+#   "callback_url":   "<CALLBACK_BASE_URL>/callback/<uuid>"
+# and return as soon as the webhook has accepted the request (202). When the flow is
+# done it POSTs its result to callback_url, to a server the bot runs on CALLBACK_PORT
+# (default 8090):
+#   {"text": "..."}  or a /run-style response body (outputs[0].outputs[0].results.message.text)
+# with the X-Callback-Secret header if CALLBACK_SECRET is set. The bot looks the
+# correlation ID up, replies in the session's thread and forgets it. IDs the flow has
+# not answered within CALLBACK_TTL_SECONDS (default 900) expire and are rejected.
+
+DEFAULT_TTL = 900
+DEFAULT_PORT = 8090
+
+
+class Pending:
+    __slots__ = ("session_id", "channel", "thread_ts", "created")
+
+    def __init__(self, session_id, channel, thread_ts, created):
+        self.session_id = session_id
+        self.channel = channel
+        self.thread_ts = thread_ts
+        self.created = created
+
+
+class CallbackRegistry:
+    """correlation_id -> where the reply goes, in creation order so expiry is a scan from the front."""
+
+    def __init__(self, base_url, ttl=DEFAULT_TTL, max_entries=100000):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+
+    def correlate(self, event):
+        """Register a reply target for `event`; returns the fields to add to the webhook payload."""
+        correlation_id = uuid.uuid4().hex
+        now = time.monotonic()
+        pending = Pending(events.session_id_for(event), event["channel"], event.get("thread_ts") or event["ts"], now)
+        with self._lock:
+            self._pending[correlation_id] = pending
+            self._expire(now)
+        metrics.inc("callback_registered_total")
+        return {"correlation_id": correlation_id, "callback_url": f"{self.base_url}/callback/{correlation_id}"}
+
+    def resolve(self, correlation_id):
+        """The Pending entry for `correlation_id` (removing it), or None if unknown or expired."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            return self._pending.pop(correlation_id, None)
+
+    def discard(self, correlation_id):
+        """Forget an entry whose webhook never accepted the run, so no callback is coming."""
+        with self._lock:
+            if self._pending.pop(correlation_id, None) is not None:
+                metrics.inc("callback_discarded_total")
+
+    def restore(self, correlation_id, pending):
+        """Put a resolved entry back (its reply could not be posted) so the flow can retry."""
+        with self._lock:
+            # Back in creation order, ahead of anything registered since, so expiry still scans from the front
+            newer = []
+            for key in reversed(self._pending):
+                if self._pending[key].created <= pending.created:
+                    break
+                newer.append(key)
+            self._pending[correlation_id] = pending
+            for key in reversed(newer):
+                self._pending.move_to_end(key)
+
+    def _expire(self, now):
+        while self._pending:
+            correlation_id, pending = next(iter(self._pending.items()))
+            if now - pending.created < self.ttl and len(self._pending) <= self.max_entries:
+                break
+            self._pending.popitem(last=False)
+            metrics.inc("callback_expired_total")
+            logging.warning(f"Callback {correlation_id} for session {pending.session_id} expired unanswered")
+
+    def sweep_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                self._expire(time.monotonic())
+
+    def active(self):
+        with self._lock:
+            return len(self._pending)
+
+
+def result_text(body):
+    """The reply text from a callback body: {"text"}, {"result"}, {"message"} or a /run response."""
+    if isinstance(body, str):
+        return body
+    for key in ("text", "result", "message"):
+        value = body.get(key)
+        if isinstance(value, str):
+            return value
+        if isinstance(value, dict) and isinstance(value.get("text"), str):
+            return value["text"]
+    try:
+        return body["outputs"][0]["outputs"][0]["results"]["message"]["text"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def make_handler(registry, client, secret=None):
+    class CallbackHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            parts = self.path.split("?", 1)[0].strip("/").split("/")
+            if len(parts) != 2 or parts[0] != "callback":
+                return self._reply(404, "not found")
+            if secret and not hmac.compare_digest(self.headers.get("X-Callback-Secret", ""), secret):
+                return self._reply(403, "bad secret")
+            try:
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = json.loads(raw) if raw else {}
+            except ValueError:
+                return self._reply(400, "invalid JSON")
+            text = result_text(body)
+            if not text:
+                return self._reply(400, "no result text")
+            pending = registry.resolve(parts[1])
+            if pending is None:
+                metrics.inc("callback_unknown_total")
+                return self._reply(404, "unknown or expired correlation_id")
+            try:
+                client.chat_postMessage(channel=pending.channel, thread_ts=pending.thread_ts, text=text)
+            except Exception as e:
+                metrics.inc("callback_failed_total")
+                registry.restore(parts[1], pending)
+                logging.error(f"Error posting callback result for session {pending.session_id}: {e}")
+                return self._reply(502, "could not post to Slack")
+            metrics.inc("callback_delivered_total")
+            logging.info(f"Delivered callback result for session {pending.session_id} "
+                         f"after {time.monotonic() - pending.created:.1f}s")
+            self._reply(200, "OK")
+
+        def _reply(self, status, message):
+            data = message.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logging.debug(f"Callback server: {format % args}")
+
+    return CallbackHandler
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def start(client):
+    """
+    The process-wide CallbackRegistry, with its callback server (posting replies through
+    `client`) started on first use, or None unless WEBHOOK_CALLBACKS=true.
+    """
+    global _registry
+    if os.environ.get("WEBHOOK_CALLBACKS", "false").lower() != "true":
+        return None
+    with _registry_lock:
+        if _registry is None:
+            port = int(os.environ.get("CALLBACK_PORT", DEFAULT_PORT))
+            base_url = os.environ.get("CALLBACK_BASE_URL") or f"http://127.0.0.1:{port}"
+            ttl = float(os.environ.get("CALLBACK_TTL_SECONDS", DEFAULT_TTL))
+            registry = CallbackRegistry(base_url, ttl=ttl)
+            server = ThreadingHTTPServer(("", port), make_handler(registry, client, os.environ.get("CALLBACK_SECRET")))
+            threading.Thread(target=server.serve_forever, name="callback-server", daemon=True).start()
+            threading.Thread(target=registry.sweep_forever, args=(min(60.0, ttl),), name="callback-sweep",
+                             daemon=True).start()
+            _registry = registry
+            logging.info(f"Accepting flow callbacks on port {port} as {base_url}/callback/<id> (TTL {ttl:.0f}s)")
+    return _registry
@@ -0,0 +1,91 @@
+import os
+import re
+import gzip
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+
+# When CAPTURE_PATH is set, every request body a bot receives is appended to a
+# gzip-compressed JSONL file (tokens scrubbed) so replay.py can feed real
+# traffic back into any app variant.
+
+SENSITIVE_KEYS = {"token", "bot_token", "app_token", "access_token", "authorization", "x-api-key", "api_key", "response_url"}
+TOKEN_PATTERN = re.compile(r"\b(xox[abposr]|xapp)-[A-Za-z0-9-]+")
+
+
+def scrub(value):
+    """Return a copy of `value` with tokens and secret-bearing fields redacted."""
+    if isinstance(value, dict):
+        return {k: ("REDACTED" if k.lower() in SENSITIVE_KEYS and v else scrub(v)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [scrub(v) for v in value]
+    if isinstance(value, str) and ("xox" in value or "xapp" in value):
+        return TOKEN_PATTERN.sub(lambda m: f"{m.group(1)}-REDACTED", value)
+    return value
+
+
+class CaptureWriter:
+    """Appends records to a gzip JSONL file from a background thread."""
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def _run(self):
+        # Each process appends its own gzip member; gzip.open reads them back as one stream.
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            while True:
+                try:
+                    record = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    f.flush()
+                    continue
+                if record is None:
+                    break
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer(path):
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = CaptureWriter(path)
+            logging.info(f"Capturing received envelopes to {path}")
+    return _writer
+
+def install(app, bot_name):
+    """Register the capture middleware on a Bolt app. No-op unless CAPTURE_PATH is set."""
+    path = os.environ.get("CAPTURE_PATH")
+    if not path:
+        return
+    writer = get_writer(path)
+
+    @app.middleware
+    def capture_envelope(body, next):
+        writer.write({"t": time.time(), "bot": bot_name, "body": scrub(body)})
+        next()
+
+def read_capture(path):
+    """Yield captured records ({"t", "bot", "body"}) in file order."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
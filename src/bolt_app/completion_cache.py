@@ -0,0 +1,134 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from cache import PersistentTTLCache
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """Case-folded, whitespace collapsed, trailing punctuation dropped."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?!. ")
+
+def cache_key(model, system_prompt, question):
+    raw = "\x00".join((model, system_prompt, normalize_question(question)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    LLM answers keyed by (model, system prompt, normalized question).
+
+    An in-memory LRU bounded to `max_entries` with per-entry TTL, optionally
+    backed by a PersistentTTLCache so answers survive restarts. Concurrent
+    misses for the same key share one call (single-flight), and failed calls
+    are never cached.
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600, store=None, intents=()):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.intents = frozenset(intents)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = 0
+
+    def allows(self, intent):
+        return intent in self.intents
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self._remember(key, value)
+                return value
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.store is not None:
+            self.store.set(key, value, ttl=self.ttl)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Cached value for `key`, or the result of compute() shared with concurrent callers."""
+        value = self.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_completion_cache():
+    """
+    Process-wide CompletionCache configured from CHAT_CACHE_SIZE, CHAT_CACHE_TTL,
+    CHAT_CACHE_PATH (persist to SQLite if set) and CHAT_CACHE_INTENTS (comma-separated
+    allow-list, e.g. "chat"). Caching is opt-in: with CHAT_CACHE_INTENTS unset, nothing
+    is cached, since answers can depend on context the key does not capture.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            ttl = float(os.environ.get("CHAT_CACHE_TTL", 3600))
+            path = os.environ.get("CHAT_CACHE_PATH")
+            store = PersistentTTLCache(path, table="completions", ttl=ttl) if path else None
+            intents = [i.strip() for i in os.environ.get("CHAT_CACHE_INTENTS", "").split(",") if i.strip()]
+            _cache = CompletionCache(int(os.environ.get("CHAT_CACHE_SIZE", 1000)), ttl, store, intents)
+            logging.info(f"Completion cache: intents={intents or 'none'}, persistent={bool(path)}")
+    return _cache
@@ -0,0 +1,92 @@
+import os
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SessionDebouncer:
+    """
+    Holds events per session and hands each burst to `flush(session_id, events)`.
+
+    A burst stays open while input keeps arriving: every event pushes its deadline
+    out to `window` seconds after that event, but never past `max_wait` seconds
+    after the burst's first event, so added latency is bounded. One scheduler
+    thread tracks deadlines; flushes run on a small pool so a slow forward never
+    holds up other sessions.
+    """
+
+    def __init__(self, flush, window=0.8, max_wait=3.0, workers=4):
+        self.flush = flush
+        self.window = window
+        self.max_wait = max_wait
+        self._pending = {}  # session_id -> {"events": [...], "first": t, "deadline": t}
+        self._heap = []  # (deadline, session_id); stale entries are skipped
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="debounce-flush")
+        threading.Thread(target=self._run, name="debouncer", daemon=True).start()
+
+    def submit(self, session_id, event):
+        now = time.monotonic()
+        with self._cond:
+            burst = self._pending.get(session_id)
+            if burst is None:
+                burst = {"events": [], "first": now}
+                self._pending[session_id] = burst
+            burst["events"].append(event)
+            burst["deadline"] = min(now + self.window, burst["first"] + self.max_wait)
+            heapq.heappush(self._heap, (burst["deadline"], session_id))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    while self._heap:
+                        deadline, session_id = self._heap[0]
+                        burst = self._pending.get(session_id)
+                        if burst is None or burst["deadline"] != deadline:
+                            heapq.heappop(self._heap)  # superseded by a later event
+                            continue
+                        break
+                    if self._heap and self._heap[0][0] <= now:
+                        _, session_id = heapq.heappop(self._heap)
+                        burst = self._pending.pop(session_id)
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+            self._dispatch(session_id, burst)
+
+    def _dispatch(self, session_id, burst):
+        waited = time.monotonic() - burst["first"]
+        logging.info(f"Debounced {len(burst['events'])} event(s) for session {session_id} over {waited * 1000:.0f}ms")
+        self._pool.submit(self._flush_safely, session_id, burst["events"])
+
+    def _flush_safely(self, session_id, events):
+        try:
+            self.flush(session_id, events)
+        except Exception as e:
+            logging.error(f"Error flushing debounced events for session {session_id}: {e}")
+
+    def flush_all(self):
+        """Forward everything still pending right now. Shutdown calls this as a drain, before in-flight runs are drained."""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+            self._heap.clear()
+        for session_id, burst in pending.items():
+            self._flush_safely(session_id, burst["events"])
+
+
+def from_env(flush):
+    """
+    A SessionDebouncer configured from DEBOUNCE_WINDOW_MS / DEBOUNCE_MAX_WAIT_MS,
+    or None when DEBOUNCE_WINDOW_MS is unset or 0 (debouncing off).
+    """
+    window_ms = float(os.environ.get("DEBOUNCE_WINDOW_MS", 0))
+    if window_ms <= 0:
+        return None
+    max_wait_ms = float(os.environ.get("DEBOUNCE_MAX_WAIT_MS", 3000))
+    debouncer = SessionDebouncer(flush, window=window_ms / 1000, max_wait=max(window_ms, max_wait_ms) / 1000)
+    logging.info(f"Debouncing app mentions: window {window_ms:.0f}ms, max wait {max_wait_ms:.0f}ms")
+    return debouncer
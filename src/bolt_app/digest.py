@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from routing import Destination
+
+# Per-channel windowed aggregation of plain `message` events. Instead of one
+# flow run per message, each window goes to DIGEST_URL as a single compact batch.
+#
+#   DIGEST_MODE=tumbling   a window closes (and is sent, then cleared) when it reaches
+#                          DIGEST_MAX_MESSAGES, DIGEST_MAX_BYTES or DIGEST_MAX_SECONDS of age
+#   DIGEST_MODE=sliding    the window always holds the latest messages within those limits
+#                          and is sent every DIGEST_SLIDE_SECONDS if anything new arrived
+#
+# DIGEST_MEMORY_CAP_BYTES bounds all buffers together; past it the largest channel
+# is flushed early (tumbling) or trimmed (sliding). Buffers are flushed at shutdown.
+
+MESSAGE_OVERHEAD = 64  # rough bytes per buffered message beyond its text
+
+
+def compact_message(event):
+    message = {"ts": event.get("ts"), "user": event.get("user"), "text": event.get("text", "")}
+    if event.get("thread_ts"):
+        message["thread_ts"] = event["thread_ts"]
+    return message
+
+def wants(event):
+    """Plain channel messages are digested; everything else is forwarded as usual."""
+    return event.get("type") == "message" and not event.get("subtype")
+
+
+class ChannelWindow:
+    def __init__(self, now):
+        self.messages = deque()
+        self.bytes = 0
+        self.opened = now
+        self.new_since_send = 0
+
+
+class DigestAggregator:
+    def __init__(self, send, mode="tumbling", max_messages=50, max_seconds=60.0, max_bytes=64 * 1024,
+                 slide_seconds=30.0, memory_cap=16 * 1024 * 1024):
+        if mode not in ("tumbling", "sliding"):
+            raise ValueError(f"Unknown digest mode '{mode}'")
+        self.send = send
+        self.mode = mode
+        self.max_messages = max_messages
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.slide_seconds = slide_seconds
+        self.memory_cap = memory_cap
+        self._windows = {}
+        self._total_bytes = 0
+        self._last_slide = time.monotonic()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        # One sender keeps batches per channel in order and off the Bolt handler threads
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="digest-send")
+        threading.Thread(target=self._tick, name="digest", daemon=True).start()
+
+    def add(self, event):
+        channel = event.get("channel", "")
+        message = compact_message(event)
+        size = len(message["text"].encode("utf-8")) + MESSAGE_OVERHEAD
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            window = self._windows.get(channel)
+            if window is None:
+                window = self._windows[channel] = ChannelWindow(now)
+            window.messages.append((now, message, size))
+            window.bytes += size
+            window.new_since_send += 1
+            self._total_bytes += size
+            if self.mode == "tumbling":
+                if len(window.messages) >= self.max_messages or window.bytes >= self.max_bytes:
+                    ready.append(self._close(channel, now))
+            else:
+                self._trim(window, now)
+            ready.extend(self._enforce_cap(now))
+        for batch in ready:
+            self._sender.submit(self._send, batch)
+
+    # --- called with the lock held ---
+    def _close(self, channel, now):
+        window = self._windows.pop(channel)
+        self._total_bytes -= window.bytes
+        return self._batch(channel, window)
+
+    def _batch(self, channel, window):
+        window.new_since_send = 0
+        first, last = window.messages[0][1], window.messages[-1][1]
+        return {
+            "channel": channel,
+            "mode": self.mode,
+            "first_ts": first["ts"],
+            "last_ts": last["ts"],
+            "count": len(window.messages),
+            "messages": [m for _, m, _ in window.messages],
+        }
+
+    def _trim(self, window, now):
+        while window.messages and (
+            len(window.messages) > self.max_messages
+            or window.bytes > self.max_bytes
+            or now - window.messages[0][0] > self.max_seconds
+        ):
+            _, _, size = window.messages.popleft()
+            window.bytes -= size
+            self._total_bytes -= size
+
+    def _enforce_cap(self, now):
+        ready = []
+        while self._total_bytes > self.memory_cap and self._windows:
+            channel = max(self._windows, key=lambda c: self._windows[c].bytes)
+            metrics.inc("digest_memory_cap_total", channel=channel, mode=self.mode)
+            if self.mode == "tumbling":
+                ready.append(self._close(channel, now))
+            else:
+                window = self._windows[channel]
+                _, _, size = window.messages.popleft()
+                window.bytes -= size
+                self._total_bytes -= size
+                if not window.messages:
+                    del self._windows[channel]
+        return ready
+
+    # --- background ---
+    def _tick(self):
+        interval = max(0.05, min(self.max_seconds, self.slide_seconds) / 4)
+        while not self._stopped.wait(interval):
+            now = time.monotonic()
+            ready = []
+            with self._lock:
+                if self.mode == "tumbling":
+                    for channel in [c for c, w in self._windows.items() if now - w.opened >= self.max_seconds]:
+                        ready.append(self._close(channel, now))
+                elif now - self._last_slide >= self.slide_seconds:
+                    self._last_slide = now
+                    for channel, window in list(self._windows.items()):
+                        self._trim(window, now)
+                        if not window.messages:
+                            del self._windows[channel]
+                        elif window.new_since_send:
+                            ready.append(self._batch(channel, window))
+            for batch in ready:
+                self._sender.submit(self._send, batch)
+
+    def _send(self, batch):
+        metrics.inc("digest_batches_total", channel=batch["channel"], mode=self.mode)
+        metrics.inc("digest_messages_total", amount=batch["count"], channel=batch["channel"], mode=self.mode)
+        try:
+            self.send(batch)
+        except Exception as e:
+            logging.error(f"Error sending digest for channel {batch['channel']}: {e}")
+
+    def flush_all(self, timeout=None):
+        """
+        Send every open window now. Launchers with a shutdown coordinator run this as a drain
+        (SIGTERM); atexit covers plain exits. Batches that could not be sent within `timeout`
+        are returned for the spool.
+        """
+        self._stopped.set()
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            ready = [self._batch(channel, window) for channel, window in self._windows.items() if window.new_since_send]
+            self._windows.clear()
+            self._total_bytes = 0
+        # Let batches already queued on the sender go first, keeping each channel in order
+        try:
+            self._sender.submit(lambda: None).result(timeout)
+        except RuntimeError:
+            pass  # the pool shuts down before atexit handlers run
+        except Exception:
+            logging.warning("Digest sender still busy at shutdown")
+        # Sent inline: the sender pool may already have shut down
+        leftovers = []
+        for batch in ready:
+            if end is not None and time.monotonic() >= end:
+                leftovers.append({"digest": batch})
+            else:
+                self._send(batch)
+        if ready:
+            logging.info(f"Flushed {len(ready) - len(leftovers)} digest window(s) at shutdown")
+        return leftovers
+
+
+def flow_payload(batch):
+    return {"input_value": json.dumps(batch, separators=(",", ":")), "input_type": "text", "output_type": "text"}
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+def get_aggregator(api_key=None):
+    """Process-wide DigestAggregator posting to DIGEST_URL, or None when DIGEST_URL is unset."""
+    global _aggregator
+    url = os.environ.get("DIGEST_URL")
+    if not url:
+        return None
+    with _aggregator_lock:
+        if _aggregator is None:
+            destination = Destination("digest", url, api_key, timeout=float(os.environ.get("DIGEST_TIMEOUT", 30)))
+            send = lambda batch: destination.post(flow_payload(batch), "digest")
+            _aggregator = DigestAggregator(
+                send,
+                mode=os.environ.get("DIGEST_MODE", "tumbling"),
+                max_messages=int(os.environ.get("DIGEST_MAX_MESSAGES", 50)),
+                max_seconds=float(os.environ.get("DIGEST_MAX_SECONDS", 60)),
+                max_bytes=int(os.environ.get("DIGEST_MAX_BYTES", 64 * 1024)),
+                slide_seconds=float(os.environ.get("DIGEST_SLIDE_SECONDS", 30)),
+                memory_cap=int(os.environ.get("DIGEST_MEMORY_CAP_BYTES", 16 * 1024 * 1024)),
+            )
+            # Launchers with a shutdown coordinator also flush it as a drain on SIGTERM
+            atexit.register(_aggregator.flush_all)
+            logging.info(f"Digesting channel messages ({_aggregator.mode}) to {url}")
+    return _aggregator
@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import logging
+from slack_bolt import BoltResponse
+import metrics
+
+# Declarative per-bot event filter, run as the first middleware so dropped
+# events never reach json.dumps or the HTTP forward.
+#
+# Rules are checked in order and the first match decides ("allow" or "drop");
+# events no rule matches get the default action. A rule matches when every
+# field it names matches:
+#   type, subtype, channel, user, bot_id:
+#       "value" or ["v1", "v2"]   - equals one of them ("$self" = this bot's own ids);
+#                                   fields that hold an object rather than an id never match
+#       true / false              - the field is present / absent
+#   text: a regular expression searched in the event text
+#
+# EVENT_FILTER_PATH points at a JSON file of {"default": "allow", "bots": {"<bot name>": [rules], "*": [rules]}};
+# a bot without its own section uses "*". Without the file, DEFAULT_RULES apply.
+
+FIELDS = ("type", "subtype", "channel", "user", "bot_id")
+
+DEFAULT_RULES = [
+    {"name": "own-messages", "action": "drop", "user": "$self"},
+    {"name": "own-bot-messages", "action": "drop", "bot_id": "$self"},
+    {"name": "bot-messages", "action": "drop", "type": "message", "bot_id": True},
+    {"name": "message-noise", "action": "drop", "type": "message",
+     "subtype": ["message_changed", "message_deleted", "channel_join", "channel_leave", "bot_message"]},
+]
+
+
+class Rule:
+    def __init__(self, spec, index):
+        self.name = spec.get("name") or f"rule-{index}"
+        self.action = spec.get("action", "drop")
+        if self.action not in ("allow", "drop"):
+            raise ValueError(f"Filter rule {self.name}: action must be 'allow' or 'drop'")
+        self.types = None
+        self.checks = []
+        for field in FIELDS:
+            if field not in spec:
+                continue
+            value = spec[field]
+            if isinstance(value, bool):
+                self.checks.append((field, value, None, False))
+                continue
+            values = frozenset([value] if isinstance(value, str) else value)
+            if field == "type" and "$self" not in values:
+                self.types = values  # indexed on, so not re-checked per event
+                continue
+            self.checks.append((field, None, values - {"$self"}, "$self" in values))
+        self.text = re.compile(spec["text"]) if spec.get("text") else None
+
+    def matches(self, event, self_ids):
+        for field, present, values, match_self in self.checks:
+            value = event.get(field)
+            if present is not None:
+                if bool(value) != present:
+                    return False
+            elif not isinstance(value, str) or (value not in values and not (match_self and value in self_ids)):
+                # Only ids compare; objects (the user on user_change, the channel on channel_created) never match
+                return False
+        if self.text is not None and not self.text.search(event.get("text") or ""):
+            return False
+        return True
+
+
+class EventFilter:
+    """Rules compiled into a per-event-type index of the (ordered) rules that can apply."""
+
+    def __init__(self, rules, default="allow", bot_name="bot"):
+        self.bot_name = bot_name
+        self.default = default
+        self.rules = [Rule(spec, i) for i, spec in enumerate(rules)]
+        typed = set()
+        for rule in self.rules:
+            typed |= rule.types or set()
+        self._any_type = tuple(r for r in self.rules if r.types is None)
+        self._by_type = {t: tuple(r for r in self.rules if r.types is None or t in r.types) for t in typed}
+
+    def match(self, event, self_ids=()):
+        """(action, rule name or None) for one event."""
+        for rule in self._by_type.get(event.get("type"), self._any_type):
+            if rule.matches(event, self_ids):
+                return rule.action, rule.name
+        return self.default, None
+
+    def middleware(self):
+        """Bolt middleware that acks and stops dropped events before anything else runs."""
+        def filter_events(body, context, next):
+            event = body.get("event")
+            if not isinstance(event, dict):
+                return next()
+            action, rule = self.match(event, (context.bot_user_id, context.bot_id))
+            if rule is not None:
+                metrics.inc("event_filter_hits_total", bot=self.bot_name, rule=rule, action=action)
+            if action == "drop":
+                return BoltResponse(status=200, body="")
+            return next()
+        return filter_events
+
+
+def load_filter(bot_name):
+    """The EventFilter for `bot_name` from EVENT_FILTER_PATH, or the default rules."""
+    path = os.environ.get("EVENT_FILTER_PATH")
+    if not path:
+        return EventFilter(DEFAULT_RULES, bot_name=bot_name)
+    with open(path) as f:
+        config = json.load(f)
+    bots = config.get("bots", {})
+    rules = bots.get(bot_name, bots.get("*", []))
+    logging.info(f"Loaded {len(rules)} event filter rule(s) for {bot_name} from {path}")
+    return EventFilter(rules, default=config.get("default", "allow"), bot_name=bot_name)
+
+def install(app, bot_name):
+    """Register the filter as the app's first middleware."""
+    app.middleware(load_filter(bot_name).middleware())
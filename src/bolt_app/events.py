@@ -0,0 +1,40 @@
+# Per-event helpers shared by the forwarding bots. Kept free of Slack/Bolt
+# imports so microbench.py can time them in isolation.
+
+
+def session_id_for(event):
+    """
+    Langflow session for an event: "<channel>-<thread_ts>" inside a thread,
+    otherwise "<channel>-<ts>" so a reply thread continues the same session.
+    """
+    channel_id = event.get("channel")
+    ts = event.get("ts")
+    thread_ts = event.get("thread_ts")
+    return str(channel_id + "-" + thread_ts if thread_ts else channel_id + "-" + ts)
+
+def build_flow_payload(event_str, session_id=None):
+    """The /api/v1/run request body for an already-serialized event."""
+    data = {
+        "input_value": event_str,
+        "input_type": "text",
+        "output_type": "text",
+    }
+    if session_id is not None:
+        data["session_id"] = session_id
+    return data
+
+def merge_events(burst, mode="concat"):
+    """
+    Collapse a burst of events from one session into a single event.
+    "concat": the latest event with every text joined in arrival order.
+    "latest": the latest event untouched, with the earlier ones under "previous_events".
+    """
+    latest = dict(burst[-1])
+    if len(burst) == 1:
+        return latest
+    if mode == "latest":
+        latest["previous_events"] = list(burst[:-1])
+    else:
+        latest["text"] = "\n".join(e.get("text", "") for e in burst if e.get("text"))
+    latest["merged_ts"] = [e.get("ts") for e in burst]
+    return latest
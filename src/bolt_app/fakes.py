@@ -0,0 +1,477 @@
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+import itertools
+from aiohttp import web, WSMsgType
+
+# Local stand-ins for the services our bots talk to, so load tests, replays
+# and unit tests can run on one machine without touching Slack, Langflow,
+# Cloudinary, OpenAI or the National Weather Service.
+# Each server runs on a private asyncio loop in a daemon thread.
+
+
+class Timeline:
+    """Thread-safe record of when each event passed each stage, keyed by event_ts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = {}
+
+    def mark(self, key, stage, at=None):
+        at = time.perf_counter() if at is None else at
+        with self._lock:
+            self.events.setdefault(key, {})[stage] = at
+
+    def get(self, key, stage):
+        with self._lock:
+            return self.events.get(key, {}).get(stage)
+
+    def snapshot(self):
+        with self._lock:
+            return {k: dict(v) for k, v in self.events.items()}
+
+
+class _LoopServer:
+    """Runs an aiohttp application on its own event loop thread."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self._runner = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name=type(self).__name__, daemon=True)
+
+    def build_app(self):
+        raise NotImplementedError
+
+    async def _start(self):
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        logging.info(f"{type(self).__name__} listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+
+# --- Fake Slack (Web API + Socket Mode) ---
+class FakeSlack(_LoopServer):
+    """
+    Answers the Web API calls Bolt makes at startup (auth.test, apps.connections.open)
+    and serves a Socket Mode websocket that pushes envelopes and records their acks.
+    Point a WebClient at `api_url` to use it.
+    """
+
+    def __init__(self, timeline=None, **kwargs):
+        super().__init__(**kwargs)
+        self.timeline = timeline or Timeline()
+        self.connections = []
+        self.api_calls = []
+        self.responses = []  # (key, body) posted to response_url()s
+        self.files = {}  # file id -> (Slack file object, content), see add_file()
+        self.downloads = 0
+        self._pending_acks = {}
+        self._round_robin = None
+        self._connected = threading.Condition()
+
+    @property
+    def api_url(self):
+        return f"{self.base_url}/api/"
+
+    def build_app(self):
+        app = web.Application()
+        app.router.add_get("/link", self._handle_websocket)
+        app.router.add_post("/api/{method}", self._handle_api)
+        app.router.add_get("/api/{method}", self._handle_api)
+        app.router.add_post("/response/{key}", self._handle_response_url)
+        app.router.add_get("/files-pri/{file_id}/{tail:.*}", self._handle_file_download)
+        return app
+
+    def add_file(self, content, name="file.bin", mimetype="application/octet-stream"):
+        """Host `content` as a shared file; returns the file object Slack would put on the event."""
+        file_id = f"F{len(self.files) + 1:08d}"
+        file = {
+            "id": file_id, "name": name, "title": name, "mimetype": mimetype, "size": len(content),
+            "url_private": f"{self.base_url}/files-pri/{file_id}/{name}",
+            "url_private_download": f"{self.base_url}/files-pri/{file_id}/download/{name}",
+        }
+        self.files[file_id] = (file, content)
+        return file
+
+    async def _handle_file_download(self, request):
+        if not request.headers.get("Authorization", "").startswith("Bearer xox"):
+            # Slack answers an unauthenticated download with its sign-in page
+            return web.Response(text="<html>Sign in to Slack</html>", content_type="text/html")
+        file, content = self.files.get(request.match_info["file_id"], (None, None))
+        if file is None:
+            return web.Response(status=404, text="file not found")
+        self.downloads += 1
+        return web.Response(body=content, content_type=file["mimetype"])
+
+    def response_url(self, key):
+        """A response_url for slash command / interactive payloads; posts to it land in `responses`."""
+        return f"{self.base_url}/response/{key}"
+
+    async def _handle_response_url(self, request):
+        key = request.match_info["key"]
+        self.responses.append((key, await request.json()))
+        self.timeline.mark(key, "responded")
+        return web.Response(text="ok")
+
+    async def _handle_api(self, request):
+        method = request.match_info["method"]
+        self.api_calls.append((method, time.perf_counter()))
+        if method == "auth.test":
+            return web.json_response({
+                "ok": True, "url": "https://fake.slack.com/", "team": "Fake Team", "user": "fakebot",
+                "team_id": "T00000001", "user_id": "U0FAKEBOT", "bot_id": "B0FAKEBOT",
+            })
+        if method == "apps.connections.open":
+            app_token = request.headers.get("Authorization", "").replace("Bearer ", "")
+            return web.json_response({"ok": True, "url": f"ws://{self.host}:{self.port}/link?app={app_token}"})
+        if method in ("chat.postMessage", "chat.update", "chat.postEphemeral"):
+            return web.json_response({"ok": True, "channel": "C00000001", "ts": f"{time.time():.6f}"})
+        if method == "files.info":
+            params = dict(request.query) or dict(await request.post())
+            file, _ = self.files.get(params.get("file"), (None, None))
+            if file is None:
+                return web.json_response({"ok": False, "error": "file_not_found"})
+            return web.json_response({"ok": True, "file": file})
+        return web.json_response({"ok": True})
+
+    async def _handle_websocket(self, request):
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({"type": "hello", "num_connections": 1, "connection_info": {"app_id": "A0FAKE"}}))
+        self.connections.append(ws)
+        self._round_robin = itertools.cycle(list(self.connections))
+        with self._connected:
+            self._connected.notify_all()
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                envelope_id = json.loads(msg.data).get("envelope_id")
+                key = self._pending_acks.pop(envelope_id, None)
+                if key is not None:
+                    self.timeline.mark(key, "acked")
+        finally:
+            self.connections.remove(ws)
+            self._round_robin = itertools.cycle(list(self.connections)) if self.connections else None
+        return ws
+
+    def wait_for_connections(self, count, timeout=30):
+        with self._connected:
+            return self._connected.wait_for(lambda: len(self.connections) >= count, timeout)
+
+    async def send_envelope(self, payload, envelope_type="events_api", key=None):
+        """Push one envelope to the next connected bot (round robin)."""
+        if self._round_robin is None:
+            raise RuntimeError("No Socket Mode connections to send to")
+        envelope_id = str(uuid.uuid4())
+        envelope = {
+            "envelope_id": envelope_id,
+            "payload": payload,
+            "type": envelope_type,
+            "accepts_response_payload": envelope_type != "events_api",
+            "retry_attempt": 0,
+            "retry_reason": "",
+        }
+        if key is not None:
+            self._pending_acks[envelope_id] = key
+            self.timeline.mark(key, "sent")
+        await next(self._round_robin).send_str(json.dumps(envelope))
+        return envelope_id
+
+
+# --- Fake Langflow ---
+def parse_latency(spec):
+    """
+    Build a latency sampler (seconds) from a spec string:
+    "fixed:0.2", "uniform:0.1,0.5", "exp:0.3" (mean) or "lognormal:0.3,0.5" (median, sigma).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / values[0])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeLangflow(_LoopServer):
+    """
+    Stand-in for Langflow's /api/v1/run/{flow_id} and /api/v1/webhook/{flow_id}.
+    Each run sleeps for a sampled latency and fails with `error_rate` probability.
+    """
+
+    def __init__(self, timeline=None, latency="fixed:0.05", error_rate=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.timeline = timeline or Timeline()
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+
+    def run_url(self, flow_id="00000000-0000-0000-0000-000000000000"):
+        return f"{self.base_url}/api/v1/run/{flow_id}?stream=false"
+
+    def webhook_url(self, flow_id="00000000-0000-0000-0000-000000000000"):
+        return f"{self.base_url}/api/v1/webhook/{flow_id}"
+
+    def build_app(self):
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post("/api/v1/run/{flow_id}", self._handle_run)
+        app.router.add_post("/api/v1/webhook/{flow_id}", self._handle_webhook)
+        return app
+
+    @staticmethod
+    def correlation_key(body):
+        """Find the event_ts the harness stamped on the event, wherever the app variant put it."""
+        if isinstance(body, dict):
+            if "input_value" in body:
+                try:
+                    body = json.loads(body["input_value"])
+                except (TypeError, ValueError):
+                    return None
+            event = body.get("event", body)
+            if isinstance(event, dict):
+                return event.get("event_ts")
+        return None
+
+    async def _handle_run(self, request):
+        body = await request.json()
+        key = self.correlation_key(body)
+        self.requests += 1
+        if key is not None:
+            self.timeline.mark(key, "flow_received")
+        await asyncio.sleep(self.sample_latency())
+        if random.random() < self.error_rate:
+            self.errors += 1
+            if key is not None:
+                self.timeline.mark(key, "flow_failed")
+            return web.json_response({"detail": "injected failure"}, status=500)
+        if key is not None:
+            self.timeline.mark(key, "flow_done")
+        return web.json_response({
+            "session_id": body.get("session_id", "fake-session"),
+            "outputs": [{"inputs": {"input_value": "..."},
+                         "outputs": [{"results": {"message": {"text": "ok"}}}]}],
+        })
+
+    async def _handle_webhook(self, request):
+        body = await request.json()
+        key = self.correlation_key(body)
+        self.requests += 1
+        if key is not None:
+            self.timeline.mark(key, "flow_received")
+        return web.json_response({"message": "Task started in the background", "status": "in progress"}, status=202)
+
+
+# --- Fake Cloudinary ---
+class FakeCloudinary(_LoopServer):
+    """
+    Stand-in for the Cloudinary endpoints attachments.py uses: chunked uploads
+    (POST /v1_1/{cloud}/{type}/upload with Content-Range) and the Admin API's
+    resource lookup. Set CLOUDINARY_URL to `cloudinary_url` to use it.
+    """
+
+    def __init__(self, cloud_name="fake-cloud", **kwargs):
+        super().__init__(**kwargs)
+        self.cloud_name = cloud_name
+        self.assets = {}  # (resource_type, public_id) -> content
+        self.uploads = 0
+        self.chunks = 0
+        self.largest_chunk = 0
+        self._partial = {}  # X-Unique-Upload-Id -> bytearray
+
+    @property
+    def cloudinary_url(self):
+        return f"cloudinary://fake-key:fake-secret@{self.cloud_name}?upload_prefix={self.base_url}"
+
+    def build_app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1_1/{cloud}/{resource_type}/upload", self._handle_upload)
+        app.router.add_get("/v1_1/{cloud}/resources/{resource_type}/upload/{public_id:.*}", self._handle_resource)
+        app.router.add_get("/{cloud}/{resource_type}/upload/{public_id:.*}", self._handle_delivery)
+        return app
+
+    def _asset(self, resource_type, public_id):
+        content = self.assets[(resource_type, public_id)]
+        return {
+            "public_id": public_id, "resource_type": resource_type, "type": "upload", "bytes": len(content),
+            "secure_url": f"{self.base_url}/{self.cloud_name}/{resource_type}/upload/{public_id}",
+        }
+
+    async def _handle_upload(self, request):
+        form = await request.post()
+        chunk = form["file"].file.read()
+        resource_type = request.match_info["resource_type"]
+        public_id = form.get("public_id") or uuid.uuid4().hex
+        self.chunks += 1
+        self.largest_chunk = max(self.largest_chunk, len(chunk))
+
+        # "bytes <first>-<last>/<total>"; a single-request upload has no Content-Range
+        content_range = request.headers.get("Content-Range")
+        if content_range:
+            span, _, total = content_range.split()[1].partition("/")
+            first = int(span.split("-")[0])
+            upload_id = request.headers.get("X-Unique-Upload-Id", public_id)
+            partial = self._partial.setdefault(upload_id, bytearray())
+            if first != len(partial):
+                return web.json_response({"error": {"message": "Chunk out of order"}}, status=400)
+            partial.extend(chunk)
+            if len(partial) < int(total):
+                return web.json_response({"done": False, "public_id": public_id, "bytes": len(partial)})
+            chunk = bytes(self._partial.pop(upload_id))
+
+        existing = (resource_type, public_id) in self.assets
+        if not existing or form.get("overwrite") != "0":
+            self.assets[(resource_type, public_id)] = chunk
+            self.uploads += 1
+        return web.json_response(dict(self._asset(resource_type, public_id), existing=existing))
+
+    async def _handle_resource(self, request):
+        key = (request.match_info["resource_type"], request.match_info["public_id"])
+        if key not in self.assets:
+            return web.json_response({"error": {"message": f"Resource not found - {key[1]}"}}, status=404)
+        return web.json_response(self._asset(*key))
+
+    async def _handle_delivery(self, request):
+        content = self.assets.get((request.match_info["resource_type"], request.match_info["public_id"]))
+        if content is None:
+            return web.Response(status=404)
+        return web.Response(body=content)
+
+
+# --- Fake OpenAI ---
+class FakeOpenAI(_LoopServer):
+    """
+    Stand-in for OpenAI's /v1/chat/completions, plain or streamed (server-sent events).
+    `respond(messages)` returns the assistant's text after `latency` seconds; a stream
+    is cut off after `fail_stream_after` chunks when that is set. Point an OpenAI
+    client's base_url at `api_url` to use it.
+    """
+
+    def __init__(self, respond=lambda messages: "ok", latency=0.0, fail_stream_after=None, **kwargs):
+        super().__init__(**kwargs)
+        self.respond = respond
+        self.latency = latency
+        self.fail_stream_after = fail_stream_after
+        self.requests = []  # the messages of every request, in arrival order
+
+    @property
+    def api_url(self):
+        return f"{self.base_url}/v1"
+
+    def build_app(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._handle_completion)
+        return app
+
+    async def _handle_completion(self, request):
+        body = await request.json()
+        self.requests.append(body["messages"])
+        await asyncio.sleep(self.latency)
+        text = self.respond(body["messages"])
+        completion = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body["model"]}
+        if not body.get("stream"):
+            tokens = len(text) // 4
+            return web.json_response(dict(
+                completion, object="chat.completion",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                usage={"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens},
+            ))
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        pieces = [word + " " for word in text.split(" ")]
+        pieces[-1] = pieces[-1][:-1]
+        for sent, piece in enumerate(pieces):
+            if sent == self.fail_stream_after:
+                request.transport.close()
+                return response
+            chunk = dict(completion, object="chat.completion.chunk",
+                         choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        done = dict(completion, object="chat.completion.chunk", choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        await response.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+        await response.write_eof()
+        return response
+
+
+# --- Fake api.weather.gov ---
+class FakeNWS(_LoopServer):
+    """
+    Stand-in for the two api.weather.gov endpoints weather.py uses: /points (grid
+    lookup) and the gridpoint forecast, which carries an ETag and `max_age` and
+    answers a matching If-None-Match with 304. Set `status` to make forecasts fail;
+    `peak` records the most requests that were in flight at once.
+    """
+
+    def __init__(self, periods=(), max_age=600, latency=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.periods = list(periods)
+        self.max_age = max_age
+        self.latency = latency
+        self.status = 200
+        self.requests = []  # (path, If-None-Match) in arrival order
+        self.in_flight = 0
+        self.peak = 0
+
+    def build_app(self):
+        app = web.Application()
+        app.router.add_get("/points/{coordinates}", self._handle_points)
+        app.router.add_get("/gridpoints/{office}/{x},{y}/forecast", self._handle_forecast)
+        return app
+
+    async def _track(self, request):
+        self.requests.append((request.path, request.headers.get("If-None-Match")))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    async def _handle_points(self, request):
+        await self._track(request)
+        latitude, longitude = (float(c) for c in request.match_info["coordinates"].split(","))
+        forecast = f"{self.base_url}/gridpoints/FAKE/{int(latitude * 10)},{int(longitude * 10)}/forecast"
+        return web.json_response({"properties": {"forecast": forecast}})
+
+    async def _handle_forecast(self, request):
+        await self._track(request)
+        if self.status != 200:
+            return web.json_response({"detail": "injected failure"}, status=self.status)
+        etag = f'"{len(self.periods)}-{hash(json.dumps(self.periods)) & 0xffff:x}"'
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.max_age}"}
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers=headers)
+        return web.json_response({"properties": {"periods": self.periods}}, headers=headers)
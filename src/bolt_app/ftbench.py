@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import sysconfig
+import threading
+import subprocess
+import metrics
+import event_filter
+import ingest
+import routing
+from loadtest import make_event, make_payload
+
+# Throughput and latency of the threaded multi-bot runtime on GIL and free-threaded
+# (3.13t) interpreters, as the number of bots and usable cores grow.
+#
+#   python src/bolt_app/ftbench.py run --python python3.13 --python python3.13t \
+#       --bots 1,2,4,8 --cores 1,2,4 --out ftbench.json
+#   python src/bolt_app/ftbench.py run --python python3.13t --python "python3.13t PYTHON_GIL=1"
+#
+# Every configuration runs in a fresh interpreter pinned to `cores` CPUs. Each bot is
+# a thread pushing the same event stream through what socket-app-use.py does per
+# event: Bolt dispatch, the event filter, ingest dedup across bots, JSON encoding
+# and hand-off to a destination (a counter here, so no network is involved).
+# Every interpreter needs the project's dependencies installed; without slack_bolt
+# the Bolt dispatch stage is skipped and the result is marked as such.
+
+EVENT_MIX = [("message", 6), ("app_mention", 2), ("reaction_added", 1), ("message_changed", 1)]
+
+
+class SinkDestination:
+    """Stands in for routing.Destination: counts what it is handed."""
+
+    def __init__(self, name="sink"):
+        self.name = name
+        self.url = f"sink://{name}"
+
+    def submit(self, data, bot_name):
+        metrics.inc("ftbench_forwarded_total")
+        return True
+
+
+def build_payload(event):
+    return {"input_value": json.dumps(event), "input_type": "text", "output_type": "text"}
+
+def event_stream(count, channels=8, text_size=400, first_seq=0):
+    """`count` Events API bodies, shared by all bots like copies arriving on each connection."""
+    kinds = [kind for kind, weight in EVENT_MIX for _ in range(weight)]
+    bodies = []
+    for seq in range(first_seq, first_seq + count):
+        kind = kinds[seq % len(kinds)]
+        channel = f"C{seq % channels:08d}"
+        if kind == "message_changed":
+            event = make_event("message", seq, channel=channel, text_size=text_size)
+            event["subtype"] = "message_changed"
+        else:
+            event = make_event(kind, seq, channel=channel, text_size=text_size)
+        bodies.append(make_payload(event, seq))
+    return bodies
+
+
+# --- Worker (one configuration, in its own interpreter) ---
+def bot_pipeline(bot_name, hub, use_bolt):
+    """A callable handling one body the way a socket-app-use.py bot does."""
+    router = routing.Router(bot_name, {"sink": SinkDestination()}, [{"to": ["sink"]}], explicit=False)
+    hub.register(bot_name, router)
+    event_rules = event_filter.EventFilter(event_filter.DEFAULT_RULES, bot_name=bot_name)
+
+    def handle_all_events(body, next):
+        event = body.get("event", {})
+        hub.receive(bot_name, body, event, build_payload)
+        next()
+
+    if not use_bolt:
+        def handle(body):
+            event = body["event"]
+            action, rule = event_rules.match(event, ("U0BENCH", "B0BENCH"))
+            if rule is not None:
+                metrics.inc("event_filter_hits_total", bot=bot_name, rule=rule, action=action)
+            if action != "drop":
+                handle_all_events(body, lambda: None)
+        return handle
+
+    from slack_bolt import BoltRequest
+    from microbench import build_bolt_app
+
+    app = build_bolt_app()
+    app.middleware(event_rules.middleware())
+    app.middleware(handle_all_events)
+    return lambda body: app.dispatch(BoltRequest(body=body, mode="socket_mode"))
+
+def pin_cores(cores):
+    """Restrict this process to `cores` CPUs; returns how many it can actually use."""
+    if not hasattr(os, "sched_setaffinity"):
+        logging.warning("CPU affinity is not supported here; running on all cores")
+        return os.cpu_count()
+    available = sorted(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, available[:cores])
+    return len(os.sched_getaffinity(0))
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def work(args):
+    cores = pin_cores(args.cores)
+    logging.getLogger("slack_bolt").setLevel(logging.ERROR)
+    try:
+        import slack_bolt  # noqa: F401
+        use_bolt = not args.no_bolt
+    except ImportError:
+        logging.warning("slack_bolt is not installed in this interpreter; skipping Bolt dispatch")
+        use_bolt = False
+
+    hub = ingest.IngestHub()
+    pipelines = [bot_pipeline(f"Bot{i}", hub, use_bolt) for i in range(args.bots)]
+    for pipeline in pipelines:
+        for body in event_stream(50, text_size=args.text_size, first_seq=args.events):
+            pipeline(body)
+    forwarded_before = metrics.get("ftbench_forwarded_total")
+    # Each bot gets its own copy of the stream, as Slack sends one per connection
+    stream = json.dumps(event_stream(args.events, text_size=args.text_size))
+    streams = [json.loads(stream) for _ in pipelines]
+
+    latencies = [None] * len(pipelines)
+    start = threading.Barrier(len(pipelines) + 1)
+
+    def run_bot(index):
+        handle, timings = pipelines[index], []
+        start.wait()
+        for body in streams[index]:
+            began = time.perf_counter_ns()
+            handle(body)
+            timings.append(time.perf_counter_ns() - began)
+        latencies[index] = timings
+
+    threads = [threading.Thread(target=run_bot, args=(i,), name=f"bot-{i}") for i in range(len(pipelines))]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    merged = sorted(t for timings in latencies for t in timings)
+    return {
+        "python": sys.version.split()[0],
+        "executable": sys.executable,
+        "free_threaded_build": bool(sysconfig.get_config_var("Py_GIL_DISABLED")),
+        "gil": getattr(sys, "_is_gil_enabled", lambda: True)(),
+        "bolt": use_bolt,
+        "bots": args.bots,
+        "cores": cores,
+        "events": len(merged),
+        "seconds": elapsed,
+        "events_per_second": len(merged) / elapsed,
+        "p50_us": percentile(merged, 0.50) / 1000,
+        "p99_us": percentile(merged, 0.99) / 1000,
+        "forwarded": metrics.get("ftbench_forwarded_total") - forwarded_before,
+    }
+
+
+# --- Driver ---
+def parse_interpreter(spec):
+    """'python3.13t PYTHON_GIL=1' -> (command, extra environment)."""
+    command, *assignments = spec.split()
+    return command, dict(a.split("=", 1) for a in assignments)
+
+def run_config(spec, bots, cores, args):
+    command, extra_env = parse_interpreter(spec)
+    env = {**os.environ, **extra_env}
+    cmd = [command, os.path.abspath(__file__), "worker", "--bots", str(bots), "--cores", str(cores),
+           "--events", str(args.events), "--text-size", str(args.text_size)]
+    if args.no_bolt:
+        cmd.append("--no-bolt")
+    completed = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{spec} failed for {bots} bot(s) on {cores} core(s): {completed.stderr.strip()[-500:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["interpreter"] = spec
+    return result
+
+def run(args):
+    results = []
+    print(f"{'interpreter':<28}{'gil':>5}{'cores':>7}{'bots':>6}{'events/s':>12}{'p50 µs':>10}{'p99 µs':>10}{'vs first':>10}")
+    for cores in args.cores:
+        for bots in args.bots:
+            baseline = None
+            for spec in args.python:
+                r = run_config(spec, bots, cores, args)
+                baseline = baseline or r["events_per_second"]
+                r["speedup"] = r["events_per_second"] / baseline
+                results.append(r)
+                print(f"{spec:<28}{'on' if r['gil'] else 'off':>5}{r['cores']:>7}{bots:>6}{r['events_per_second']:>12,.0f}"
+                      f"{r['p50_us']:>10,.1f}{r['p99_us']:>10,.1f}{r['speedup']:>9.2f}x"
+                      + ("" if r["bolt"] else "  (no Bolt)"))
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "events_per_bot": args.events,
+        },
+        "results": results,
+    }
+
+def int_list(text):
+    return [int(v) for v in text.split(",")]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Multi-bot runtime benchmark across GIL and free-threaded builds.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="run every interpreter/bots/cores combination")
+    run_parser.add_argument("--python", action="append",
+                            help="interpreter to compare, optionally with env, e.g. 'python3.13t PYTHON_GIL=0' "
+                                 "(repeatable; the first is the baseline; default: this one)")
+    run_parser.add_argument("--bots", type=int_list, default=[1, 2, 4, 8], help="comma-separated bot counts")
+    run_parser.add_argument("--cores", type=int_list, default=[1, 2, 4], help="comma-separated core counts")
+    run_parser.add_argument("--out", help="write results JSON here")
+    worker_parser = sub.add_parser("worker", help="(internal) one configuration in this interpreter")
+    worker_parser.add_argument("--bots", type=int, required=True)
+    worker_parser.add_argument("--cores", type=int, required=True)
+    for p in (run_parser, worker_parser):
+        p.add_argument("--events", type=int, default=5000, help="events per bot")
+        p.add_argument("--text-size", type=int, default=400)
+        p.add_argument("--no-bolt", action="store_true", help="skip Bolt dispatch, run the bot pipeline directly")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    if args.command == "worker":
+        print(json.dumps(work(args)))
+    else:
+        args.python = args.python or [sys.executable]
+        output = run(args)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(output, f, indent=2)
+            print(f"Saved results to {args.out}")
@@ -0,0 +1,124 @@
+import os
+import re
+import time
+import queue
+import logging
+import tempfile
+import threading
+import unicodedata
+from concurrent.futures import Future
+import requests
+from cache import PersistentTTLCache
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+USER_AGENT = "SlackWeatherBot/1.0"
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_location(location):
+    """Cache key for a place name: case-folded, punctuation dropped, whitespace collapsed."""
+    text = unicodedata.normalize("NFKC", location).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class Geocoder:
+    """
+    Nominatim lookups behind a persistent TTL cache.
+
+    Concurrent lookups of the same place share one request (single-flight), and
+    every cache miss goes through one worker thread that spaces requests at least
+    `min_interval` seconds apart, per Nominatim's usage policy. Places Nominatim
+    has no match for are cached too, for `negative_ttl` seconds, so a misspelt
+    name asked about repeatedly does not spend the rate limit each time.
+    """
+
+    def __init__(self, cache, min_interval=1.0, timeout=10, negative_ttl=3600):
+        self.cache = cache
+        self.min_interval = min_interval
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="geocoder", daemon=True)
+        self._worker.start()
+
+    def lookup(self, location, wait=60):
+        """Return (lat, lon) as strings, or None if Nominatim has no match."""
+        key = normalize_location(location)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logging.debug(f"Geocoding cache hit for '{key}'")
+            return tuple(cached) or None
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                self._queue.put((key, location, future))
+        return future.result(timeout=wait)
+
+    def _run(self):
+        last_request = 0.0
+        while True:
+            key, location, future = self._queue.get()
+            try:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    future.set_result(tuple(cached) or None)
+                    continue
+                delay = last_request + self.min_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                last_request = time.monotonic()
+                coordinates = self._fetch(location)
+                if coordinates:
+                    self.cache.set(key, list(coordinates))
+                elif coordinates is not None:
+                    self.cache.set(key, [], ttl=self.negative_ttl)
+                future.set_result(coordinates or None)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    def _fetch(self, location):
+        """(lat, lon), () when Nominatim has no match, or None when the request failed."""
+        logging.info(f"Querying OpenStreetMap for location: {location}")
+        response = requests.get(
+            NOMINATIM_URL,
+            params={"q": location, "format": "json", "limit": 1},
+            headers={"User-Agent": USER_AGENT},
+            timeout=self.timeout,
+        )
+        logging.info(f"OpenStreetMap response status: {response.status_code}, content length: {len(response.content)}")
+        if response.status_code != 200:
+            logging.error(f"Failed to fetch location data: {response.status_code} - {response.text[:200]}")
+            return None
+        results = response.json()
+        if not results:
+            logging.info(f"OpenStreetMap has no match for {location}")
+            return ()
+        lat, lon = results[0]["lat"], results[0]["lon"]
+        logging.info(f"Found coordinates for {location}: Lat {lat}, Lon {lon}")
+        return lat, lon
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+def get_geocoder():
+    """Process-wide Geocoder, configured from GEOCODE_CACHE_PATH / GEOCODE_CACHE_TTL / GEOCODE_NEGATIVE_TTL."""
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            path = os.environ.get("GEOCODE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "bolt_app_geocode.sqlite3"))
+            ttl = float(os.environ.get("GEOCODE_CACHE_TTL", 30 * 24 * 3600))
+            negative_ttl = float(os.environ.get("GEOCODE_NEGATIVE_TTL", 3600))
+            _geocoder = Geocoder(PersistentTTLCache(path, table="geocode", ttl=ttl), negative_ttl=negative_ttl)
+    return _geocoder
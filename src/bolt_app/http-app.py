@@ -5,6 +5,8 @@ import threading
 from slack_bolt import App
 from dotenv import load_dotenv
 import logging
+import capture
+import events
 from http.server import BaseHTTPRequestHandler, HTTPServer # <-- Import HTTP server modules
 
 # Load environment variables
@@ -59,6 +61,8 @@ if not os.environ.get("PING_URL"):
 
 def start_bot(bot_name, bot_token, ping_url, api_key):
     app = App(token=bot_token, raise_error_for_unhandled_request=True)
+    # Record received envelopes when CAPTURE_PATH is set (for replay.py)
+    capture.install(app, bot_name)
 
     @app.event("message")
     def handle_message_events(body, logger):
@@ -74,18 +78,8 @@ def start_bot(bot_name, bot_token, ping_url, api_key):
         print(json.dumps(body, indent=2))
         print("=" * 40)
 
-        channel_id = event.get("channel")
-        # Get timestamps from the event
-        ts = event.get("ts")
-        thread_ts = event.get("thread_ts")
-        session_id = str(channel_id + "-" + thread_ts if thread_ts else channel_id + "-" + ts)
-        event_str = json.dumps(event)  # Convert event to a JSON string
-        data = {
-            "input_value": event_str,
-            "input_type": "text",
-            "output_type": "text",
-            "session_id": session_id
-        }
+        session_id = events.session_id_for(event)
+        data = events.build_flow_payload(json.dumps(event), session_id)
         try:
             forward_event(data, ping_url, api_key, bot_name)
         except Exception as e:
@@ -95,12 +89,7 @@ def start_bot(bot_name, bot_token, ping_url, api_key):
     def handle_reaction_added_events(body, logger):
         logger.info(f"Reaction added event received for {bot_name}")
         event = body.get("event", {})
-        event_str = json.dumps(event)  # Convert event to a JSON string
-        data = {
-            "input_value": event_str,
-            "input_type": "text",
-            "output_type": "text"
-        }
+        data = events.build_flow_payload(json.dumps(event))
         forward_event(data, ping_url, api_key, bot_name)
     
     @app.error
@@ -125,7 +114,6 @@ def start_bot(bot_name, bot_token, ping_url, api_key):
 def forward_event(data, ping_url, api_key, bot_name):
     logging.info(f"forwarding the event to {bot_name}")
     logging.info(f"ping_url: {ping_url}")
-    logging.info(f"api_key snippet: {api_key[-10:]}")
     headers = {"Content-Type": "application/json"}
     if api_key:
         headers['x-api-key'] = api_key
@@ -0,0 +1,162 @@
+import atexit
+import logging
+import threading
+import itertools
+from concurrent import futures
+import aiohttp
+import metrics
+import async_runtime
+
+# Registry of Langflow runs still in flight, one per session_id.
+# A newer mention in the session, or an edit/delete of the message a run was
+# started for, supersedes that run: its HTTP request is cancelled and whatever
+# it would have returned is dropped.
+
+
+class Run:
+    def __init__(self, session_id, event_ts, generation, payload=None, sent=None):
+        self.session_id = session_id
+        # Every ts the run answers (several when debounced events were merged)
+        self.event_ts = frozenset([event_ts] if isinstance(event_ts, str) else event_ts)
+        self.generation = generation
+        # What to spool if the run is still going when the process shuts down, and the
+        # threading.Event post_json sets once the request body went out
+        self.payload = payload
+        self.sent = sent
+        self.future = None
+        self.superseded = None  # reason, once superseded
+
+
+class InflightRegistry:
+    def __init__(self, name="langflow"):
+        self.name = name
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._generations = itertools.count(1)
+
+    def start(self, session_id, event_ts, coro, on_done, payload=None, sent=None):
+        """
+        Run `coro` on the shared event loop as the current run for `session_id`,
+        superseding any earlier one. on_done(run, result) is called only if the run
+        finishes without being superseded; exceptions are passed as the result.
+        `payload` is spooled at shutdown only if `sent` (the Event given to post_json)
+        shows the request never reached Langflow.
+        """
+        with self._lock:
+            previous = self._runs.get(session_id)
+            run = Run(session_id, event_ts, next(self._generations), payload, sent)
+            self._runs[session_id] = run
+        if previous is not None:
+            self._supersede(previous, "newer")
+        metrics.inc(f"{self.name}_runs_started_total")
+
+        run.future = async_runtime.submit(coro)
+        run.future.add_done_callback(lambda future: self._finished(run, future, on_done))
+        if run.superseded:  # superseded before the future existed
+            run.future.cancel()
+        return run
+
+    def supersede(self, session_id, event_ts=None, reason="superseded"):
+        """Cancel the session's current run (only if it was started for `event_ts`, when given)."""
+        with self._lock:
+            run = self._runs.get(session_id)
+            if run is None or (event_ts is not None and event_ts not in run.event_ts):
+                return None
+            del self._runs[session_id]
+        self._supersede(run, reason)
+        return run
+
+    def _supersede(self, run, reason):
+        run.superseded = reason
+        metrics.inc(f"{self.name}_runs_superseded_total", reason=reason)
+        if run.future is not None and run.future.cancel():
+            metrics.inc(f"{self.name}_runs_cancelled_total", reason=reason)
+        logging.info(f"Superseded {self.name} run {run.generation} for session {run.session_id} ({reason})")
+
+    def _finished(self, run, future, on_done):
+        with self._lock:
+            if self._runs.get(run.session_id) is run:
+                del self._runs[run.session_id]
+        if future.cancelled():
+            return
+        if run.superseded:
+            # Finished before the cancel landed: drop the stale result
+            self.suppress(run)
+            return
+        error = future.exception()
+        on_done(run, error if error is not None else future.result())
+
+    def drain(self, timeout):
+        """
+        Wait up to `timeout` seconds for the runs in flight, then cancel the rest.
+        Returns the payloads of cancelled runs whose request was never sent (for
+        shutdown to spool); Langflow may already be running the others, and a
+        replay would answer twice.
+        """
+        with self._lock:
+            runs = list(self._runs.values())
+        futures.wait([run.future for run in runs if run.future is not None], timeout)
+        leftovers = []
+        for run in runs:
+            if run.future is not None and not run.future.done():
+                run.superseded = "shutdown"
+                run.future.cancel()
+                metrics.inc(f"{self.name}_runs_cancelled_total", reason="shutdown")
+                if run.payload is None:
+                    continue
+                if run.sent is not None and not run.sent.is_set():
+                    leftovers.append(run.payload)
+                else:
+                    metrics.inc(f"{self.name}_runs_abandoned_total")
+                    logging.warning(f"Not spooling {self.name} run {run.generation} for session {run.session_id}: "
+                                    "Langflow may already have accepted it")
+        return leftovers
+
+    def is_current(self, run):
+        """False once `run` was superseded or a newer run for its session started; check right before replying."""
+        with self._lock:
+            return run.superseded is None and self._runs.get(run.session_id) in (None, run)
+
+    def suppress(self, run):
+        metrics.inc(f"{self.name}_replies_suppressed_total", reason=run.superseded or "newer")
+        logging.info(f"Suppressed stale {self.name} result for session {run.session_id}")
+
+    def active(self):
+        with self._lock:
+            return len(self._runs)
+
+
+_session = None
+
+async def _on_request_chunk_sent(session, context, params):
+    sent = (context.trace_request_ctx or {}).get("sent")
+    if sent is not None:
+        sent.set()
+
+_trace = aiohttp.TraceConfig()
+_trace.on_request_chunk_sent.append(_on_request_chunk_sent)
+
+async def post_json(url, data, headers, timeout=5, sent=None):
+    """
+    POST `data` as JSON from the shared loop; returns (status, text). Cancelling aborts
+    the request. `sent` (a threading.Event) is set once the body has gone out.
+    """
+    global _session
+    if _session is None:
+        _session = aiohttp.ClientSession(trace_configs=[_trace])
+    client_timeout = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+    async with _session.post(url, json=data, headers=headers, timeout=client_timeout,
+                             trace_request_ctx={"sent": sent}) as response:
+        return response.status, await response.text()
+
+def close_session(timeout=2):
+    """Close the shared HTTP session. Call it last at shutdown, after the runs have been drained."""
+    if _session is not None and not _session.closed:
+        try:
+            async_runtime.run(_session.close(), timeout=timeout)
+        except Exception:
+            pass
+    return []
+
+# Last resort for processes without a shutdown coordinator; a no-op once a drain closed it
+atexit.register(close_session)
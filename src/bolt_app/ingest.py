@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+import metrics
+from routing import event_channel
+
+# Process-wide ingest stage for scripts that run several bots side by side.
+#
+# Every bot in a channel gets its own copy of each message over its own Socket
+# Mode connection. The hub recognises copies of one underlying event by
+# (team, channel, ts, type, subtype) and counts the later ones as duplicates per
+# channel. Each copy is dispatched only through the bot that received it, and only
+# to flow URLs no earlier copy was sent to, so bots forwarding to the same flow
+# share one request and no bot forwards an event it never received.
+#
+# A bot cares about a copy it received when:
+#   - it is an app_mention addressed to that bot (these are per-bot, never duplicates),
+#   - the bot subscribes to the channel (INGEST_SUBSCRIPTIONS_PATH: {"<bot>": ["C0123", ...] or "*"}),
+#   - or the bot's ROUTES_PATH table routes the event somewhere.
+# A bot with neither subscriptions nor routes configured cares about every copy it gets.
+#
+# Seen keys and per-channel counts are split across DEDUP_STRIPES lock stripes by
+# key, so bots claiming different events on their own threads do not contend.
+
+DEDUP_TTL = 600
+DEDUP_MAX_KEYS = 100000
+DEDUP_STRIPES = 16
+
+
+def dedup_key(body, event):
+    if not event:
+        # Interactive payloads, slash commands, ...: each is its own thing. Bolt does not
+        # pass the envelope_id on, so use the payload's own id (or none at all)
+        return ("payload", body.get("event_id") or body.get("trigger_id") or body.get("envelope_id") or uuid.uuid4().hex)
+    return (
+        body.get("team_id", ""),
+        event_channel(event),
+        event.get("ts") or event.get("event_ts", ""),
+        event.get("type", ""),
+        event.get("subtype", ""),
+    )
+
+
+class Seen:
+    __slots__ = ("first", "receivers", "urls")
+
+    def __init__(self, first):
+        self.first = first  # monotonic time of the first copy
+        self.receivers = set()  # bots that received a copy
+        self.urls = set()  # flow URLs a copy was already sent to
+
+
+class DedupStripe:
+    def __init__(self):
+        self.seen = OrderedDict()  # key -> Seen
+        self.channels = {}  # channel -> [events, duplicates]
+        self.lock = threading.Lock()
+
+
+class IngestHub:
+    def __init__(self, subscriptions=None, ttl=DEDUP_TTL, max_keys=DEDUP_MAX_KEYS, stripes=DEDUP_STRIPES):
+        self.subscriptions = subscriptions or {}
+        self.ttl = ttl
+        self.max_keys_per_stripe = max(1, max_keys // stripes)
+        self._bots = {}  # name -> router, replaced (never mutated) on register
+        self._stripes = [DedupStripe() for _ in range(stripes)]
+        self._register_lock = threading.Lock()
+
+    def register(self, bot_name, router):
+        with self._register_lock:
+            self._bots = {**self._bots, bot_name: router}
+
+    def receive(self, bot_name, body, event, build_payload):
+        """
+        Called by each bot for every event it receives. Returns what happened to it:
+        "duplicate", "uninterested", "dispatched" or "dropped" (no destination accepted it).
+        """
+        channel = event_channel(event)
+        router = self._bots[bot_name]
+        if event.get("type") == "app_mention":
+            metrics.inc("ingest_events_total", channel=channel)
+            destinations = router.lookup(event)
+        else:
+            first, seen, stripe = self._record(body, event, bot_name)
+            if seen is None:
+                return "duplicate"  # this bot already had this copy (a redelivery)
+            if not self.cares(bot_name, event, channel):
+                if first:
+                    metrics.inc("ingest_uninterested_total", channel=channel)
+                return "uninterested" if first else "duplicate"
+            with stripe.lock:
+                destinations = [d for d in router.lookup(event) if d.url not in seen.urls]
+                seen.urls.update(d.url for d in destinations)
+            if not destinations and not first:
+                return "duplicate"
+
+        if not destinations:
+            metrics.inc("ingest_uninterested_total", channel=channel)
+            return "uninterested"
+        data = build_payload(event)
+        dispatched = 0
+        for destination in destinations:
+            dispatched += destination.submit(data, bot_name)
+        return "dispatched" if dispatched else "dropped"
+
+    def claim(self, body, event):
+        """True for the first copy of an event, False (counted per channel) for later copies."""
+        first, _, _ = self._record(body, event)
+        return first
+
+    def _record(self, body, event, bot_name=None):
+        """
+        Count one copy of an event. Returns (first copy?, its Seen entry, stripe); the
+        entry is None when `bot_name` already received this copy.
+        """
+        channel = event_channel(event)
+        key = dedup_key(body, event)
+        now = time.monotonic()
+        stripe = self._stripes[hash(key) % len(self._stripes)]
+        with stripe.lock:
+            counts = stripe.channels.setdefault(channel, [0, 0])
+            seen = stripe.seen.get(key)
+            first = seen is None or now - seen.first >= self.ttl
+            if first:
+                counts[0] += 1
+                seen = stripe.seen[key] = Seen(now)
+                stripe.seen.move_to_end(key)
+                self._evict(stripe, now)
+            else:
+                counts[1] += 1
+            if bot_name is not None:
+                if bot_name in seen.receivers:
+                    seen = None
+                else:
+                    seen.receivers.add(bot_name)
+        metrics.inc("ingest_events_total" if first else "ingest_duplicates_total", channel=channel)
+        return first, seen, stripe
+
+    def drain(self, timeout):
+        """Stop every registered bot's forwards and wait up to `timeout` for running ones; returns the unstarted."""
+        end = time.monotonic() + timeout
+        destinations = [d for router in self._bots.values() for d in router.destinations.values()]
+        unstarted = [entry for destination in destinations for entry in destination.stop()]
+        for destination in destinations:
+            destination.wait(max(0.0, end - time.monotonic()))
+        return unstarted
+
+    def replay(self, entry):
+        """Forward an entry spooled by drain() through the bot that originally sent it."""
+        router = self._bots.get(entry["bot"])
+        if router is None:
+            logging.warning(f"Not replaying forward for unknown bot '{entry['bot']}'")
+            return False
+        return router.replay(entry)
+
+    def cares(self, bot_name, event, channel):
+        """Whether `bot_name` forwards an event it received."""
+        channels = self.subscriptions.get(bot_name)
+        if channels is not None:
+            return channels == "*" or channel in channels
+        router = self._bots[bot_name]
+        return not router.explicit or bool(router.lookup(event))
+
+    def _evict(self, stripe, now):
+        while stripe.seen:
+            key, seen = next(iter(stripe.seen.items()))
+            if now - seen.first < self.ttl and len(stripe.seen) <= self.max_keys_per_stripe:
+                break
+            stripe.seen.popitem(last=False)
+
+    def report(self):
+        """[(channel, events, duplicates)] sorted by duplicates, most first."""
+        totals = {}
+        for stripe in self._stripes:
+            with stripe.lock:
+                for channel, (events, duplicates) in stripe.channels.items():
+                    counts = totals.setdefault(channel, [0, 0])
+                    counts[0] += events
+                    counts[1] += duplicates
+        rows = [(channel, c[0], c[1]) for channel, c in totals.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def log_report(self):
+        for channel, events, duplicates in self.report():
+            if duplicates:
+                logging.info(f"Ingest: channel {channel or '-'} had {events} event(s) and {duplicates} duplicate copies")
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_hub():
+    """Process-wide IngestHub, with subscriptions from INGEST_SUBSCRIPTIONS_PATH if set."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            subscriptions = None
+            path = os.environ.get("INGEST_SUBSCRIPTIONS_PATH")
+            if path:
+                with open(path) as f:
+                    subscriptions = json.load(f)
+            _hub = IngestHub(subscriptions)
+            atexit.register(_hub.log_report)
+    return _hub
@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+
+# Local first pass in front of gpt_intent, on only when INTENT_MODEL_PATH points at a
+# trained model. Messages the model is confident about are classified in microseconds
+# and everything else goes to the LLM.
+#
+#   python src/bolt_app/intent_classifier.py train intents.jsonl --out intent_model.json
+#   python src/bolt_app/intent_classifier.py evaluate labelled.jsonl --model intent_model.json
+#
+# Training/evaluation files are JSONL with {"text": ..., "intent": "weather"|"chat"} per
+# line, optionally with "locations" (or a single "location") and "time". app.py appends the LLM's decisions in this
+# format to INTENT_LOG_PATH when it is set, so logged traffic can be used directly.
+
+DEFAULT_LOCATION = "University Heights, San Diego"
+DEFAULT_TIME = "today"
+
+# --- Patterns ---
+# The model has the final say; these only veto it. A message is not called weather
+# without any weather vocabulary, and not called chat if it has strong weather words.
+STRONG_WEATHER = re.compile(
+    r"\b(?:weather|forecast|temperature|temp|degrees|humidity|precipitation|"
+    r"rain(?:ing)?\s+(?:today|tonight|tomorrow|this|later)|"
+    r"(?:will|is|does)\s+it\s+(?:rain|snow|be\s+(?:hot|cold|warm|sunny|windy|cloudy)))\b"
+)
+WEAK_WEATHER = re.compile(
+    r"\b(?:rain\w*|snow\w*|sun\w*|cloud\w*|wind\w*|storm\w*|hot|cold|warm|chilly|"
+    r"umbrella|jacket|fog\w*|drizzle|humid|heat|freez\w*|outside|climate)\b"
+)
+TIME_PHRASE = re.compile(
+    r"\b(?P<time>right now|now|currently|today|this (?:morning|afternoon|evening|weekend)|"
+    r"tonight|overnight|tomorrow(?: night)?|"
+    r"(?:this |next )?(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)(?: night)?)\b"
+)
+# "in <place>", "for <place>", ... up to a time phrase or the end of the clause
+LOCATION = re.compile(
+    r"\b(?:in|at|for|near|around)\s+(?!(?:the\s+)?(?:morning|afternoon|evening|day|week|weekend|month|year)\b)"
+    r"(?!(?:this|next|last)\b)"
+    r"(?P<location>[a-z][\w .,'-]*?)\s*(?=\b(?:right now|now|today|tonight|tomorrow|this|next|on|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b|[?!.;]|$)"
+)
+_INNER_PREPOSITION = re.compile(r"\b(?:in|at|near|around)\s+")
+_LIST_SEPARATOR = re.compile(r"\s*(?:,|;|\band\b|&)\s*")
+_TOKEN = re.compile(r"[a-z']+")
+_NOT_PLACES = {"it", "me", "us", "you", "the weather", "weather", "a bit", "a while", "now", "today"}
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+def extract_time(text):
+    match = TIME_PHRASE.search(text.lower())
+    return match.group("time") if match else DEFAULT_TIME
+
+def extract_locations(text):
+    """
+    Places named after in/at/for/..., splitting lists like "denver, boston and austin".
+    Returns None when a piece looks like an abbreviation ("sf", "portland, or"):
+    expanding those is left to the LLM.
+    """
+    for match in LOCATION.finditer(text.lower()):
+        # "for the week in seattle" -> "seattle"
+        location = _INNER_PREPOSITION.split(match.group("location"))[-1]
+        places = [p.strip(" ,.'-") for p in _LIST_SEPARATOR.split(location)]
+        places = [p for p in places if p and p not in _NOT_PLACES]
+        if any(len(p) <= 3 for p in places):
+            return None
+        if places:
+            return [p.title() for p in places]
+    return [DEFAULT_LOCATION]
+
+
+# --- Model ---
+class NaiveBayes:
+    """Multinomial naive Bayes over word unigrams, small enough to ship as JSON."""
+
+    def __init__(self, class_counts=None, word_counts=None):
+        self.class_counts = class_counts or {}
+        self.word_counts = word_counts or {}
+        self._prepare()
+
+    def _prepare(self):
+        self.vocab = set()
+        for counts in self.word_counts.values():
+            self.vocab.update(counts)
+        total_docs = sum(self.class_counts.values()) or 1
+        self._log_prior = {c: math.log(n / total_docs) for c, n in self.class_counts.items()}
+        self._log_likelihood = {}
+        self._log_unseen = {}
+        for c, counts in self.word_counts.items():
+            denom = sum(counts.values()) + len(self.vocab)
+            self._log_likelihood[c] = {w: math.log((n + 1) / denom) for w, n in counts.items()}
+            self._log_unseen[c] = math.log(1 / denom)
+
+    @classmethod
+    def train(cls, samples):
+        class_counts, word_counts = Counter(), {}
+        for text, intent in samples:
+            class_counts[intent] += 1
+            word_counts.setdefault(intent, Counter()).update(tokenize(text))
+        return cls(dict(class_counts), {c: dict(w) for c, w in word_counts.items()})
+
+    def predict(self, text):
+        """(intent, probability) for the most likely class, or (None, 0.0) if untrained."""
+        if not self.class_counts:
+            return None, 0.0
+        tokens = [t for t in tokenize(text) if t in self.vocab]
+        scores = {}
+        for c, prior in self._log_prior.items():
+            likelihood, unseen = self._log_likelihood[c], self._log_unseen[c]
+            scores[c] = prior + sum(likelihood.get(t, unseen) for t in tokens)
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+    def to_dict(self):
+        return {"class_counts": self.class_counts, "word_counts": self.word_counts}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["class_counts"], data["word_counts"])
+
+
+# --- Classifier ---
+class IntentClassifier:
+    """
+    classify(text) returns a gpt_intent-style dict when confident, else None:
+    the model must reach `threshold`, a weather answer needs some weather
+    vocabulary and places the LLM would not have to expand, and a chat answer
+    must not contain strong weather words. Without a model everything is None.
+    """
+
+    def __init__(self, model=None, threshold=0.95):
+        self.model = model
+        self.threshold = threshold
+
+    def classify(self, text):
+        if self.model is None:
+            return None
+        text = text.lower()
+        intent, probability = self.model.predict(text)
+        if probability < self.threshold:
+            return None
+        strong = STRONG_WEATHER.search(text) is not None
+        if intent == "weather":
+            return self._weather(text) if strong or WEAK_WEATHER.search(text) else None
+        return None if strong else {"intent": "chat"}
+
+    def _weather(self, text):
+        locations = extract_locations(text)
+        if locations is None:
+            return None
+        return {"intent": "weather", "locations": locations, "time": extract_time(text)}
+
+
+_classifier = None
+_loaded = False
+_classifier_lock = threading.Lock()
+
+def get_classifier():
+    """
+    Process-wide classifier for the INTENT_MODEL_PATH model (threshold INTENT_CONFIDENCE), or None without one.
+    The model is loaded once; an unset path or a failed load is remembered too, so it is not retried per message.
+    """
+    global _classifier, _loaded
+    if _loaded:
+        return _classifier
+    with _classifier_lock:
+        if not _loaded:
+            path = os.environ.get("INTENT_MODEL_PATH")
+            if path:
+                try:
+                    model = NaiveBayes.load(path)
+                    logging.info(f"Loaded intent model from {path} ({len(model.vocab)} words)")
+                    _classifier = IntentClassifier(model, float(os.environ.get("INTENT_CONFIDENCE", 0.95)))
+                except Exception as e:
+                    logging.error(f"Could not load intent model from {path}, classifying with the LLM only: {e}")
+            _loaded = True
+    return _classifier
+
+_log_lock = threading.Lock()
+
+def log_intent(text, intent_data):
+    """Append an LLM-labelled message to INTENT_LOG_PATH (if set) for later training."""
+    path = os.environ.get("INTENT_LOG_PATH")
+    if not path or intent_data.get("intent") not in ("weather", "chat"):
+        return
+    record = dict(intent_data, text=text)
+    with _log_lock:
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+# --- Training / evaluation ---
+def read_samples(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def evaluate(classifier, samples):
+    decided = correct = location_hits = location_total = time_hits = time_total = 0
+    started = time.perf_counter()
+    for sample in samples:
+        result = classifier.classify(sample["text"])
+        if result is None:
+            continue
+        decided += 1
+        if result["intent"] != sample["intent"]:
+            continue
+        correct += 1
+        if result["intent"] == "weather":
+            expected = sample.get("locations") or ([sample["location"]] if sample.get("location") else None)
+            if expected:
+                location_total += 1
+                location_hits += [l.lower() for l in result["locations"]] == [l.lower() for l in expected]
+            if sample.get("time"):
+                time_total += 1
+                time_hits += result["time"].lower() == sample["time"].lower()
+    elapsed = time.perf_counter() - started
+    return {
+        "samples": len(samples),
+        "decided_locally": decided,
+        "llm_calls_avoided": decided / len(samples) if samples else 0.0,
+        "local_accuracy": correct / decided if decided else 0.0,
+        "location_accuracy": location_hits / location_total if location_total else None,
+        "time_accuracy": time_hits / time_total if time_total else None,
+        "us_per_message": elapsed / len(samples) * 1e6 if samples else 0.0,
+    }
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Train and evaluate the local intent classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_parser = sub.add_parser("train", help="fit the naive Bayes model on labelled JSONL")
+    train_parser.add_argument("samples")
+    train_parser.add_argument("--out", default="intent_model.json")
+    eval_parser = sub.add_parser("evaluate", help="report accuracy and LLM calls avoided")
+    eval_parser.add_argument("samples")
+    eval_parser.add_argument("--model", required=True, help="model JSON from `train`")
+    eval_parser.add_argument("--threshold", type=float, default=0.95)
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    samples = read_samples(args.samples)
+    if args.command == "train":
+        model = NaiveBayes.train((s["text"], s["intent"]) for s in samples)
+        with open(args.out, "w") as f:
+            json.dump(model.to_dict(), f)
+        print(f"Trained on {len(samples)} samples ({len(model.vocab)} words), saved to {args.out}")
+    else:
+        model = NaiveBayes.load(args.model)
+        report = evaluate(IntentClassifier(model, args.threshold), samples)
+        for key, value in report.items():
+            if isinstance(value, float):
+                value = f"{value:.1f}" if key == "us_per_message" else f"{value:.1%}"
+            print(f"{key:<20}{value}")
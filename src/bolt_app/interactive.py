@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from slack_sdk.socket_mode.response import SocketModeResponse
+import metrics
+import events
+import shutdown
+from callbacks import result_text
+
+# Socket Mode requests of every type, not just Events API callbacks.
+#
+# Each request is acked on the Socket Mode thread before anything else happens.
+# Slash commands can carry an ephemeral INTERACTIVE_WORKING_TEXT in the ack
+# (default "Working…"; empty turns it off). The work then goes to a pool for its kind:
+#   events, slash_commands, block_actions, shortcuts, view_submissions
+# sized by INTERACTIVE_POOLS ("block_actions=8,events=4,..."), so a burst of long
+# conversational runs never queues button clicks. For everything except events, the
+# flow's answer is posted to the request's response_url (or DMed to the user when
+# there is none, as for global shortcuts and modal submissions). If the flow fails,
+# times out or answers with something other than JSON, INTERACTIVE_ERROR_TEXT goes
+# there instead.
+#
+# Once drain() has been called (shutdown), requests are no longer acked, so Slack
+# redelivers them to another connection; queued work that never started is returned
+# as spool entries ({"bot", "kind", "payload"}) for replay() on the next instance.
+
+DEFAULT_POOLS = {"events": 4, "slash_commands": 4, "block_actions": 8, "shortcuts": 4, "view_submissions": 4}
+DEFAULT_WORKING_TEXT = "Working…"
+DEFAULT_ERROR_TEXT = "Sorry, something went wrong. Please try again."
+
+
+def request_kind(req_type, payload):
+    if req_type == "events_api":
+        return "events"
+    if req_type == "slash_commands":
+        return "slash_commands"
+    interactive_type = payload.get("type")
+    if interactive_type == "block_actions":
+        return "block_actions"
+    if interactive_type in ("shortcut", "message_action"):
+        return "shortcuts"
+    if interactive_type == "view_submission":
+        return "view_submissions"
+    return None
+
+def flow_input(kind, payload):
+    """The parts of an interactive payload a flow needs, as the input_value dict."""
+    user = payload.get("user_id") or (payload.get("user") or {}).get("id")
+    channel = payload.get("channel_id") or (payload.get("channel") or {}).get("id")
+    if kind == "slash_commands":
+        return {"kind": kind, "command": payload.get("command"), "text": payload.get("text", ""),
+                "user": user, "channel": channel}
+    if kind == "block_actions":
+        actions = [{key: action.get(key) for key in ("action_id", "block_id", "value", "selected_option")
+                    if action.get(key) is not None} for action in payload.get("actions", [])]
+        return {"kind": kind, "actions": actions, "user": user, "channel": channel,
+                "message_ts": (payload.get("message") or {}).get("ts")}
+    if kind == "shortcuts":
+        return {"kind": kind, "callback_id": payload.get("callback_id"), "user": user, "channel": channel,
+                "message": (payload.get("message") or {}).get("text")}
+    view = payload.get("view") or {}
+    return {"kind": kind, "callback_id": view.get("callback_id"), "user": user,
+            "values": (view.get("state") or {}).get("values", {})}
+
+def session_for(kind, payload):
+    """One Langflow session per user per channel, so follow-up clicks share context."""
+    user = payload.get("user_id") or (payload.get("user") or {}).get("id") or "unknown"
+    channel = payload.get("channel_id") or (payload.get("channel") or {}).get("id") or "dm"
+    return f"{channel}-{user}"
+
+
+class Dispatcher:
+    def __init__(self, bot_name, ping_url, web_client, on_event, api_key=None, pools=None,
+                 working_text=DEFAULT_WORKING_TEXT, error_text=DEFAULT_ERROR_TEXT, timeout=60):
+        self.bot_name = bot_name
+        self.ping_url = ping_url
+        self.web_client = web_client
+        self.on_event = on_event
+        self.working_text = working_text
+        self.error_text = error_text
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["x-api-key"] = api_key
+        sizes = {**DEFAULT_POOLS, **(pools or {})}
+        self._pools = {kind: shutdown.SpoolingExecutor(size, thread_name_prefix=f"{bot_name}-{kind}")
+                       for kind, size in sizes.items()}
+        self.draining = False
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=sum(sizes.values()))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def handle(self, client, req):
+        """Socket Mode request listener: ack now, do the work on the kind's pool."""
+        started = time.perf_counter()
+        if self.draining:
+            metrics.inc("shutdown_rejected_envelopes_total", bot=self.bot_name)
+            return  # not acked: Slack retries elsewhere
+        kind = request_kind(req.type, req.payload)
+        ack = None
+        if kind == "slash_commands" and self.working_text:
+            ack = {"response_type": "ephemeral", "text": self.working_text}
+        client.send_socket_mode_response(SocketModeResponse(envelope_id=req.envelope_id, payload=ack))
+        logging.debug(f"({self.bot_name}) Acked {req.type} in {(time.perf_counter() - started) * 1000:.1f}ms")
+        if kind is None:
+            metrics.inc("interactive_ignored_total", bot=self.bot_name, type=req.payload.get("type", req.type))
+            return
+        metrics.inc("interactive_requests_total", bot=self.bot_name, kind=kind)
+        self._submit(kind, req.payload)
+
+    def _submit(self, kind, payload):
+        entry = {"bot": self.bot_name, "kind": kind, "payload": payload}
+        if kind == "events":
+            return self._pools[kind].submit(entry, self._safely, kind, self.on_event, payload)
+        return self._pools[kind].submit(entry, self._safely, kind, self._respond, kind, payload)
+
+    def stop(self):
+        """Stop acking requests and starting work; returns the spool entries of work that never started."""
+        self.draining = True
+        return [entry for pool in self._pools.values() for entry in pool.stop()]
+
+    def wait(self, timeout):
+        """Wait up to `timeout` for work already running."""
+        end = time.monotonic() + timeout
+        for kind, pool in self._pools.items():
+            if not pool.wait(max(0.0, end - time.monotonic())):
+                logging.warning(f"({self.bot_name}) {kind} work still running after the drain deadline")
+
+    def drain(self, timeout):
+        unstarted = self.stop()
+        self.wait(timeout)
+        return unstarted
+
+    def replay(self, entry):
+        """Run a request spooled by another instance's drain()."""
+        return self._submit(entry["kind"], entry["payload"])
+
+    def _safely(self, kind, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            metrics.inc("interactive_failed_total", bot=self.bot_name, kind=kind)
+            logging.error(f"({self.bot_name}) Error handling {kind}: {e}")
+
+    def _respond(self, kind, payload):
+        response_url = payload.get("response_url") or next(
+            (r.get("response_url") for r in payload.get("response_urls", []) if r.get("response_url")), None)
+        # No interim message for block actions: their response_url's replace_original targets
+        # the clicked message, so a "Working…" posted beside it could never be replaced
+        data = events.build_flow_payload(json.dumps(flow_input(kind, payload)), session_for(kind, payload))
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.ping_url, headers=self.headers, json=data, timeout=self.timeout)
+            if response.status_code < 200 or response.status_code >= 300:
+                raise RuntimeError(f"flow returned {response.status_code}: {response.text[:200]}")
+            text = result_text(response.json()) or "Done."
+        except Exception:
+            # Otherwise the user is left looking at "Working…", or at nothing
+            try:
+                self._deliver(kind, payload, response_url, self.error_text)
+            except Exception as e:
+                logging.warning(f"({self.bot_name}) Could not tell the user their {kind} failed: {e}")
+            raise
+        logging.info(f"({self.bot_name}) {kind} flow run took {(time.perf_counter() - started) * 1000:.0f}ms")
+        self._deliver(kind, payload, response_url, text)
+        metrics.inc("interactive_responded_total", bot=self.bot_name, kind=kind)
+
+    def _deliver(self, kind, payload, response_url, text):
+        if response_url:
+            # Replaces the slash command's "Working…" ephemeral; other kinds get a new message
+            self._post_response(response_url, text, replace=kind == "slash_commands" and bool(self.working_text))
+        else:
+            user = payload.get("user_id") or (payload.get("user") or {}).get("id")
+            self.web_client.chat_postMessage(channel=user, text=text)
+
+    def _post_response(self, response_url, text, replace):
+        body = {"response_type": "ephemeral", "text": text, "replace_original": replace}
+        response = self.session.post(response_url, json=body, timeout=10)
+        if response.status_code >= 300:
+            logging.warning(f"({self.bot_name}) response_url returned {response.status_code}: {response.text[:200]}")
+
+
+def pool_sizes(spec):
+    """"block_actions=8,events=4" -> {"block_actions": 8, "events": 4}"""
+    sizes = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        kind, _, size = part.partition("=")
+        if kind not in DEFAULT_POOLS:
+            raise ValueError(f"Unknown request kind '{kind}' in INTERACTIVE_POOLS")
+        sizes[kind] = int(size)
+    return sizes
+
+def from_env(bot_name, ping_url, web_client, on_event, api_key=None):
+    return Dispatcher(
+        bot_name, ping_url, web_client, on_event, api_key=api_key,
+        pools=pool_sizes(os.environ.get("INTERACTIVE_POOLS", "")),
+        working_text=os.environ.get("INTERACTIVE_WORKING_TEXT", DEFAULT_WORKING_TEXT),
+        error_text=os.environ.get("INTERACTIVE_ERROR_TEXT", DEFAULT_ERROR_TEXT),
+        timeout=float(os.environ.get("INTERACTIVE_FLOW_TIMEOUT", 60)),
+    )
@@ -2,6 +2,7 @@ import os
 import requests
 from slack_bolt import App
 from dotenv import load_dotenv
+import callbacks
 
 # Load environment variables
 load_dotenv()
@@ -12,12 +13,18 @@ app = App(
     signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
 )
 
+# WEBHOOK_CALLBACKS=true: the flow posts its result back to us and we reply in the thread
+pending_replies = callbacks.start(app.client)
+
 # When the bot is mentioned, send user text to API endpoint
 @app.event("message")
 def handle_mention(body, say):
     # Extract the user's message (remove the bot mention)
     event = body.get("event", {})
     user_text = event["text"]
+    payload = {"text": user_text}
+    if pending_replies is not None:
+        payload.update(pending_replies.correlate(event))
     
     # Define the API endpoint
     api_url = "https://6daa-2600-1700-420-354f-1434-30ca-3f3d-a54b.ngrok-free.app/api/v1/webhook/55d380d6-5107-4ed9-b7be-fcd82f053f1a"  # Replace with your actual API endpoint
@@ -29,17 +36,20 @@ def handle_mention(body, say):
             headers={
                 "Content-Type": "application/json"
             },
-            json={"text": user_text}
+            json=payload
         )
         
         # Check if the request was successful
         if response.status_code == 202:
             print("Message sent to API successfully")
-        else:
-            say(f"Sorry, there was an error sending your message to the API: {response.status_code}")
+            return
+        say(f"Sorry, there was an error sending your message to the API: {response.status_code}")
         
     except Exception as e:
         say(f"Sorry, couldn't send your message to the API: {str(e)}")
+    # The webhook didn't take the run, so no callback is coming
+    if pending_replies is not None:
+        pending_replies.discard(payload["correlation_id"])
 
 # Start your app
 if __name__ == "__main__":
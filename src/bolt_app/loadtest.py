@@ -0,0 +1,261 @@
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import inspect
+import logging
+import argparse
+import threading
+import contextlib
+import importlib.util
+from fakes import FakeSlack, FakeLangflow, Timeline
+
+# Load-test harness: drives a real bot entry point (start_bot in one of the
+# Socket Mode app variants) against FakeSlack and FakeLangflow and reports
+# throughput plus per-stage latency percentiles.
+#
+#   python src/bolt_app/loadtest.py --app test.py --bots 2 --rate 50 --duration 20 \
+#       --shape burst --burst-size 40 --burst-every 2 --latency lognormal:0.2,0.6 --error-rate 0.02
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Stage name -> (start mark, end mark) on the Timeline
+STAGES = {
+    "ack": ("sent", "acked"),
+    "dispatch": ("sent", "flow_received"),
+    "langflow": ("flow_received", "flow_done"),
+    "end_to_end": ("sent", "flow_done"),
+}
+
+
+# --- Loading App Variants ---
+def load_app_module(path, fake_slack, env=None):
+    """
+    Import one of the hyphenated app scripts as a module, with every Bolt App it
+    creates wired to `fake_slack` instead of slack.com.
+    """
+    import slack_bolt
+    from slack_sdk import WebClient
+
+    os.environ.update(env or {})
+    real_app = slack_bolt.App
+
+    def App(*args, token=None, client=None, **kwargs):
+        if client is None:
+            client = WebClient(token=token, base_url=fake_slack.api_url)
+        return real_app(*args, client=client, **kwargs)
+
+    if not os.path.isabs(path):
+        path = os.path.join(HERE, path)
+    name = "bot_under_test_" + os.path.splitext(os.path.basename(path))[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    slack_bolt.App = App
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        slack_bolt.App = real_app
+    return module
+
+def start_bots(module, count, ping_url, api_key="fake-flow-key"):
+    """Run module.start_bot in `count` daemon threads, one per fake bot."""
+    accepted = inspect.signature(module.start_bot).parameters
+    threads = []
+    for i in range(count):
+        kwargs = {
+            "bot_name": f"LoadBot{i}",
+            "bot_token": f"xoxb-fake-{i}",
+            "app_token": f"xapp-fake-{i}",
+            "ping_url": ping_url,
+            "api_key": api_key,
+        }
+        kwargs = {k: v for k, v in kwargs.items() if k in accepted}
+        thread = threading.Thread(target=module.start_bot, kwargs=kwargs, name=f"bot-LoadBot{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+# --- Synthetic Traffic ---
+def arrival_offsets(shape, rate, duration, burst_size=None, burst_every=1.0):
+    """Seconds-from-start at which each event is sent, for a given traffic shape."""
+    if shape == "steady":
+        return [i / rate for i in range(int(rate * duration))]
+    if shape == "poisson":
+        offsets, t = [], random.expovariate(rate)
+        while t < duration:
+            offsets.append(t)
+            t += random.expovariate(rate)
+        return offsets
+    if shape == "burst":
+        size = burst_size or max(1, int(rate * burst_every))
+        return [b * burst_every for b in range(int(duration / burst_every)) for _ in range(size)]
+    if shape == "ramp":
+        # Rate climbs linearly from 0 to 2*rate, averaging `rate` over the run
+        total = int(rate * duration)
+        return [duration * (i / total) ** 0.5 for i in range(total)]
+    raise ValueError(f"Unknown traffic shape: {shape}")
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+def make_event(kind, seq, channel="C00000001", user="U0000HUMAN", text_size=120):
+    """A realistic-looking event of the given type, stamped with a unique event_ts."""
+    event_ts = f"{int(time.time())}.{seq:06d}"
+    text = ("lorem ipsum dolor sit amet " * (text_size // 27 + 1))[:text_size]
+    if kind == "app_mention":
+        return {
+            "type": "app_mention", "user": user, "text": f"<@U0FAKEBOT> {text}", "ts": event_ts,
+            "client_msg_id": f"00000000-0000-0000-0000-{seq:012d}", "team": "T00000001",
+            "channel": channel, "event_ts": event_ts,
+            "blocks": [{"type": "rich_text", "block_id": "b1", "elements": [{"type": "rich_text_section",
+                        "elements": [{"type": "user", "user_id": "U0FAKEBOT"}, {"type": "text", "text": f" {text}"}]}]}],
+        }
+    if kind == "message":
+        return {
+            "type": "message", "user": user, "text": text, "ts": event_ts, "team": "T00000001",
+            "channel": channel, "event_ts": event_ts, "channel_type": "channel",
+        }
+    if kind == "reaction_added":
+        return {
+            "type": "reaction_added", "user": user, "reaction": "thumbsup", "item_user": user,
+            "item": {"type": "message", "channel": channel, "ts": f"{int(time.time()) - 60}.000100"},
+            "event_ts": event_ts,
+        }
+    raise ValueError(f"Unknown event type: {kind}")
+
+def make_payload(event, seq):
+    """Wrap an event in the Events API callback body Slack sends over Socket Mode."""
+    return {
+        "token": "fake-verification-token", "team_id": "T00000001", "api_app_id": "A0FAKE",
+        "event": event, "type": "event_callback", "event_id": f"Ev{seq:010d}",
+        "event_time": int(time.time()), "is_ext_shared_channel": False,
+        "authorizations": [{"enterprise_id": None, "team_id": "T00000001", "user_id": "U0FAKEBOT",
+                            "is_bot": True, "is_enterprise_install": False}],
+    }
+
+async def drive_traffic(fake_slack, offsets, mix, text_size=120):
+    kinds, weights = list(mix), list(mix.values())
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for seq, offset in enumerate(offsets):
+        delay = start + offset - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        event = make_event(random.choices(kinds, weights)[0], seq, text_size=text_size)
+        await fake_slack.send_envelope(make_payload(event, seq), key=event["event_ts"])
+
+
+# --- Reporting ---
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def summarize(timeline, label=""):
+    """Throughput and p50/p95/p99 (ms) per stage from a Timeline."""
+    events = timeline.snapshot()
+    sent = [marks["sent"] for marks in events.values() if "sent" in marks]
+    first_sent = min(sent) if sent else 0.0
+    summary = {"label": label, "sent": len(sent), "stages": {}, "throughput": {}}
+
+    for stage, (start_mark, end_mark) in STAGES.items():
+        durations = [(m[end_mark] - m[start_mark]) * 1000 for m in events.values() if start_mark in m and end_mark in m]
+        summary["stages"][stage] = {
+            "count": len(durations),
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+            "p99_ms": percentile(durations, 99),
+            "max_ms": max(durations) if durations else None,
+        }
+
+    for mark in ("sent", "acked", "flow_received", "flow_done"):
+        times = [m[mark] for m in events.values() if mark in m]
+        span = (max(times) - first_sent) if times else 0.0
+        summary["throughput"][f"{mark}_per_sec"] = len(times) / span if span > 0 else None
+    summary["flow_failed"] = sum(1 for m in events.values() if "flow_failed" in m)
+    return summary
+
+def format_report(summary):
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+    lines = [f"=== Load report {summary['label']} ===", f"events sent: {summary['sent']}  flow failures: {summary['flow_failed']}"]
+    lines.append("throughput (events/sec): " + "  ".join(f"{k}={fmt(v)}" for k, v in summary["throughput"].items()))
+    lines.append(f"{'stage':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, s in summary["stages"].items():
+        lines.append(f"{stage:<12}{s['count']:>8}{fmt(s['p50_ms']):>10}{fmt(s['p95_ms']):>10}{fmt(s['p99_ms']):>10}{fmt(s['max_ms']):>10}")
+    return "\n".join(lines)
+
+
+# --- Harness ---
+@contextlib.contextmanager
+def quieted(enabled):
+    """Silence the bots' print/log chatter so it doesn't dominate the run."""
+    if not enabled:
+        yield
+        return
+    previous = logging.root.level
+    logging.root.setLevel(logging.ERROR)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+    logging.root.setLevel(previous)
+
+def run(args):
+    timeline = Timeline()
+    fake_slack = FakeSlack(timeline=timeline).start()
+    fake_langflow = FakeLangflow(timeline=timeline, latency=args.latency, error_rate=args.error_rate).start()
+    ping_url = fake_langflow.run_url()
+    env = {
+        "FLOW_API_KEY": "fake-flow-key", "BOT_NAME": "LoadBot0", "BOT_TOKEN": "xoxb-fake-0",
+        "APP_TOKEN": "xapp-fake-0", "PING_URL": ping_url,
+    }
+
+    with quieted(args.quiet):
+        module = load_app_module(args.app, fake_slack, env)
+        start_bots(module, args.bots, ping_url)
+        if not fake_slack.wait_for_connections(args.bots):
+            raise RuntimeError(f"Only {len(fake_slack.connections)} of {args.bots} bots connected")
+
+        offsets = arrival_offsets(args.shape, args.rate, args.duration, args.burst_size, args.burst_every)
+        fake_slack.submit(drive_traffic(fake_slack, offsets, parse_mix(args.mix), args.text_size)).result()
+        time.sleep(args.drain)
+
+    summary = summarize(timeline, label=f"{args.app} bots={args.bots} shape={args.shape} rate={args.rate}/s")
+    summary["langflow_requests"] = fake_langflow.requests
+    # The fakes and bot threads are daemons; they go away with the process.
+    return summary
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Load-test a bot entry point against fake Slack and Langflow.")
+    parser.add_argument("--app", default="test.py", help="app variant exposing start_bot (default: test.py)")
+    parser.add_argument("--bots", type=int, default=1, help="number of bot threads / Socket Mode connections")
+    parser.add_argument("--rate", type=float, default=20.0, help="average events per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of traffic to send")
+    parser.add_argument("--shape", default="steady", choices=["steady", "poisson", "burst", "ramp"])
+    parser.add_argument("--burst-size", type=int, default=None, help="events per burst (shape=burst)")
+    parser.add_argument("--burst-every", type=float, default=1.0, help="seconds between bursts (shape=burst)")
+    parser.add_argument("--mix", default="app_mention=0.5,message=0.4,reaction_added=0.1")
+    parser.add_argument("--text-size", type=int, default=120, help="characters of message text per event")
+    parser.add_argument("--latency", default="lognormal:0.2,0.5", help="fake Langflow latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Langflow runs that fail")
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds to wait for in-flight work after sending")
+    parser.add_argument("--json", help="also write the summary as JSON to this path")
+    parser.add_argument("--quiet", action="store_true", help="suppress bot stdout/log output during the run")
+    return parser
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args()
+    summary = run(args)
+    print(format_report(summary))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    sys.exit(0)
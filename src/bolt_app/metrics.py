@@ -0,0 +1,67 @@
+import threading
+
+# Process-wide counters, exposed in Prometheus text format at /metrics on the
+# bots' health check servers.
+#
+#   metrics.inc("langflow_runs_superseded_total", reason="edited")
+#
+# Counters are split across lock stripes picked by the calling thread's id, so
+# bots incrementing on different threads rarely contend (and do not serialise
+# on one lock under the free-threaded build). Reads add the stripes up.
+
+STRIPES = 16
+
+
+class _Stripe:
+    __slots__ = ("lock", "counters")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+
+_stripes = [_Stripe() for _ in range(STRIPES)]
+
+
+def inc(name, amount=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    stripe = _stripes[threading.get_native_id() % STRIPES]
+    with stripe.lock:
+        stripe.counters[key] = stripe.counters.get(key, 0) + amount
+
+def get(name, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    total = 0
+    for stripe in _stripes:
+        with stripe.lock:
+            total += stripe.counters.get(key, 0)
+    return total
+
+def snapshot():
+    """{(name, ((label, value), ...)): count} copy of every counter."""
+    totals = {}
+    for stripe in _stripes:
+        with stripe.lock:
+            counters = list(stripe.counters.items())
+        for key, value in counters:
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+def render():
+    lines = []
+    for (name, labels), value in sorted(snapshot().items()):
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def handle_metrics_request(handler):
+    """Serve GET /metrics from a BaseHTTPRequestHandler. Returns True if it handled the request."""
+    if handler.path.split("?", 1)[0] != "/metrics":
+        return False
+    body = render().encode()
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+    return True
@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import time
+import timeit
+import logging
+import argparse
+import platform
+import tracemalloc
+import events
+from capture import read_capture
+from loadtest import make_event, make_payload
+
+# Microbenchmarks for the per-event work our handlers do before any I/O.
+#
+#   python src/bolt_app/microbench.py run --capture traffic.jsonl.gz --out baseline.json
+#   python src/bolt_app/microbench.py run --out current.json
+#   python src/bolt_app/microbench.py compare baseline.json current.json --threshold 10
+#
+# Memory is the tracemalloc peak while one op runs (peak_bytes_per_op), not an
+# allocation count; compare gates on it as well as on time (--alloc-threshold).
+
+MIN_PEAK_DELTA = 256  # bytes; peaks this close are tracemalloc noise, not a regression
+
+
+# --- Payloads ---
+def synthetic_payloads():
+    """Small/medium/large app_mention bodies when no capture is available."""
+    payloads = {}
+    for label, size in (("small", 80), ("medium", 4000), ("large", 40000)):
+        event = make_event("app_mention", 1, text_size=size)
+        if label != "small":
+            event["thread_ts"] = event["ts"]
+        payloads[label] = make_payload(event, 1)
+    return payloads
+
+def captured_payloads(path):
+    """Smallest, median and largest captured event bodies, labelled by size."""
+    bodies = [r["body"] for r in read_capture(path) if isinstance(r["body"].get("event"), dict)]
+    if not bodies:
+        raise ValueError(f"No event bodies found in {path}")
+    bodies.sort(key=lambda b: len(json.dumps(b)))
+    picks = {"small": bodies[0], "medium": bodies[len(bodies) // 2], "large": bodies[-1]}
+    return {f"{label}-{len(json.dumps(body))}B": body for label, body in picks.items()}
+
+
+# --- Stages ---
+def build_bolt_app():
+    """A Bolt app with no network: fixed authorization, no signature checks, inline listeners."""
+    from slack_bolt import App
+    from slack_bolt.authorization import AuthorizeResult
+
+    def authorize(enterprise_id, team_id, user_id):
+        return AuthorizeResult(enterprise_id=enterprise_id, team_id=team_id, bot_token="xoxb-bench",
+                               bot_id="B0BENCH", bot_user_id="U0BENCH")
+
+    app = App(authorize=authorize, signing_secret="bench", request_verification_enabled=False,
+              process_before_response=True)
+
+    @app.event("app_mention")
+    def handle_app_mention_events(body):
+        pass
+
+    @app.event("message")
+    def handle_message_events(body):
+        pass
+
+    @app.event("reaction_added")
+    def handle_reaction_added_events(body):
+        pass
+
+    return app
+
+def stages_for(body, app, sink):
+    """Zero-argument callables for each hot-path stage, bound to one payload."""
+    from slack_bolt import BoltRequest
+
+    event = body.get("event", {})
+    event_str = json.dumps(event)
+    has_session = "channel" in event and ("ts" in event or "thread_ts" in event)
+    session_id = events.session_id_for(event) if has_session else None
+
+    def log_everything():
+        print("=" * 40, file=sink)
+        print(f"📦 Incoming payload:", file=sink)
+        print(json.dumps(body, indent=2), file=sink)
+        print("=" * 40, file=sink)
+
+    stages = {
+        "json_dumps": lambda: json.dumps(event),
+        "data_build": lambda: events.build_flow_payload(event_str, session_id),
+        "bolt_dispatch": lambda: app.dispatch(BoltRequest(body=body, mode="socket_mode")),
+        "log_everything": log_everything,
+    }
+    if has_session:
+        stages["session_id"] = lambda: events.session_id_for(event)
+    return stages
+
+
+# --- Measurement ---
+def measure(fn, repeat=5):
+    """Best-of-`repeat` ns/op, plus the peak traced memory during one op."""
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=loops))
+    fn()  # warm caches before tracing allocations
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ns_per_op": best / loops * 1e9, "peak_bytes_per_op": peak - before, "loops": loops}
+
+def run(args):
+    payloads = captured_payloads(args.capture) if args.capture else synthetic_payloads()
+    logging.getLogger("slack_bolt").setLevel(logging.WARNING)
+    app = build_bolt_app()
+    results = {}
+    with open(os.devnull, "w") as sink:
+        for label, body in payloads.items():
+            for stage, fn in stages_for(body, app, sink).items():
+                if args.stage and stage not in args.stage:
+                    continue
+                results[f"{label}/{stage}"] = measure(fn, repeat=args.repeat)
+                r = results[f"{label}/{stage}"]
+                print(f"{label + '/' + stage:<36}{r['ns_per_op']:>14,.0f} ns/op{r['peak_bytes_per_op']:>12,} peak B/op")
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "payloads": args.capture or "synthetic",
+        },
+        "results": results,
+    }
+
+
+# --- Comparison ---
+def peak_bytes(result):
+    # Result files written before the rename call it alloc_bytes_per_op
+    return result.get("peak_bytes_per_op", result.get("alloc_bytes_per_op", 0))
+
+def compare(baseline, current, threshold, alloc_threshold=10.0):
+    """Return (rows, regressions) comparing two result files; thresholds are percentages."""
+    rows, regressions = [], []
+    for key, base in baseline["results"].items():
+        new = current["results"].get(key)
+        if new is None:
+            continue
+        change = (new["ns_per_op"] / base["ns_per_op"] - 1) * 100
+        peak_change = peak_bytes(new) - peak_bytes(base)
+        slower = change > threshold
+        bigger = peak_change > max(MIN_PEAK_DELTA, peak_bytes(base) * alloc_threshold / 100)
+        rows.append((key, base["ns_per_op"], new["ns_per_op"], change, peak_change, slower, bigger))
+        if slower or bigger:
+            regressions.append(key)
+    return rows, regressions
+
+def print_comparison(rows):
+    print(f"{'stage':<36}{'base ns':>12}{'new ns':>12}{'change':>10}{'peak Δ B':>12}")
+    for key, base, new, change, peak_change, slower, bigger in rows:
+        reasons = [name for name, hit in (("time", slower), ("memory", bigger)) if hit]
+        flag = f"  REGRESSED ({', '.join(reasons)})" if reasons else ""
+        print(f"{key:<36}{base:>12,.0f}{new:>12,.0f}{change:>+9.1f}%{peak_change:>+12,}{flag}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Per-event hot path microbenchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="measure every stage and optionally save the results")
+    run_parser.add_argument("--capture", help="capture.py file to draw real payloads from")
+    run_parser.add_argument("--out", help="write results JSON (e.g. a new baseline) here")
+    run_parser.add_argument("--stage", action="append", help="only run this stage (repeatable)")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    cmp_parser = sub.add_parser("compare", help="flag stages that regressed against a baseline")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("current")
+    cmp_parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    cmp_parser.add_argument("--alloc-threshold", type=float, default=10.0,
+                            help="allowed growth of peak bytes per op in percent")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    if args.command == "run":
+        output = run(args)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(output, f, indent=2)
+            print(f"Saved results to {args.out}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows, regressions = compare(baseline, current, args.threshold, args.alloc_threshold)
+        print_comparison(rows)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed past the thresholds: {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions.")
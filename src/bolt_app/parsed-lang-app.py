@@ -6,6 +6,10 @@ from slack_bolt.adapter.socket_mode import SocketModeHandler
 from dotenv import load_dotenv
 import logging
 from typing import Dict, Any
+import capture
+import callbacks
+import passthrough
+import routing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -21,6 +25,12 @@ app = App(
     signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
 )
 
+# Record received envelopes when CAPTURE_PATH is set (for replay.py)
+capture.install(app, "parsed-lang-app")
+
+# WEBHOOK_CALLBACKS=true: the flow posts its result back to us and we reply in the thread
+pending_replies = callbacks.start(app.client)
+
 # URL to forward events to
 FORWARD_URL = "https://05ec-2600-1700-420-354f-dd5f-f782-279b-810f.ngrok-free.app/api/v1/webhook/d4af7968-6fa2-44b5-9ea9-da2fe59662e7"
 
@@ -29,6 +39,7 @@ def forward_event(payload: Dict[str, Any]) -> Dict[str, Any]:
     Forward the event payload to the specified URL.
     Returns the response from the forwarded request.
     """
+    correlation_id = payload.get("correlation_id") if pending_replies is not None else None
     try:
         logger.info(f"Forwarding event to {FORWARD_URL}")
         logger.info(f"Payload keys: {list(payload.keys())}")
@@ -41,6 +52,9 @@ def forward_event(payload: Dict[str, Any]) -> Dict[str, Any]:
         )
         
         logger.info(f"Response status code: {response.status_code}")
+        if correlation_id and response.status_code != 202:
+            # The webhook didn't take the run, so no callback is coming
+            pending_replies.discard(correlation_id)
         
         # Try to parse response as JSON
         try:
@@ -53,8 +67,16 @@ def forward_event(payload: Dict[str, Any]) -> Dict[str, Any]:
             
     except Exception as e:
         logger.error(f"Error forwarding event: {str(e)}")
+        if correlation_id:
+            pending_replies.discard(correlation_id)
         return {"error": str(e)}
 
+def with_callback(body: Dict[str, Any]) -> Dict[str, Any]:
+    """`body` plus correlation_id/callback_url when flow results come back through the callback server."""
+    if pending_replies is None:
+        return body
+    return {**body, **pending_replies.correlate(body.get("event", {}))}
+
 # Special handler for URL verification challenges
 @app.event("url_verification")
 def handle_verification(body):
@@ -88,7 +110,7 @@ def handle_message_events(body, say, logger):
     logger.info("Received message event")
     
     # Forward the event
-    response = forward_event(body)
+    response = forward_event(with_callback(body))
     
     # Check if we need to say something back in the channel
     if response and "slack_response" in response:
@@ -109,7 +131,7 @@ def handle_app_mention(body, say, logger):
     logger.info("Received app_mention event")
     
     # Forward the event
-    response = forward_event(body)
+    response = forward_event(with_callback(body))
     
     # Check if we need to say something back in the channel
     if response and "slack_response" in response:
@@ -139,6 +161,11 @@ if __name__ == "__main__":
         logger.info("Starting app in Socket Mode")
         handler = SocketModeHandler(app, socket_token)
         handler.start()
+    elif os.environ.get("PASSTHROUGH", "false").lower() == "true":
+        # Pure relay: verify and forward the raw request bytes without Bolt parsing them
+        port = int(os.environ.get("PORT", 3000))
+        router = routing.load_router("parsed-lang-app", FORWARD_URL, timeout=10)
+        passthrough.serve("parsed-lang-app", port, os.environ["SLACK_SIGNING_SECRET"], router)
     else:
         # Start with HTTP server
         port = int(os.environ.get("PORT", 3000))
@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import hmac
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import metrics
+
+# Raw-body relay for HTTP Events API bots that only forward what Slack sends.
+#
+# Instead of Bolt parsing each request into a dict that is then serialized again
+# for the flow, the handler:
+#   - verifies the Slack signature over the raw request bytes,
+#   - scans out a small routing header (envelope type, event_id, event type, channel,
+#     subtype) with anchored regexes, falling back to a full parse only if the layout is
+#     unexpected or the body has a "subtype" key,
+#   - acks, and hands the original bytes to the router, which posts them unchanged.
+#
+#   PASSTHROUGH=true python src/bolt_app/parsed-lang-app.py
+#   python src/bolt_app/passthrough.py bench      # CPU per event against the Bolt path
+#
+# Socket Mode payloads arrive already parsed by the websocket client, so this is HTTP only.
+
+MAX_CLOCK_SKEW = 300
+RECENT_EVENT_IDS = 10000
+
+# `"key":` only ever matches a real key: inside a JSON string every quote is escaped,
+# and a string value is never followed by a colon. Starting each pattern with the
+# literal key lets the regex engine skip ahead with a fast substring search.
+ENVELOPE_TYPE = re.compile(rb'"type"\s*:\s*"(event_callback|url_verification|app_rate_limited)"')
+EVENT_ID = re.compile(rb'"event_id"\s*:\s*"([^"\\]*)"')
+# Slack sends "type" as the event object's first key; anything else takes the fallback
+EVENT_TYPE = re.compile(rb'"event"\s*:\s*\{\s*"type"\s*:\s*"([^"\\]*)"')
+CHANNEL = re.compile(rb'"channel"\s*:\s*"([^"\\]*)"')
+# A subtype can also sit on an object nested in the event (an edit's "message" and
+# "previous_message"), which no regex can tell apart from the event's own. Bodies without
+# the key have no subtype; the few with it (edits, deletes, bot messages, joins) are parsed.
+SUBTYPE_KEY = b'"subtype"'
+
+
+def verify(signing_secret, timestamp, signature, body, now=None):
+    """Slack's v0 signature check, computed over the raw body bytes."""
+    if not timestamp or not signature:
+        return False
+    try:
+        if abs((now or time.time()) - int(timestamp)) > MAX_CLOCK_SKEW:
+            return False
+    except ValueError:
+        return False
+    digest = hmac.new(signing_secret, b"v0:" + timestamp.encode() + b":", hashlib.sha256)
+    digest.update(body)
+    return hmac.compare_digest("v0=" + digest.hexdigest(), signature)
+
+def parsed_header(body):
+    """The routing header from a full parse of the body."""
+    parsed = json.loads(body)
+    event = parsed.get("event") or {}
+    channel = event.get("channel") or (event.get("item") or {}).get("channel")
+    subtype = event.get("subtype")
+    return {"envelope_type": parsed.get("type"), "event_id": parsed.get("event_id"),
+            "type": event.get("type", ""), "channel": channel if isinstance(channel, str) else "",
+            "subtype": subtype if isinstance(subtype, str) else ""}
+
+def routing_header(body):
+    """
+    {"envelope_type", "event_id", "type", "channel", "subtype"} from the raw body,
+    parsing it fully only as a fallback.
+    """
+    envelope = ENVELOPE_TYPE.search(body)
+    event_type = EVENT_TYPE.search(body)
+    if envelope is None or (envelope.group(1) == b"event_callback" and event_type is None):
+        metrics.inc("passthrough_header_fallback_total")
+        return parsed_header(body)
+    if SUBTYPE_KEY in body:
+        metrics.inc("passthrough_subtype_parsed_total")
+        return parsed_header(body)
+    event_id = EVENT_ID.search(body)
+    channel = CHANNEL.search(body)
+    return {
+        "envelope_type": envelope.group(1).decode(),
+        "event_id": event_id.group(1).decode() if event_id else None,
+        "type": event_type.group(1).decode() if event_type else "",
+        "channel": channel.group(1).decode() if channel else "",
+        "subtype": "",
+    }
+
+
+class RecentIds:
+    """Event IDs already relayed, so Slack's retries of them are acked and skipped."""
+
+    def __init__(self, size=RECENT_EVENT_IDS):
+        self.size = size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, event_id):
+        """True if `event_id` was already recorded; records it otherwise."""
+        with self._lock:
+            if event_id in self._ids:
+                return True
+            self._ids[event_id] = None
+            if len(self._ids) > self.size:
+                self._ids.popitem(last=False)
+            return False
+
+
+def make_handler(bot_name, signing_secret, router, recent):
+    secret = signing_secret.encode()
+
+    class PassthroughHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not verify(secret, self.headers.get("X-Slack-Request-Timestamp"),
+                          self.headers.get("X-Slack-Signature"), body):
+                metrics.inc("passthrough_rejected_total", bot=bot_name, reason="signature")
+                return self._reply(401)
+            if not self.headers.get("Content-Type", "").startswith("application/json"):
+                # Interactive payloads are form-encoded; a relay bot only subscribes to events
+                metrics.inc("passthrough_rejected_total", bot=bot_name, reason="content-type")
+                return self._reply(415)
+            try:
+                header = routing_header(body)
+            except ValueError:
+                metrics.inc("passthrough_rejected_total", bot=bot_name, reason="json")
+                return self._reply(400)
+
+            if header["envelope_type"] == "url_verification":
+                challenge = json.loads(body).get("challenge", "")
+                return self._reply(200, json.dumps({"challenge": challenge}).encode(), "application/json")
+            if header["event_id"] and recent.seen(header["event_id"]):
+                metrics.inc("passthrough_retries_skipped_total", bot=bot_name)
+                return self._reply(200)
+            # Ack first: the destinations' pools post the unchanged bytes in the background
+            self._reply(200)
+            router.route(header, body)
+            metrics.inc("passthrough_relayed_total", bot=bot_name, type=header["type"])
+
+        def do_GET(self):
+            if metrics.handle_metrics_request(self):
+                return
+            self._reply(200, b"OK", "text/plain")
+
+        def _reply(self, status, data=b"", content_type="text/plain"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logging.debug(f"Passthrough: {format % args}")
+
+    return PassthroughHandler
+
+def serve(bot_name, port, signing_secret, router):
+    """Relay Events API requests on `port` through `router` until interrupted."""
+    server = ThreadingHTTPServer(("", port), make_handler(bot_name, signing_secret, router, RecentIds()))
+    logging.info(f"({bot_name}) Relaying raw Events API bodies on port {port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+# --- Benchmark ---
+def signed_request(body, secret):
+    timestamp = str(int(time.time()))
+    signature = "v0=" + hmac.new(secret.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+    return {"content-type": "application/json", "x-slack-request-timestamp": timestamp,
+            "x-slack-signature": signature}
+
+def bench(args):
+    """CPU per event: Bolt parse + dispatch + json re-serialization vs. raw verify + header scan."""
+    from slack_bolt import App, BoltRequest
+    from slack_bolt.authorization import AuthorizeResult
+    from loadtest import make_event, make_payload
+    from microbench import measure
+
+    secret = "bench-secret"
+
+    def authorize(enterprise_id, team_id, user_id):
+        return AuthorizeResult(enterprise_id=enterprise_id, team_id=team_id, bot_token="xoxb-bench",
+                               bot_id="B0BENCH", bot_user_id="U0BENCH")
+
+    logging.getLogger("slack_bolt").setLevel(logging.WARNING)
+    app = App(authorize=authorize, signing_secret=secret, process_before_response=True)
+
+    @app.event("app_mention")
+    def relay(body):
+        json.dumps(body).encode()  # what requests.post(json=body) does before sending
+
+    print(f"{'payload':<10}{'bytes':>10}{'bolt µs':>10}{'raw µs':>10}{'saved':>8}{'bolt peak B':>12}{'raw peak B':>11}")
+    for size in args.sizes:
+        event = make_event("app_mention", 1, text_size=size)
+        event["thread_ts"] = event["ts"]
+        raw = json.dumps(make_payload(event, 1)).encode()
+        headers = signed_request(raw, secret)
+
+        def parsed_path():
+            app.dispatch(BoltRequest(body=raw.decode(), headers=headers))
+
+        def raw_path():
+            if verify(secret.encode(), headers["x-slack-request-timestamp"], headers["x-slack-signature"], raw):
+                routing_header(raw)
+
+        parsed, passthrough = measure(parsed_path), measure(raw_path)
+        saved = 1 - passthrough["ns_per_op"] / parsed["ns_per_op"]
+        print(f"{size:<10}{len(raw):>10,}{parsed['ns_per_op'] / 1000:>10,.1f}{passthrough['ns_per_op'] / 1000:>10,.1f}"
+              f"{saved:>8.0%}{parsed['peak_bytes_per_op']:>12,}{passthrough['peak_bytes_per_op']:>11,}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Raw-body Events API relay.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="CPU per event compared with the parsed Bolt path")
+    bench_parser.add_argument("--sizes", type=lambda s: [int(v) for v in s.split(",")], default=[100, 4000, 40000, 400000],
+                              help="comma-separated message text sizes")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    bench(args)
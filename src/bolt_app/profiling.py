@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import hmac
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILE_HZ = 1000
+
+# Leaf frames in these files mean the thread is parked, not burning CPU.
+IDLE_FILES = ("threading.py", "selectors.py", "socket.py", "queue.py", "ssl.py", "socketserver.py")
+
+_cpu_lock = threading.Lock()
+_mem_lock = threading.Lock()
+_mem_baseline = None
+
+
+# --- CPU Sampling ---
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def sample_cpu_profile(seconds=10, hz=100, include_idle=False):
+    """
+    Sample the stacks of every other thread for `seconds` at `hz` samples per second.
+    Returns a Counter of collapsed stacks ("thread;outer;...;leaf" -> samples).
+    """
+    interval = 1.0 / max(1, hz)
+    me = threading.get_ident()
+    thread_names = {}
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            if not include_idle and os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                continue
+            if ident not in thread_names:
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(thread_names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+
+    return stacks
+
+def format_collapsed(stacks):
+    """Render stacks in the collapsed format consumed by flamegraph.pl / speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# --- Memory Snapshots ---
+def _take_snapshot():
+    snapshot = tracemalloc.take_snapshot()
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+def memory_start(frames=25):
+    """Start tracing allocations (if needed) and record a fresh baseline snapshot."""
+    global _mem_baseline
+    with _mem_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logging.info(f"tracemalloc started with {frames} frames")
+        _mem_baseline = _take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    return f"tracing: current={current} bytes peak={peak} bytes\n"
+
+def memory_diff(limit=25, key_type="lineno", reset=False):
+    """Compare the current heap against the baseline, largest growth first."""
+    global _mem_baseline
+    with _mem_lock:
+        if not tracemalloc.is_tracing() or _mem_baseline is None:
+            return None
+        snapshot = _take_snapshot()
+        stats = snapshot.compare_to(_mem_baseline, key_type)
+        if reset:
+            _mem_baseline = snapshot
+    lines = [f"top {limit} allocation sites by growth ({key_type}):\n"]
+    lines.extend(f"{stat}\n" for stat in stats[:limit])
+    return "".join(lines)
+
+def memory_stop():
+    """Stop tracing and drop the baseline so idle overhead goes back to zero."""
+    global _mem_baseline
+    with _mem_lock:
+        _mem_baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logging.info("tracemalloc stopped")
+    return "tracing stopped\n"
+
+
+# --- Admin HTTP Surface ---
+def _reply(handler, status, text):
+    body = text.encode("utf-8")
+    handler.send_response(status)
+    handler.send_header("Content-type", "text/plain; charset=utf-8")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+def _authorized(handler, token):
+    supplied = handler.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+def handle_admin_request(handler):
+    """
+    Serve /debug/ profiling endpoints from a BaseHTTPRequestHandler.
+    Returns True if the request was handled here, False to fall through to the health check.
+
+    GET /debug/profile/cpu?seconds=10&hz=100&idle=0   collapsed stacks for a flamegraph
+    GET /debug/memory/start?frames=25                 start tracemalloc, take baseline
+    GET /debug/memory/diff?limit=25&key=lineno&reset=0
+    GET /debug/memory/stop
+    """
+    url = urlparse(handler.path)
+    if not url.path.startswith("/debug/"):
+        return False
+    # Admin endpoints only exist when PROFILING_TOKEN is set (read per request,
+    # after the app's load_dotenv()); otherwise /debug/ looks like any 404.
+    token = os.environ.get("PROFILING_TOKEN")
+    if not token:
+        _reply(handler, 404, "Not Found\n")
+        return True
+    if not _authorized(handler, token):
+        logging.warning(f"Rejected unauthorized profiling request from {handler.client_address[0]}")
+        _reply(handler, 401, "Unauthorized\n")
+        return True
+
+    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    try:
+        if url.path == "/debug/profile/cpu":
+            seconds = min(float(query.get("seconds", 10)), MAX_PROFILE_SECONDS)
+            hz = max(1, min(int(query.get("hz", 100)), MAX_PROFILE_HZ))
+            include_idle = query.get("idle", "0") == "1"
+            if not _cpu_lock.acquire(blocking=False):
+                _reply(handler, 409, "A CPU profile is already running\n")
+                return True
+            try:
+                logging.info(f"Starting CPU profile: {seconds}s at {hz}Hz (idle={include_idle})")
+                stacks = sample_cpu_profile(seconds, hz, include_idle)
+            finally:
+                _cpu_lock.release()
+            _reply(handler, 200, format_collapsed(stacks))
+        elif url.path == "/debug/memory/start":
+            _reply(handler, 200, memory_start(int(query.get("frames", 25))))
+        elif url.path == "/debug/memory/diff":
+            report = memory_diff(
+                limit=int(query.get("limit", 25)),
+                key_type=query.get("key", "lineno"),
+                reset=query.get("reset", "0") == "1",
+            )
+            if report is None:
+                _reply(handler, 409, "Memory tracing not started; call /debug/memory/start first\n")
+            else:
+                _reply(handler, 200, report)
+        elif url.path == "/debug/memory/stop":
+            _reply(handler, 200, memory_stop())
+        else:
+            _reply(handler, 404, "Not Found\n")
+    except ValueError as e:
+        _reply(handler, 400, f"Bad request: {e}\n")
+    return True
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import logging
+import argparse
+import threading
+import aiohttp
+from slack_sdk.signature import SignatureVerifier
+from capture import read_capture
+from fakes import FakeSlack, FakeLangflow, Timeline
+from loadtest import load_app_module, start_bots, summarize, format_report, quieted
+
+# Replays a capture written by capture.py into an app variant and reports the
+# same latency/throughput summary as loadtest.py, so runs are comparable.
+#
+#   python src/bolt_app/replay.py traffic.jsonl.gz --app socket-app-session-id.py --speed 1
+#   python src/bolt_app/replay.py traffic.jsonl.gz --app http-app.py --speed 10
+#   python src/bolt_app/replay.py traffic.jsonl.gz --app parsed-lang-app.py --speed max --timing even
+
+SIGNING_SECRET = "replay-signing-secret"
+
+
+def load_records(path):
+    """Read a capture and stamp each record with a unique correlation key."""
+    records, seen = [], set()
+    for i, record in enumerate(read_capture(path)):
+        event = record["body"].get("event")
+        key = event.get("event_ts") if isinstance(event, dict) else None
+        if key is None or key in seen:
+            # Same event delivered twice (e.g. to two bots): keep replays distinguishable
+            key = f"{key or 'replay'}-{i}"
+            if isinstance(event, dict):
+                event["event_ts"] = key
+        seen.add(key)
+        record["key"] = key
+        records.append(record)
+    return records
+
+def schedule(records, speed, timing):
+    """
+    Offsets (seconds from start) for each record. `speed` is a multiplier or None
+    for max speed; timing="original" keeps captured gaps, "even" spreads them evenly.
+    """
+    if speed is None or not records:
+        return [0.0] * len(records)
+    start = records[0]["t"]
+    span = records[-1]["t"] - start
+    if timing == "even":
+        step = span / max(1, len(records) - 1)
+        return [i * step / speed for i in range(len(records))]
+    return [(r["t"] - start) / speed for r in records]
+
+def envelope_type(body):
+    if "command" in body:
+        return "slash_commands"
+    if body.get("type") == "event_callback":
+        return "events_api"
+    return "interactive"
+
+
+# --- Socket Mode Variants ---
+async def _replay_socket(fake_slack, records, offsets):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for record, offset in zip(records, offsets):
+        delay = start + offset - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await fake_slack.send_envelope(record["body"], envelope_type(record["body"]), key=record["key"])
+
+
+# --- HTTP Variants ---
+async def _replay_http(url, records, offsets, timeline):
+    verifier = SignatureVerifier(SIGNING_SECRET)
+
+    async def post(session, record):
+        body = json.dumps(record["body"]).encode("utf-8")
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Slack-Request-Timestamp": timestamp,
+            "X-Slack-Signature": verifier.generate_signature(timestamp=timestamp, body=body),
+        }
+        timeline.mark(record["key"], "sent")
+        async with session.post(url, data=body, headers=headers) as response:
+            await response.read()
+            if response.status < 400:
+                timeline.mark(record["key"], "acked")
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    async with aiohttp.ClientSession() as session:
+        tasks = []
+        for record, offset in zip(records, offsets):
+            delay = start + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(post(session, record)))
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def _start_http_app(module, port):
+    """Start an HTTP-mode variant on `port`, via start_bot if it has one, else its module-level app."""
+    if hasattr(module, "start_bot"):
+        accepted = inspect.signature(module.start_bot).parameters
+        kwargs = {"bot_name": "ReplayBot", "bot_token": "xoxb-fake-0", "ping_url": os.environ["PING_URL"],
+                  "api_key": "fake-flow-key"}
+        target, kwargs = module.start_bot, {k: v for k, v in kwargs.items() if k in accepted}
+    else:
+        target, kwargs = module.app.start, {"port": port}
+    threading.Thread(target=target, kwargs=kwargs, name="bot-ReplayBot", daemon=True).start()
+
+def _wait_for_port(port, timeout=15):
+    import socket
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"App did not start listening on port {port}")
+
+
+def run(args):
+    records = load_records(args.capture)
+    # Never capture the replay itself back into a capture file
+    os.environ.pop("CAPTURE_PATH", None)
+    speed = None if args.speed == "max" else float(args.speed)
+    offsets = schedule(records, speed, args.timing)
+    timeline = Timeline()
+    fake_slack = FakeSlack(timeline=timeline).start()
+    fake_langflow = FakeLangflow(timeline=timeline, latency=args.latency, error_rate=args.error_rate).start()
+    ping_url = fake_langflow.run_url()
+    env = {
+        "FLOW_API_KEY": "fake-flow-key", "BOT_NAME": "ReplayBot", "BOT_TOKEN": "xoxb-fake-0",
+        "APP_TOKEN": "xapp-fake-0", "PING_URL": ping_url, "PORT": str(args.port),
+        "SLACK_BOT_TOKEN": "xoxb-fake-0", "SLACK_SIGNING_SECRET": SIGNING_SECRET,
+        "SOCKET_MODE": "false",
+    }
+
+    with quieted(args.quiet):
+        module = load_app_module(args.app, fake_slack, env)
+        if hasattr(module, "FORWARD_URL"):
+            module.FORWARD_URL = ping_url
+        socket_mode = hasattr(module, "start_bot") and "app_token" in inspect.signature(module.start_bot).parameters
+        if socket_mode:
+            start_bots(module, 1, ping_url)
+            if not fake_slack.wait_for_connections(1):
+                raise RuntimeError("Bot did not connect to FakeSlack")
+            fake_slack.submit(_replay_socket(fake_slack, records, offsets)).result()
+        else:
+            _start_http_app(module, args.port)
+            _wait_for_port(args.port)
+            url = f"http://127.0.0.1:{args.port}/slack/events"
+            asyncio.run(_replay_http(url, records, offsets, timeline))
+        time.sleep(args.drain)
+
+    label = f"{args.capture} -> {args.app} speed={args.speed} timing={args.timing}"
+    summary = summarize(timeline, label=label)
+    summary["records"] = len(records)
+    summary["langflow_requests"] = fake_langflow.requests
+    return summary
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Replay a captured envelope file into an app variant.")
+    parser.add_argument("capture", help="gzip JSONL file written with CAPTURE_PATH")
+    parser.add_argument("--app", default="socket-app-session-id.py",
+                        help="socket-app-session-id.py, http-app.py, parsed-lang-app.py, ...")
+    parser.add_argument("--speed", default="1", help="replay speed multiplier (1, 10, ...) or 'max'")
+    parser.add_argument("--timing", default="original", choices=["original", "even"],
+                        help="keep captured inter-arrival gaps or spread events evenly")
+    parser.add_argument("--port", type=int, default=3999, help="port for HTTP-mode variants")
+    parser.add_argument("--latency", default="lognormal:0.2,0.5", help="fake Langflow latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Langflow runs that fail")
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds to wait for in-flight work after replay")
+    parser.add_argument("--json", help="also write the summary as JSON to this path")
+    parser.add_argument("--quiet", action="store_true", help="suppress app stdout/log output during the run")
+    return parser
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args()
+    summary = run(args)
+    print(format_report(summary))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    sys.exit(0)
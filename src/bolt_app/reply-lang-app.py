@@ -3,6 +3,7 @@ import json
 import requests
 from slack_bolt import App
 from dotenv import load_dotenv
+import callbacks
 
 # Load environment variables
 load_dotenv()
@@ -13,6 +14,9 @@ app = App(
     signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
 )
 
+# WEBHOOK_CALLBACKS=true: the flow posts its result back to us and we reply in the thread
+pending_replies = callbacks.start(app.client)
+
 # When the bot is mentioned, send user text to API endpoint
 @app.event("app_mention")
 def handle_mention(body, say, client):
@@ -94,6 +98,8 @@ def handle_mention(body, say, client):
         "event": event,
         "thread_history": thread_history
     }
+    if pending_replies is not None:
+        payload.update(pending_replies.correlate(event))
     
     # Print the payload we're about to send
     print("=== PAYLOAD BEING SENT ===")
@@ -133,9 +139,9 @@ def handle_mention(body, say, client):
         # Check if the request was successful
         if response.status_code == 202:
             print("Event and thread history sent to API successfully")
-        else:
-            print(f"Error sending to API: Status code {response.status_code}")
-            say(f"Sorry, there was an error sending the event to the API: {response.status_code}")
+            return
+        print(f"Error sending to API: Status code {response.status_code}")
+        say(f"Sorry, there was an error sending the event to the API: {response.status_code}")
         
     except Exception as e:
         print(f"Exception sending request: {str(e)}")
@@ -143,6 +149,9 @@ def handle_mention(body, say, client):
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
         say(f"Sorry, couldn't send the event to the API: {str(e)}")
+    # The webhook didn't take the run, so no callback is coming
+    if pending_replies is not None:
+        pending_replies.discard(payload["correlation_id"])
 
 # Start your app
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+import sys
+import time
+import html
+import numbers
+import logging
+import argparse
+import pandas as pd
+import archive
+
+# Capacity report over the archive.py event/timing archive.
+#
+#   python src/bolt_app/report.py /var/archive --from 2025-01-01 --to 2025-01-31 --out report.md
+#   python src/bolt_app/report.py /var/archive --bot DummyBot --format html --out report.html
+#
+# Only the columns the report uses are read, and date/bot partitions outside the
+# requested range are skipped without being opened. Files that can't be read (a part
+# truncated by a crash) are logged and left out rather than failing the report.
+
+EVENT_COLUMNS = ["received_at", "record", "channel", "duplicate", "status", "event_lag_ms", "ingest_us", "handler_us"]
+FORWARD_COLUMNS = ["destination", "http_status", "forward_ms"]
+STAGES = {"event_lag_ms": "event lag (ms)", "ingest_us": "ingest (µs)", "handler_us": "handler (µs)",
+          "forward_ms": "langflow forward (ms)"}
+QUANTILES = [0.5, 0.95, 0.99]
+
+
+# --- Loading ---
+def load(root, start=None, end=None, bots=None, fmt="parquet"):
+    """Archive rows for the date range as a DataFrame, reading only the report's columns."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("date", pa.string()), ("bot", pa.string())]), flavor="hive")
+    # The archive's own schema, so files written before a column existed read it as null
+    full_schema = archive.schema().append(pa.field("date", pa.string())).append(pa.field("bot", pa.string()))
+    dataset = ds.dataset(root, format="parquet" if fmt == "parquet" else "ipc",
+                         partitioning=partitioning, schema=full_schema)
+    condition = None
+    for clause in (
+        ds.field("date") >= start if start else None,
+        ds.field("date") <= end if end else None,
+        ds.field("bot").isin(bots) if bots else None,
+    ):
+        if clause is not None:
+            condition = clause if condition is None else condition & clause
+    columns = EVENT_COLUMNS + FORWARD_COLUMNS + ["bot"]
+    tables = []
+    for fragment in dataset.get_fragments(filter=condition):
+        try:
+            tables.append(fragment.to_table(schema=full_schema, columns=columns, filter=condition))
+        except (pa.ArrowInvalid, OSError) as e:
+            logging.warning(f"Skipping unreadable archive file {fragment.path}: {e}")
+    table = pa.concat_tables(tables) if tables else full_schema.empty_table().select(columns)
+    df = table.to_pandas()
+    for column in ("record", "bot", "channel", "status", "destination"):
+        df[column] = df[column].astype("category")
+    return df
+
+
+# --- Analysis ---
+def throughput(events, key, interval):
+    """Per-`key` totals with mean and peak events per `interval`."""
+    counts = events.groupby([key, pd.Grouper(key="received_at", freq=interval)], observed=True).size()
+    per_key = counts.groupby(level=0, observed=True)
+    result = pd.DataFrame({"events": per_key.sum(), f"mean / {interval}": per_key.mean(), f"peak / {interval}": per_key.max()})
+    return result.sort_values("events", ascending=False)
+
+def latency(df):
+    """p50/p95/p99 of every stage, per bot."""
+    rows = []
+    for column, label in STAGES.items():
+        values = df[["bot", column]].dropna()
+        if values.empty:
+            continue
+        quantiles = values.groupby("bot", observed=True)[column].quantile(QUANTILES).unstack()
+        quantiles.columns = [f"p{int(q * 100)}" for q in QUANTILES]
+        quantiles.insert(0, "stage", label)
+        rows.append(quantiles)
+    return pd.concat(rows).reset_index().set_index(["stage", "bot"]) if rows else pd.DataFrame()
+
+def bursts(events, top=5):
+    """The busiest seconds overall, with how far they sit above the median busy second."""
+    per_second = events.set_index("received_at").resample("1s").size()
+    per_second = per_second[per_second > 0]
+    if per_second.empty:
+        return pd.DataFrame(), 0.0
+    peaks = per_second.nlargest(top).rename("events").to_frame()
+    peaks["× median"] = peaks["events"] / per_second.median()
+    return peaks, float(per_second.median())
+
+def duplicate_rates(events, key):
+    grouped = events.groupby(key, observed=True)["duplicate"]
+    result = pd.DataFrame({"events": grouped.size(), "duplicates": grouped.sum()})
+    result["duplicate %"] = result["duplicates"] / result["events"] * 100
+    return result[result["events"] > 0].sort_values("duplicate %", ascending=False)
+
+def error_rates(forwards):
+    flags = pd.DataFrame({
+        "bot": forwards["bot"],
+        "destination": forwards["destination"],
+        "requests": 1,
+        "errors": forwards["status"] == "error",
+        "exceptions": forwards["status"] == "exception",
+    })
+    result = flags.groupby(["bot", "destination"], observed=True)[["requests", "errors", "exceptions"]].sum()
+    result = result[result["requests"] > 0]
+    result["failure %"] = (result["errors"] + result["exceptions"]) / result["requests"] * 100
+    return result.sort_values("failure %", ascending=False)
+
+def analyze(df, interval="1min", top_channels=20):
+    events = df[df["record"] == "event"]
+    forwards = df[df["record"] == "forward"]
+    peaks, median_rate = bursts(events)
+    return {
+        "Summary": pd.DataFrame({"value": {
+            "events": len(events),
+            "forward requests": len(forwards),
+            "first event": events["received_at"].min(),
+            "last event": events["received_at"].max(),
+            "median busy-second rate": median_rate,
+        }}).rename_axis("metric"),
+        "Throughput by bot": throughput(events, "bot", interval),
+        "Throughput by channel": throughput(events, "channel", interval).head(top_channels),
+        "Latency by stage": latency(df),
+        "Burst peaks (events/second)": peaks,
+        "Duplicates by bot": duplicate_rates(events, "bot"),
+        "Duplicates by channel": duplicate_rates(events, "channel").head(top_channels),
+        "Event status": events.groupby(["bot", "status"], observed=True).size().rename("events").to_frame(),
+        "Langflow errors": error_rates(forwards) if len(forwards) else pd.DataFrame(),
+    }
+
+
+# --- Rendering ---
+def _cell(value):
+    if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+        return f"{value:,}"
+    if isinstance(value, numbers.Real):
+        return f"{value:,.2f}"
+    return str(value)
+
+def markdown_table(frame):
+    frame = frame.reset_index()
+    lines = ["| " + " | ".join(str(c) for c in frame.columns) + " |", "|" + "---|" * len(frame.columns)]
+    for row in frame.itertuples(index=False):
+        lines.append("| " + " | ".join(_cell(v) for v in row) + " |")
+    return "\n".join(lines)
+
+def render(sections, title, fmt):
+    if fmt == "markdown":
+        parts = [f"# {title}"]
+        for name, frame in sections.items():
+            parts.append(f"## {name}\n\n" + (markdown_table(frame) if not frame.empty else "_no data_"))
+        return "\n\n".join(parts) + "\n"
+    parts = [f"<!doctype html><meta charset='utf-8'><title>{html.escape(title)}</title>",
+             "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:1.5em}"
+             "td,th{border:1px solid #ccc;padding:2px 8px;text-align:right}</style>",
+             f"<h1>{html.escape(title)}</h1>"]
+    for name, frame in sections.items():
+        parts.append(f"<h2>{html.escape(name)}</h2>")
+        parts.append(frame.to_html(float_format=lambda v: f"{v:,.2f}") if not frame.empty else "<p><em>no data</em></p>")
+    return "\n".join(parts) + "\n"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Latency and volume report from the event archive.")
+    parser.add_argument("archive", help="ARCHIVE_PATH the bots wrote to")
+    parser.add_argument("--from", dest="start", help="first date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="last date, YYYY-MM-DD")
+    parser.add_argument("--bot", action="append", help="only this bot (repeatable)")
+    parser.add_argument("--archive-format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--interval", default="1min", help="throughput bucket, a pandas frequency (default 1min)")
+    parser.add_argument("--top", type=int, default=20, help="channels to list")
+    parser.add_argument("--format", choices=["markdown", "html"], default="markdown")
+    parser.add_argument("--out", help="write the report here instead of stdout")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    started = time.perf_counter()
+    df = load(args.archive, args.start, args.end, args.bot, args.archive_format)
+    loaded = time.perf_counter()
+    sections = analyze(df, args.interval, args.top)
+    period = f"{args.start or 'start'} to {args.end or 'end'}"
+    report = render(sections, f"Bolt app traffic report ({period})", args.format)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report)
+    print(f"{len(df):,} rows: loaded in {loaded - started:.2f}s, analyzed in {time.perf_counter() - loaded:.2f}s",
+          file=sys.stderr)
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import logging
+import threading
+from time import perf_counter
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+import archive
+import shutdown
+
+# Per-bot routing of events to one or more Langflow flows.
+#
+# ROUTES_PATH points at a JSON file like:
+#   {"bots": {"DummyBot": {
+#       "destinations": {
+#           "chat":      {"url": "http://.../api/v1/run/<flow>", "timeout": 30, "concurrency": 8},
+#           "analytics": {"url": "http://.../api/v1/run/<flow>", "timeout": 5, "concurrency": 2, "max_pending": 100}
+#       },
+#       "routes": [
+#           {"type": "app_mention", "to": ["chat", "analytics"]},
+#           {"type": "message", "channel": "C0123456", "subtype": "*", "to": ["analytics"]}
+#       ]}}}
+# "channel" and "subtype" default to "*"; "subtype": "" matches only events without one.
+# A bot with no entry (or no ROUTES_PATH) sends everything to its ping_url, as before.
+# At shutdown, forwards that have not started are returned as spool entries
+# ({"bot", "destination", "data" or "body"}) for Router.replay on the next instance.
+
+WILDCARD = "*"
+
+
+class Destination:
+    """One flow endpoint with its own worker pool, timeout and backlog limit."""
+
+    def __init__(self, name, url, api_key=None, timeout=10, concurrency=4, max_pending=1000):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["x-api-key"] = api_key
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=concurrency))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=concurrency))
+        self._pool = shutdown.SpoolingExecutor(concurrency, thread_name_prefix=f"route-{name}")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, data, bot_name):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                metrics.inc("route_dropped_total", bot=bot_name, destination=self.name)
+                logging.warning(f"({bot_name}) Dropping event for {self.name}: {self._pending} already pending")
+                return False
+            self._pending += 1
+        if not self._pool.submit(spool_entry(bot_name, self.name, data), self._forward, data, bot_name):
+            with self._lock:
+                self._pending -= 1
+            metrics.inc("route_dropped_total", bot=bot_name, destination=self.name)
+            logging.warning(f"({bot_name}) Dropping event for {self.name}: shutting down")
+            return False
+        return True
+
+    def stop(self):
+        """Start no more forwards; returns the ones that never started."""
+        return self._pool.stop()
+
+    def wait(self, timeout):
+        """Wait up to `timeout` for forwards already posting."""
+        if not self._pool.wait(timeout):
+            logging.warning(f"Forwards to {self.name} still running after the drain deadline")
+
+    def _forward(self, data, bot_name):
+        try:
+            self.post(data, bot_name)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def post(self, data, bot_name):
+        """Send `data` now, on the calling thread. Bytes are sent as they are (already-encoded JSON)."""
+        started = perf_counter()
+        http_status = None
+        try:
+            if isinstance(data, bytes):
+                response = self.session.post(self.url, headers=self.headers, data=data, timeout=self.timeout)
+            else:
+                response = self.session.post(self.url, headers=self.headers, json=data, timeout=self.timeout)
+            http_status = response.status_code
+            if response.status_code >= 200 and response.status_code < 300:
+                status = "ok"
+                metrics.inc("route_forwarded_total", bot=bot_name, destination=self.name)
+            else:
+                status = "error"
+                metrics.inc("route_failed_total", bot=bot_name, destination=self.name)
+                logging.error(f"({bot_name}) {self.name} returned {response.status_code}: {response.text[:200]}")
+        except Exception as e:
+            status = "exception"
+            metrics.inc("route_failed_total", bot=bot_name, destination=self.name)
+            logging.error(f"({bot_name}) Exception forwarding to {self.name}: {e}")
+        archiver = archive.get_archiver()
+        if archiver is not None:
+            archiver.record(archive.forward_row(bot_name, self.name, status, http_status, (perf_counter() - started) * 1000))
+
+
+def spool_entry(bot_name, destination, data):
+    """A queued forward as a JSON-safe spool entry; already-encoded bodies are kept as text."""
+    if isinstance(data, bytes):
+        return {"bot": bot_name, "destination": destination, "body": data.decode("utf-8")}
+    return {"bot": bot_name, "destination": destination, "data": data}
+
+
+def event_channel(event):
+    """Channel of an event, including reaction events that carry it under "item"."""
+    return event.get("channel") or (event.get("item") or {}).get("channel") or ""
+
+
+class Router:
+    """
+    (type, channel, subtype) -> destinations. A lookup probes the exact and "*"
+    form of each field, so it is at most eight dict probes whatever the table size.
+    """
+
+    def __init__(self, bot_name, destinations, routes, explicit=True):
+        self.bot_name = bot_name
+        self.destinations = destinations
+        # False for the catch-all fallback to ping_url
+        self.explicit = explicit
+        self._table = {}
+        for route in routes:
+            key = (route.get("type", WILDCARD), route.get("channel", WILDCARD), route.get("subtype", WILDCARD))
+            targets = self._table.setdefault(key, [])
+            for name in route["to"]:
+                if name not in destinations:
+                    raise ValueError(f"Route {key} for {bot_name} points at unknown destination '{name}'")
+                if destinations[name] not in targets:
+                    targets.append(destinations[name])
+
+    def lookup(self, event):
+        exact = (event.get("type", ""), event_channel(event), event.get("subtype", ""))
+        matched = []
+        for event_type in (exact[0], WILDCARD):
+            for channel in (exact[1], WILDCARD):
+                for subtype in (exact[2], WILDCARD):
+                    for destination in self._table.get((event_type, channel, subtype), ()):
+                        if destination not in matched:
+                            matched.append(destination)
+        return matched
+
+    def route(self, event, data):
+        """Hand `data` to every destination matching `event`; returns how many accepted it."""
+        destinations = self.lookup(event)
+        if not destinations:
+            metrics.inc("route_unmatched_total", bot=self.bot_name)
+            return 0
+        return sum(destination.submit(data, self.bot_name) for destination in destinations)
+
+    def drain(self, timeout):
+        """Drain every destination within `timeout` seconds overall; returns the unstarted forwards."""
+        end = time.monotonic() + timeout
+        unstarted = [entry for destination in self.destinations.values() for entry in destination.stop()]
+        for destination in self.destinations.values():
+            destination.wait(max(0.0, end - time.monotonic()))
+        return unstarted
+
+    def replay(self, entry):
+        """Forward a spooled entry (see spool_entry) again; False if its destination is gone."""
+        destination = self.destinations.get(entry["destination"])
+        if destination is None:
+            logging.warning(f"({self.bot_name}) Not replaying forward to unknown destination '{entry['destination']}'")
+            return False
+        data = entry["data"] if "data" in entry else entry["body"].encode("utf-8")
+        return destination.submit(data, self.bot_name)
+
+
+def load_router(bot_name, ping_url, api_key=None, timeout=10):
+    """The bot's Router from ROUTES_PATH, or one sending every event to `ping_url`."""
+    path = os.environ.get("ROUTES_PATH")
+    config = None
+    if path:
+        with open(path) as f:
+            config = json.load(f).get("bots", {}).get(bot_name)
+    if config is None:
+        destinations = {"default": Destination("default", ping_url, api_key, timeout=timeout)}
+        return Router(bot_name, destinations, [{"to": ["default"]}], explicit=False)
+
+    destinations = {
+        name: Destination(
+            name,
+            spec["url"],
+            os.environ.get(spec["api_key_env"]) if spec.get("api_key_env") else api_key,
+            timeout=spec.get("timeout", timeout),
+            concurrency=spec.get("concurrency", 4),
+            max_pending=spec.get("max_pending", 1000),
+        )
+        for name, spec in config["destinations"].items()
+    }
+    logging.info(f"Loaded {len(config['routes'])} route(s) to {len(destinations)} destination(s) for {bot_name}")
+    return Router(bot_name, destinations, config["routes"])
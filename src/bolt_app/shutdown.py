@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import glob
+import signal
+import socket
+import logging
+import threading
+import itertools
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from slack_bolt import BoltResponse
+import metrics
+
+# Graceful drain for Socket Mode bots on SIGTERM (Cloud Run scale-in) or Ctrl+C.
+#
+#   1. stop accepting   envelopes still arriving get a 503 from the middleware, so they
+#                       are not acked and Slack redelivers them to another connection
+#   2. close sockets    Socket Mode connections are closed so Slack reroutes traffic
+#   3. drain            registered drains (debounce flush, in-flight Langflow runs,
+#                       tracked forwards) get what is left of SHUTDOWN_DEADLINE_SECONDS
+#   4. persist          whatever did not finish is written to SHUTDOWN_SPOOL_DIR as JSONL
+#
+# Each phase's duration is logged. Spool files are replayed by the next instance to
+# start (replay_spool), so SHUTDOWN_SPOOL_DIR should be storage that outlives the
+# instance, e.g. a Cloud Storage volume mount on Cloud Run.
+
+DEFAULT_DEADLINE = 8.0  # Cloud Run allows 10s between SIGTERM and SIGKILL
+
+
+class ShutdownCoordinator:
+    def __init__(self, name, deadline=DEFAULT_DEADLINE, spool_dir=None):
+        self.name = name
+        self.deadline = deadline
+        self.spool_dir = spool_dir
+        self.draining = threading.Event()
+        self._finished = threading.Event()
+        self._handlers = []
+        self._drains = []  # (label, fn(timeout) -> [leftover entries])
+        self._tracked = {}  # token -> entry, for forwards running on handler threads
+        self._tokens = itertools.count()
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+
+    def add_handler(self, handler):
+        """A SocketModeHandler to close once draining starts."""
+        self._handlers.append(handler)
+
+    def add_drain(self, label, fn):
+        """fn(timeout) finishes what it can within `timeout` seconds and returns entries to spool."""
+        self._drains.append((label, fn))
+
+    def middleware(self):
+        def reject_while_draining(next):
+            if self.draining.is_set():
+                metrics.inc("shutdown_rejected_envelopes_total", bot=self.name)
+                return BoltResponse(status=503, body="draining")
+            return next()
+        return reject_while_draining
+
+    @contextmanager
+    def track(self, entry):
+        """Mark a forward running on this thread as in flight; `entry` is spooled if it outlives the drain."""
+        token = next(self._tokens)
+        with self._cond:
+            self._tracked[token] = entry
+        try:
+            yield
+        finally:
+            with self._cond:
+                del self._tracked[token]
+                self._cond.notify_all()
+
+    def _wait_tracked(self, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._tracked, timeout)
+            return list(self._tracked.values())
+
+    # --- Lifecycle ---
+    def install(self):
+        """Drain on SIGTERM/SIGINT. Only the main thread can do this; elsewhere call drain() directly."""
+        if threading.current_thread() is not threading.main_thread():
+            logging.warning(f"({self.name}) Not on the main thread; SIGTERM will not trigger a drain")
+            return
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+
+    def _on_signal(self, signum, frame):
+        logging.info(f"({self.name}) Received {signal.Signals(signum).name}, draining")
+        threading.Thread(target=self.drain, name="shutdown", daemon=True).start()
+
+    def wait(self):
+        """Block (instead of SocketModeHandler.start()) until a drain has finished."""
+        while not self._finished.wait(1):
+            pass
+
+    def drain(self):
+        with self._lock:
+            if self.draining.is_set():
+                return
+            self.draining.set()
+        started = time.monotonic()
+        end = started + self.deadline
+        leftovers = []
+        logging.info(f"({self.name}) Stopped accepting envelopes; draining with a {self.deadline:.1f}s deadline")
+        try:
+            # Closing a Socket Mode client can take seconds; it runs alongside the drains
+            closing = threading.Thread(target=self._close_handlers, name="shutdown-close", daemon=True)
+            closing.start()
+            for label, fn in self._drains + [("tracked forwards", self._wait_tracked)]:
+                with self._phase(f"drain {label}"):
+                    try:
+                        leftovers.extend(fn(max(0.0, end - time.monotonic())) or [])
+                    except Exception as e:
+                        logging.error(f"({self.name}) Error draining {label}: {e}")
+            with self._phase("persist"):
+                if leftovers:
+                    self.spool(leftovers)
+            closing.join(max(0.0, end - time.monotonic()))
+            logging.info(f"({self.name}) Shutdown complete in {(time.monotonic() - started) * 1000:.0f}ms, "
+                         f"{len(leftovers)} unfinished item(s) {'spooled' if self.spool_dir else 'lost'}")
+        finally:
+            self._finished.set()
+
+    def _close_handlers(self):
+        with self._phase("close connections"):
+            for handler in self._handlers:
+                try:
+                    handler.close()
+                except Exception as e:
+                    logging.warning(f"({self.name}) Error closing Socket Mode connection: {e}")
+
+    @contextmanager
+    def _phase(self, label):
+        started = time.monotonic()
+        yield
+        logging.info(f"({self.name}) Shutdown phase '{label}' took {(time.monotonic() - started) * 1000:.0f}ms")
+
+    def spool(self, entries):
+        if not self.spool_dir:
+            logging.warning(f"({self.name}) SHUTDOWN_SPOOL_DIR not set; dropping {len(entries)} unfinished item(s)")
+            metrics.inc("shutdown_lost_total", amount=len(entries), bot=self.name)
+            return None
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{self.name}-{socket.gethostname()}-{os.getpid()}-{int(time.time())}.jsonl")
+        with open(path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        metrics.inc("shutdown_spooled_total", amount=len(entries), bot=self.name)
+        logging.info(f"({self.name}) Spooled {len(entries)} unfinished item(s) to {path}")
+        return path
+
+
+class SpoolingExecutor:
+    """
+    A thread pool whose queued work can be taken back at shutdown: drain(timeout) stops
+    starting anything new, waits for what is already running and returns the `entry`
+    of every job that never started, for the spool. Running jobs are never spooled,
+    so a replay can't repeat work that may already have been done.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix=""):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._queued = {}  # token -> entry, for jobs that have not started
+        self._running = 0
+        self._tokens = itertools.count()
+        self._cond = threading.Condition()
+        self.draining = False
+
+    def submit(self, entry, fn, *args):
+        """Run fn(*args) on the pool; returns False (and runs nothing) once draining."""
+        with self._cond:
+            if self.draining:
+                return False
+            token = next(self._tokens)
+            self._queued[token] = entry
+        self._pool.submit(self._run, token, fn, args)
+        return True
+
+    def _run(self, token, fn, args):
+        with self._cond:
+            if token not in self._queued:
+                return  # taken back by drain()
+            del self._queued[token]
+            self._running += 1
+        try:
+            fn(*args)
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def stop(self):
+        """Start nothing new; returns the entries of the jobs that had not started."""
+        with self._cond:
+            self.draining = True
+            unstarted = list(self._queued.values())
+            self._queued.clear()
+        return unstarted
+
+    def wait(self, timeout):
+        """Wait up to `timeout` for running jobs; False if some are still running."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._running, timeout)
+
+    def drain(self, timeout):
+        unstarted = self.stop()
+        if not self.wait(timeout):
+            logging.warning(f"{self._running} job(s) still running after the drain deadline")
+        return unstarted
+
+
+def replay_spool(spool_dir, name, send):
+    """Hand every entry another instance of bot `name` spooled at shutdown to send(entry), once."""
+    if not spool_dir:
+        return 0
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(spool_dir, f"{name}-*.jsonl"))):
+        claimed = f"{path}.replaying-{socket.gethostname()}-{os.getpid()}"
+        try:
+            os.rename(path, claimed)  # another instance starting at the same time may win
+        except OSError:
+            continue
+        with open(claimed) as f:
+            for line in f:
+                try:
+                    send(json.loads(line))
+                    replayed += 1
+                except Exception as e:
+                    logging.error(f"({name}) Error replaying spooled entry from {path}: {e}")
+        os.remove(claimed)
+    if replayed:
+        logging.info(f"({name}) Replayed {replayed} item(s) spooled by a previous instance")
+    return replayed
+
+def from_env(name):
+    """A coordinator configured from SHUTDOWN_DEADLINE_SECONDS / SHUTDOWN_SPOOL_DIR."""
+    return ShutdownCoordinator(
+        name,
+        deadline=float(os.environ.get("SHUTDOWN_DEADLINE_SECONDS", DEFAULT_DEADLINE)),
+        spool_dir=os.environ.get("SHUTDOWN_SPOOL_DIR"),
+    )
@@ -1,12 +1,19 @@
 import os
-import requests
+import sys
 import json
 import threading
+import time
 import pandas as pd
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from slack_bolt.error import BoltUnhandledRequestError
 from dotenv import load_dotenv
+import event_filter
+import routing
+import digest
+import archive
+import shutdown
+from time import perf_counter
 import logging
 
 # Load environment variables
@@ -35,24 +42,46 @@ bot_configs = pd.DataFrame([
 # Assume the API Key environment variable name
 FLOW_API_KEY = os.environ.get("FLOW_API_KEY")
 
+# One coordinator for the process: on SIGTERM every bot stops acking, then the shared
+# digest is flushed, the flow forwards drained and the archive closed before exit
+coordinator = shutdown.from_env("socket-app-2bots-allevents")
+routers = {}  # bot name -> routing.Router
+
 def start_bot(bot_name, bot_token, app_token, ping_url, api_key):
     if not bot_token or not app_token:
         logging.error(f"Tokens are required for {bot_name}, bot cannot start.")
         return
 
     app = App(token=bot_token, raise_error_for_unhandled_request=True)
+    # Drop noise (own/bot messages, edits, joins/leaves) before it is serialized or forwarded;
+    # channel allow-lists and other per-bot rules come from EVENT_FILTER_PATH
+    event_filter.install(app, bot_name)
+    # While shutting down, envelopes are refused so Slack redelivers them elsewhere
+    app.middleware(coordinator.middleware())
+    # Events go to the flows ROUTES_PATH maps them to (default: ping_url), each with its own pool and timeout
+    router = routers[bot_name] = routing.load_router(bot_name, ping_url, api_key, timeout=10)
+    # With DIGEST_URL set, plain channel messages are batched per channel and sent as one run per window
+    digester = digest.get_aggregator(api_key)
+    # With ARCHIVE_PATH set, events are archived to Parquet/Arrow off-thread instead of printed
+    archiver = archive.get_archiver()
 
     @app.middleware
-    def log_everything(context, payload, next):
-        print("=" * 40)
-        print(f"📦 Incoming payload:")
-        print(json.dumps(payload, indent=2))
-        print("=" * 40)
+    def log_everything(context, payload, body, next):
+        if archiver is not None:
+            started = perf_counter()
+            next()
+            archiver.record(archive.row_for(
+                bot_name, body, body.get("event") or {}, "handled", handler_us=(perf_counter() - started) * 1e6
+            ))
+            return
+        logging.debug(f"({bot_name}) Incoming payload: {json.dumps(payload, indent=2)}")
         next()
 
     @app.event("message")
     def handle_message_events(body, logger):
-        pass
+        event = body.get("event", {})
+        if digester is not None and digest.wants(event):
+            digester.add(event)
 
     @app.event("app_mention")  # Listen to app mention events
     def handle_app_mention_events(body, logger):
@@ -66,7 +95,7 @@ def start_bot(bot_name, bot_token, app_token, ping_url, api_key):
             "output_type": "text"
         }
         try:
-            forward_event(data, ping_url, api_key, bot_name)
+            router.route(event, data)
         except Exception as e:
             logging.error(f"Error forwarding event for {bot_name}: {e}")
 
@@ -80,7 +109,7 @@ def start_bot(bot_name, bot_token, app_token, ping_url, api_key):
             "input_type": "text",
             "output_type": "text"
         }
-        forward_event(data, ping_url, api_key, bot_name)
+        router.route(event, data)
     
     @app.error
     def handle_errors(error, body, logger):
@@ -92,46 +121,22 @@ def start_bot(bot_name, bot_token, app_token, ping_url, api_key):
         # For other errors, you might want to return a specific response,
         # but for debugging, just logging is often sufficient.
 
-    print(f"Info: Starting {bot_name} in Socket Mode!")
+    logging.info(f"Starting {bot_name} in Socket Mode")
 
     try:
         handler = SocketModeHandler(app, app_token)
-        handler.start()
+        coordinator.add_handler(handler)
+        handler.connect()
     except Exception as e:
         logging.error(f"Error starting Socket Mode handler for {bot_name}: {e}")
 
-# Helper function to forward events
-def forward_event(data, ping_url, api_key, bot_name):
-
-    print("forwarding the event to ", bot_name)
-    headers = {"Content-Type": "application/json"}
-    if api_key:
-        headers['x-api-key'] = api_key
-        print("Info: Adding x-api-key header")
-    else:
-        logging.warning("FLOW_API_KEY not set. Proceeding without x-api-key header.")
-
-    try:
-        response = requests.post(
-            ping_url,
-            headers=headers,
-            json=data,
-            timeout=10
-        )
-        print("response: ", response)
-        if response.status_code >= 200 and response.status_code < 300:
-            logging.info("Info: Successfully pinged URL")
-        else:
-            logging.error(f"Failed to ping URL. Status code: {response.status_code}, Response: {response.text}")
-    except Exception as e:
-        logging.error(f"Exception while pinging URL: {str(e)}")
-
 if __name__ == "__main__":
     # Retrieve the shared API key from environment variable
     flow_api_key = os.environ.get("FLOW_API_KEY")
-    print("flow_api_key: ", flow_api_key)
     if not flow_api_key:
         logging.warning("Environment variable FLOW_API_KEY not set. API key header will not be sent.")
+    # One thread per bot; shared state (metrics, digest, archive) is safe to run without the GIL (python3.13t)
+    logging.info(f"Python {sys.version.split()[0]}, GIL {'enabled' if getattr(sys, '_is_gil_enabled', lambda: True)() else 'disabled'}")
 
     threads = []
     for _, row in bot_configs.iterrows():
@@ -144,3 +149,37 @@ if __name__ == "__main__":
 
     for thread in threads:
         thread.join()
+
+    # Drains run in this order within SHUTDOWN_DEADLINE_SECONDS: digest windows are sent,
+    # then the flow forwards finish (queued ones are spooled), and the archive goes last
+    # so it still records what the others finish
+    digester = digest.get_aggregator(flow_api_key)
+    if digester is not None:
+        coordinator.add_drain("digest windows", digester.flush_all)
+
+    def drain_forwards(timeout):
+        end = time.monotonic() + timeout
+        destinations = [d for router in routers.values() for d in router.destinations.values()]
+        unstarted = [entry for destination in destinations for entry in destination.stop()]
+        for destination in destinations:
+            destination.wait(max(0.0, end - time.monotonic()))
+        return unstarted
+
+    coordinator.add_drain("flow forwards", drain_forwards)
+    archiver = archive.get_archiver()
+    if archiver is not None:
+        coordinator.add_drain("archive", archiver.close)
+
+    def replay(entry):
+        if "digest" in entry:
+            if digester is not None:
+                digester.send(entry["digest"])
+        elif entry["bot"] in routers:
+            routers[entry["bot"]].replay(entry)
+
+    # Windows and forwards a previous instance could not send before it was stopped
+    threading.Thread(
+        target=shutdown.replay_spool, args=(coordinator.spool_dir, coordinator.name, replay), name="spool-replay", daemon=True
+    ).start()
+    coordinator.install()
+    coordinator.wait()  # Blocks until SIGTERM/SIGINT and the drain that follows
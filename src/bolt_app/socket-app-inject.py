@@ -7,7 +7,8 @@ from slack_bolt.adapter.socket_mode import SocketModeHandler
 from slack_bolt.error import BoltUnhandledRequestError
 from dotenv import load_dotenv
 import logging
-from http.server import BaseHTTPRequestHandler, HTTPServer # <-- Import HTTP server modules
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # <-- Import HTTP server modules
+import profiling
 
 # Load environment variables
 load_dotenv()
@@ -42,7 +43,10 @@ if not os.environ.get("PING_URL"):
 # --- Health Check Server ---
 class HealthCheckHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        # Respond with 200 OK for any GET request
+        # Admin profiling endpoints (off unless PROFILING_TOKEN is set)
+        if profiling.handle_admin_request(self):
+            return
+        # Respond with 200 OK for any other GET request
         self.send_response(200)
         self.send_header("Content-type", "text/plain")
         self.end_headers()
@@ -50,7 +54,8 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
 
 def run_health_check_server(port):
     server_address = ('', port)
-    httpd = HTTPServer(server_address, HealthCheckHandler)
+    # Threaded so a long-running profile never blocks the health check itself
+    httpd = ThreadingHTTPServer(server_address, HealthCheckHandler)
     logging.info(f"Starting health check server on port {port}")
     try:
         httpd.serve_forever()
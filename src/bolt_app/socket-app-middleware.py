@@ -115,7 +115,6 @@ def forward_event(data, ping_url, api_key, bot_name):
 if __name__ == "__main__":
     # Retrieve the shared API key from environment variable
     flow_api_key = os.environ.get("FLOW_API_KEY")
-    print("flow_api_key: ", flow_api_key)
     if not flow_api_key:
         logging.warning("Environment variable FLOW_API_KEY not set. API key header will not be sent.")
 
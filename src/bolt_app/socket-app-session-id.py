@@ -2,12 +2,22 @@ import os
 import requests
 import json
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from slack_bolt.error import BoltUnhandledRequestError
 from dotenv import load_dotenv
 import logging
-from http.server import BaseHTTPRequestHandler, HTTPServer # <-- Import HTTP server modules
+import capture
+import events
+import debounce
+import inflight
+import metrics
+import shutdown
+import attachments
+from callbacks import result_text
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # <-- Import HTTP server modules
+import profiling
 
 # Load environment variables
 load_dotenv()
@@ -43,7 +53,12 @@ if not os.environ.get("PING_URL"):
 # --- Health Check Server ---
 class HealthCheckHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        # Respond with 200 OK for any GET request
+        # Admin profiling endpoints (off unless PROFILING_TOKEN is set)
+        if profiling.handle_admin_request(self):
+            return
+        if metrics.handle_metrics_request(self):
+            return
+        # Respond with 200 OK for any other GET request
         self.send_response(200)
         self.send_header("Content-type", "text/plain")
         self.end_headers()
@@ -51,7 +66,8 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
 
 def run_health_check_server(port):
     server_address = ('', port)
-    httpd = HTTPServer(server_address, HealthCheckHandler)
+    # Threaded so a long-running profile never blocks the health check itself
+    httpd = ThreadingHTTPServer(server_address, HealthCheckHandler)
     logging.info(f"Starting health check server on port {port}")
     try:
         httpd.serve_forever()
@@ -67,6 +83,11 @@ def start_bot(bot_name, bot_token, app_token, ping_url, api_key):
         return
 
     app = App(token=bot_token, raise_error_for_unhandled_request=True)
+    # On SIGTERM: refuse new envelopes, close the socket, let runs finish, spool the rest
+    coordinator = shutdown.from_env(bot_name)
+    app.middleware(coordinator.middleware())
+    # Record received envelopes when CAPTURE_PATH is set (for replay.py)
+    capture.install(app, bot_name)
 
     # @app.middleware
     # def log_everything(context, payload, next):
@@ -77,58 +98,151 @@ def start_bot(bot_name, bot_token, app_token, ping_url, api_key):
     #     next()
     
 
+    # One Langflow run per session: a newer mention, or an edit/delete of the message a
+    # run was started for, cancels it. REFORWARD_EDITS=true re-sends edited mentions.
+    runs = inflight.InflightRegistry()
+    reforward_edits = os.environ.get("REFORWARD_EDITS", "false").lower() == "true"
+
+    # Optional: merge quick bursts of mentions in one session into a single forward
+    # (DEBOUNCE_WINDOW_MS; DEBOUNCE_MODE=concat joins the texts, latest keeps the earlier events alongside)
+    merge_mode = os.environ.get("DEBOUNCE_MODE", "concat")
+
+    # REPLY_FROM_BOT=true: for flows that return their answer instead of posting it, the
+    # bot posts it in the session's thread, unless a newer event superseded the run
+    # while the answer was on its way
+    reply = None
+    if os.environ.get("REPLY_FROM_BOT", "false").lower() == "true":
+        reply_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f"{bot_name}-reply")
+
+        def post_reply(run, text):
+            if not runs.is_current(run):
+                runs.suppress(run)
+                return
+            channel, thread_ts = run.session_id.split("-", 1)
+            try:
+                app.client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=text)
+            except Exception as e:
+                logging.error(f"Error posting the flow's reply for session {run.session_id}: {e}")
+
+        def reply(run, text):
+            # on_done runs on the shared event loop, which must not wait on Slack
+            reply_pool.submit(post_reply, run, text)
+
+    def forward_burst(session_id, burst):
+        merged = events.merge_events(burst, merge_mode)
+        data = events.build_flow_payload(json.dumps(merged), session_id)
+        forward_run(runs, data, session_id, merged.get("merged_ts", [merged.get("ts")]), ping_url, api_key, bot_name,
+                    reply=reply)
+
+    debouncer = debounce.from_env(forward_burst)
+
+    # With CLOUDINARY_URL set, files shared in a mention or in any message the bot sees are
+    # stored on Cloudinary and the forwarded event carries their CDN URLs under "cdn_files".
+    # That happens on the stage's own workers; the event is forwarded from there once its
+    # files are stored, so the listener (and the ack) never waits on a download or upload.
+    stage = attachments.get_stage()
+
+    def forward_mention(event):
+        # Session is channel-thread_ts inside a thread, channel-ts otherwise
+        session_id = events.session_id_for(event)
+        if debouncer is not None:
+            debouncer.submit(session_id, event)
+            return
+        data = events.build_flow_payload(json.dumps(event), session_id)
+        try:
+            forward_run(runs, data, session_id, event.get("ts"), ping_url, api_key, bot_name, reply=reply)
+        except Exception as e:
+            logging.error(f"Error forwarding event for {bot_name}: {e}")
+
+    def forward_shared_files(event):
+        data = events.build_flow_payload(json.dumps(event), events.session_id_for(event))
+        with coordinator.track({"data": data}):
+            forward_event(data, ping_url, api_key, bot_name)
+
+    forwarders = {"mention": forward_mention, "message": forward_shared_files}
+
+    def store_then_forward(kind, event, client):
+        entry = {"attachments": kind, "event": event}
+        if not stage.submit(entry, event, client, forwarders[kind]):
+            logging.warning(f"Shutting down; not storing the files shared in {event.get('channel')} at {event.get('ts')}")
+
+    # Teardown order: files being stored are finished first and pending bursts are forwarded
+    # next, so both join the runs being drained, and the HTTP session those runs use is
+    # closed only after that
+    if stage is not None:
+        coordinator.add_drain("attachments", stage.drain)
+    if debouncer is not None:
+        coordinator.add_drain("debounced bursts", lambda timeout: debouncer.flush_all())
+    coordinator.add_drain("langflow runs", runs.drain)
+    coordinator.add_drain("http session", lambda timeout: inflight.close_session())
+
+    def replay(entry):
+        if entry.get("attachments"):
+            if stage is not None:
+                store_then_forward(entry["attachments"], entry["event"], app.client)
+            else:
+                forwarders[entry["attachments"]](entry["event"])
+        elif entry.get("session_id"):
+            forward_run(runs, entry["data"], entry["session_id"], entry["event_ts"], ping_url, api_key, bot_name,
+                        reply=reply)
+        else:
+            forward_event(entry["data"], ping_url, api_key, bot_name)
+
+    # Forwards a previous instance could not finish before it was stopped
+    threading.Thread(
+        target=shutdown.replay_spool, args=(coordinator.spool_dir, bot_name, replay), name="spool-replay", daemon=True
+    ).start()
+
     @app.event("message")
-    def handle_message_events(body, logger):
-        pass
+    def handle_message_events(body, client, context, logger):
+        event = body.get("event", {})
+        subtype = event.get("subtype")
+        if subtype in (None, "file_share") and event.get("files"):
+            # Files shared with a mention are handled (and enriched) by the app_mention listener
+            if stage is not None and f"<@{context.bot_user_id}>" not in event.get("text", ""):
+                store_then_forward("message", event, client)
+            return
+        if subtype == "message_changed":
+            message = event.get("message", {})
+            if message.get("text") == event.get("previous_message", {}).get("text"):
+                return  # unfurls and other non-text edits
+        elif subtype == "message_deleted":
+            message = event.get("previous_message", {})
+        else:
+            return
+        if not message.get("ts") or not event.get("channel"):
+            return
+
+        message = dict(message, channel=event["channel"])
+        session_id = events.session_id_for(message)
+        reason = "edited" if subtype == "message_changed" else "deleted"
+        run = runs.supersede(session_id, message["ts"], reason=reason)
+        if run is None:
+            return
+        logger.info(f"Cancelled in-flight run for {bot_name} session {session_id}: message {reason}")
+
+        if reason == "edited" and reforward_edits and f"<@{context.bot_user_id}>" in message.get("text", ""):
+            edited = dict(message, type="app_mention", event_ts=message["ts"], edited=True)
+            data = events.build_flow_payload(json.dumps(edited), session_id)
+            forward_run(runs, data, session_id, message["ts"], ping_url, api_key, bot_name, reply=reply)
 
     @app.event("app_mention")  # Listen to app mention events
-    def handle_app_mention_events(body, logger):
+    def handle_app_mention_events(body, client, logger):
         logger.info(f"App mention event received for {bot_name}")
         event = body.get("event", {})
-        # print the entire event
-        print("=" * 40)
-        print(f"📦 Incoming payload to app mention:")
-        print(json.dumps(body, indent=2))
-        print("=" * 40)
-
-        channel_id = event.get("channel")
-        # Get timestamps from the event
-        ts = event.get("ts")
-        thread_ts = event.get("thread_ts")
-
-        # Determine session_id: use thread_ts if present, otherwise use ts
-        # Explicitly convert the result to a string
-        # make the session id the channel_id - thread_ts
-        # if only the thred_ts is unavailable, make the session_id channel_id-ts
-        session_id = str(channel_id + "-" + thread_ts if thread_ts else channel_id + "-" + ts)
-
-        # Now session_id is guaranteed to be a string
-        # (e.g., "1701234567.123456" or potentially "None" if ts was also None)
-
-        event_str = json.dumps(event)  # Convert event to a JSON string
-        # logger.info(f"Event String for {bot_name}: {event_str}")
-        data = {
-            "input_value": event_str,
-            "input_type": "text",
-            "output_type": "text",
-            "session_id": session_id
-        }
-        try:
-            forward_event(data, ping_url, api_key, bot_name)
-        except Exception as e:
-            logger.error(f"Error forwarding event for {bot_name}: {e}")
+        logging.debug(f"({bot_name}) Incoming payload to app mention: {json.dumps(body, indent=2)}")
+        if stage is not None and event.get("files"):
+            store_then_forward("mention", event, client)
+            return
+        forward_mention(event)
 
     @app.event("reaction_added")  # Listen to reaction added events
     def handle_reaction_added_events(body, logger):
         logger.info(f"Reaction added event received for {bot_name}")
         event = body.get("event", {})
-        event_str = json.dumps(event)  # Convert event to a JSON string
-        data = {
-            "input_value": event_str,
-            "input_type": "text",
-            "output_type": "text"
-        }
-        forward_event(data, ping_url, api_key, bot_name)
+        data = events.build_flow_payload(json.dumps(event))
+        with coordinator.track({"data": data}):
+            forward_event(data, ping_url, api_key, bot_name)
     
     @app.error
     def handle_errors(error, body, logger):
@@ -146,27 +260,60 @@ def start_bot(bot_name, bot_token, app_token, ping_url, api_key):
     health_thread = threading.Thread(target=run_health_check_server, args=(health_check_port,), daemon=True)
     health_thread.start()
 
-    print(f"Info: Starting {bot_name} in Socket Mode!")
+    logging.info(f"Starting {bot_name} in Socket Mode")
 
     try:
         handler = SocketModeHandler(app, app_token)
-        handler.start() # This blocks until stopped
+        coordinator.add_handler(handler)
+        coordinator.install()
+        handler.connect()
+        coordinator.wait()  # Blocks until SIGTERM/SIGINT and the drain that follows
     except Exception as e:
         logging.error(f"Error starting Socket Mode handler for {bot_name}: {e}")
     finally:
          # Optional: Could add logic here to signal the health check server to stop if needed
          pass
 
-# Helper function to forward events
-def forward_event(data, ping_url, api_key, bot_name):
-    logging.info(f"forwarding the event to {bot_name}")
-    logging.info(f"ping_url: {ping_url}")
-    logging.info(f"api_key snippet: {api_key[-10:]}")
+def flow_headers(api_key):
     headers = {"Content-Type": "application/json"}
     if api_key:
         headers['x-api-key'] = api_key
     else:
         logging.warning("FLOW_API_KEY not set. Proceeding without x-api-key header.")
+    return headers
+
+# Forward a session's event as its (cancellable) in-flight Langflow run
+def forward_run(runs, data, session_id, event_ts, ping_url, api_key, bot_name, reply=None):
+    logging.info(f"forwarding the event to {bot_name} (session {session_id})")
+
+    def on_done(run, result):
+        if isinstance(result, Exception):
+            logging.warning(f"Exception while pinging URL: {str(result)}")
+            return
+        status, text = result
+        if status >= 200 and status < 300:
+            logging.info("Info: Successfully pinged URL")
+            if reply is not None:
+                try:
+                    answer = result_text(json.loads(text))
+                    if answer:
+                        reply(run, answer)
+                except Exception as e:
+                    logging.error(f"Error posting the flow's reply for session {session_id}: {e}")
+        else:
+            logging.error(f"Failed to ping URL. Status code: {status}, Response: {text}")
+
+    payload = {"session_id": session_id, "event_ts": event_ts if isinstance(event_ts, str) else list(event_ts), "data": data}
+    # Set once the request is on the wire; only runs Langflow never received are spooled at shutdown
+    sent = threading.Event()
+    runs.start(session_id, event_ts, inflight.post_json(ping_url, data, flow_headers(api_key), sent=sent), on_done,
+               payload=payload, sent=sent)
+
+# Helper function to forward events
+def forward_event(data, ping_url, api_key, bot_name):
+    logging.info(f"forwarding the event to {bot_name}")
+    logging.info(f"ping_url: {ping_url}")
+    headers = flow_headers(api_key)
 
     try:
         response = requests.post(
@@ -175,7 +322,6 @@ def forward_event(data, ping_url, api_key, bot_name):
             json=data,
             timeout=5
         )
-        print("response: ", response)
         if response.status_code >= 200 and response.status_code < 300:
             logging.info("Info: Successfully pinged URL")
         else:
@@ -186,7 +332,7 @@ def forward_event(data, ping_url, api_key, bot_name):
 if __name__ == "__main__":
 
     # Call start_bot directly for the first bot
-    print(f"Starting bot: {bot_name}")
+    logging.info(f"Starting bot: {bot_name}")
     start_bot(
         bot_name=bot_name,
         bot_token=bot_token,
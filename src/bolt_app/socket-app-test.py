@@ -8,7 +8,8 @@ from slack_bolt.adapter.socket_mode import SocketModeHandler
 from slack_bolt.error import BoltUnhandledRequestError
 from dotenv import load_dotenv
 import logging
-from http.server import BaseHTTPRequestHandler, HTTPServer # <-- Import HTTP server modules
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # <-- Import HTTP server modules
+import profiling
 
 # Load environment variables
 load_dotenv()
@@ -40,7 +41,10 @@ FLOW_API_KEY = os.environ.get("FLOW_API_KEY")
 # --- Health Check Server ---
 class HealthCheckHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        # Respond with 200 OK for any GET request
+        # Admin profiling endpoints (off unless PROFILING_TOKEN is set)
+        if profiling.handle_admin_request(self):
+            return
+        # Respond with 200 OK for any other GET request
         self.send_response(200)
         self.send_header("Content-type", "text/plain")
         self.end_headers()
@@ -48,7 +52,8 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
 
 def run_health_check_server(port):
     server_address = ('', port)
-    httpd = HTTPServer(server_address, HealthCheckHandler)
+    # Threaded so a long-running profile never blocks the health check itself
+    httpd = ThreadingHTTPServer(server_address, HealthCheckHandler)
     logging.info(f"Starting health check server on port {port}")
     try:
         httpd.serve_forever()
@@ -161,7 +166,6 @@ def forward_event(data, ping_url, api_key, bot_name):
 if __name__ == "__main__":
     # Retrieve the shared API key from environment variable
     flow_api_key = os.environ.get("FLOW_API_KEY")
-    print("flow_api_key: ", flow_api_key)
     if not flow_api_key:
         logging.warning("Environment variable FLOW_API_KEY not set. API key header will not be sent.")
 
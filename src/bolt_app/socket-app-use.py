@@ -1,11 +1,18 @@
 import os
-import requests
+import sys
 import json
 import threading
 import pandas as pd
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from dotenv import load_dotenv
+import event_filter
+import routing
+import ingest
+import digest
+import archive
+import shutdown
+from time import perf_counter
 
 # Load environment variables
 load_dotenv()
@@ -16,22 +23,51 @@ bot_configs = pd.DataFrame([
         "name": "DummyBot",
         "bot_token": os.environ.get("DUMMY_BOT_TOKEN"),
         "app_token": os.environ.get("DUMMY_APP_TOKEN"),
-        "ping_url": "http://35.236.125.235:8501/api/v1/run/70769140-1841-468d-81fe-eac021cf7ac8?stream=false"
+        "ping_url": "http://35.236.125.235:8501/api/v1/run/70769140-1841-468d-81fe-eac021cf7ac8?stream=false",
+        "api_key": os.environ.get("FLOW_API_KEY")
     },
     {
         "name": "DummyBot2",
         "bot_token": os.environ.get("DUMMY_BOT2_TOKEN"),
         "app_token": os.environ.get("DUMMY_APP2_TOKEN"),
-        "ping_url": "http://127.0.0.1:7860/api/v1/run/595fb00d-675f-49e4-8283-ff9ec4fc40d7?stream=false"
+        "ping_url": "http://127.0.0.1:7860/api/v1/run/595fb00d-675f-49e4-8283-ff9ec4fc40d7?stream=false",
+        "api_key": os.environ.get("FLOW_API_KEY")
     }
 ])
 
-def start_bot(bot_name, bot_token, app_token, ping_url):
+# One coordinator for the process: on SIGTERM every bot stops acking, then the shared
+# digest and archive are flushed before exit
+coordinator = shutdown.from_env("socket-app-use")
+
+def build_payload(event):
+    event_str = json.dumps(event)  # Convert event to a JSON string
+    print("event_str: ", event_str)
+    return {
+        "input_value": event_str,
+        "input_type": "text",
+        "output_type": "text"
+    }
+
+def start_bot(bot_name, bot_token, app_token, ping_url, api_key=None):
     if not bot_token or not app_token:
         print(f"Error: Tokens are required for {bot_name}")
         return
 
     app = App(token=bot_token)
+    # Drop noise (own/bot messages, edits, joins/leaves) before it is serialized or forwarded;
+    # channel allow-lists and other per-bot rules come from EVENT_FILTER_PATH
+    event_filter.install(app, bot_name)
+    # While shutting down, envelopes are refused so Slack redelivers them elsewhere
+    app.middleware(coordinator.middleware())
+    # Events go to the flows ROUTES_PATH maps them to (default: ping_url), each with its own pool and timeout
+    router = routing.load_router(bot_name, ping_url, api_key, timeout=5)
+    # Copies of one event arriving through several bots are forwarded once, to the bots that want it
+    hub = ingest.get_hub()
+    hub.register(bot_name, router)
+    # With DIGEST_URL set, plain channel messages are batched per channel instead of forwarded one by one
+    digester = digest.get_aggregator(api_key)
+    # With ARCHIVE_PATH set, every event and its handling time is archived to Parquet/Arrow off-thread
+    archiver = archive.get_archiver()
 
     # @app.event("message")  # Listen to message events
     # def handle_message_events(body, logger, say):
@@ -58,17 +94,23 @@ def start_bot(bot_name, bot_token, app_token, ping_url):
     def handle_all_events(body, logger, next):
         logger.info(f"event received for {bot_name}")
         print(bot_name, " is receiving an event")
+        started = perf_counter()
         event = body.get("event", {})
-        event_str = json.dumps(event)  # Convert event to a JSON string
-        print("event_str: ", event_str)
-        data = {
-            "input_value": event_str,
-            "input_type": "text",
-            "output_type": "text"
-        }
-        forward_event(data, ping_url)
+        if digester is not None and digest.wants(event):
+            status = "digested" if hub.claim(body, event) else "duplicate"
+            if status == "digested":
+                digester.add(event)
+        else:
+            status = hub.receive(bot_name, body, event, build_payload)
+        ingest_us = (perf_counter() - started) * 1e6
 
         next()
+        if archiver is not None:
+            archiver.record(archive.row_for(
+                bot_name, body, event, status,
+                dedup_key=ingest.dedup_key(body, event), duplicate=status == "duplicate",
+                ingest_us=ingest_us, handler_us=(perf_counter() - started) * 1e6,
+            ))
     # app.middleware(handle_all_events)
 
     # @app.event("app_mention")  # Listen to app mention events
@@ -100,31 +142,43 @@ def start_bot(bot_name, bot_token, app_token, ping_url):
 
     print(f"Info: Starting {bot_name} in Socket Mode!")
     handler = SocketModeHandler(app, app_token)
-    handler.start()
-
-# Helper function to forward events
-def forward_event(data, ping_url):
-    print("forwarding the event to the agent: ", data)
-    try:
-        response = requests.post(
-            ping_url,
-            headers={"Content-Type": "application/json"},
-            json=data,
-            timeout=5
-        )
-        if response.status_code >= 200 and response.status_code < 300:
-            print("Info: Successfully pinged URL")
-        else:
-            print(f"Error: Failed to ping URL. Status code: {response.status_code}")
-    except Exception as e:
-        print(f"Error: Exception while pinging URL: {str(e)}")
+    coordinator.add_handler(handler)
+    handler.connect()
 
 if __name__ == "__main__":
+    # Bots share the hub, metrics and archive; all are safe to run without the GIL (python3.13t)
+    print(f"Info: Python {sys.version.split()[0]}, GIL {'enabled' if getattr(sys, '_is_gil_enabled', lambda: True)() else 'disabled'}")
     threads = []
     for _, row in bot_configs.iterrows():
-        thread = threading.Thread(target=start_bot, args=(row['name'], row['bot_token'], row['app_token'], row['ping_url']))
+        thread = threading.Thread(target=start_bot, args=(row['name'], row['bot_token'], row['app_token'], row['ping_url'], row['api_key']))
         threads.append(thread)
         thread.start()
 
     for thread in threads:
-        thread.join()
\ No newline at end of file
+        thread.join()
+
+    # Drains run in this order within SHUTDOWN_DEADLINE_SECONDS: digest windows are sent
+    # before the flow forwards are drained, and the archive goes last so it still records
+    # what the others finish. Forwards that never started are spooled, not raced.
+    hub = ingest.get_hub()
+    digester = digest.get_aggregator(os.environ.get("FLOW_API_KEY"))
+    if digester is not None:
+        coordinator.add_drain("digest windows", digester.flush_all)
+    coordinator.add_drain("flow forwards", hub.drain)
+
+    def replay(entry):
+        if "digest" in entry:
+            if digester is not None:
+                digester.send(entry["digest"])
+        else:
+            hub.replay(entry)
+
+    # Windows and forwards a previous instance could not send before it was stopped
+    threading.Thread(
+        target=shutdown.replay_spool, args=(coordinator.spool_dir, coordinator.name, replay), name="spool-replay", daemon=True
+    ).start()
+    archiver = archive.get_archiver()
+    if archiver is not None:
+        coordinator.add_drain("archive", archiver.close)
+    coordinator.install()
+    coordinator.wait()  # Blocks until SIGTERM/SIGINT and the drain that follows
@@ -0,0 +1,188 @@
+import os
+import re
+import time
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from cache import PersistentTTLCache
+
+NWS_BASE_URL = "https://api.weather.gov"
+USER_AGENT = "SlackWeatherBot/1.0"
+
+# Coordinates are rounded before the /points lookup so nearby places share a
+# grid entry; 2 decimals is ~1km, well inside one 2.5km NWS grid cell.
+GRID_PRECISION = 2
+GRID_TTL = 30 * 24 * 3600
+# Used when a forecast response carries no Cache-Control/Expires
+DEFAULT_FORECAST_TTL = 600
+# Concurrent requests we allow ourselves against api.weather.gov
+NWS_MAX_CONCURRENCY = 4
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_MAX_AGE = re.compile(r"(?:s-maxage|max-age)=(\d+)")
+
+
+def forecast_expiry(headers, now):
+    """Absolute expiry time for a response from its Cache-Control / Expires headers."""
+    cache_control = headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return now
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return now + int(match.group(1))
+    if headers.get("Expires"):
+        try:
+            expires = parsedate_to_datetime(headers["Expires"])
+            # Measure against the server's Date header so local clock skew doesn't matter
+            served = parsedate_to_datetime(headers["Date"]) if headers.get("Date") else datetime.now(timezone.utc)
+            return now + max(0.0, (expires - served).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return now + DEFAULT_FORECAST_TTL
+
+
+def select_period(periods, time_phrase=None, now=None):
+    """
+    Pick the forecast period matching a phrase like "today", "tonight", "tomorrow",
+    "tomorrow night", "saturday", "this weekend" or "now". Falls back to the first period.
+    """
+    if not periods:
+        return None
+    phrase = (time_phrase or "today").strip().lower()
+    starts = [datetime.fromisoformat(p["startTime"]) for p in periods]
+    ends = [datetime.fromisoformat(p["endTime"]) for p in periods]
+    local_now = (now or datetime.now(timezone.utc)).astimezone(starts[0].tzinfo)
+    today = local_now.date()
+
+    def first(predicate):
+        for period, start in zip(periods, starts):
+            if predicate(period, start):
+                return period
+        return None
+
+    if phrase in ("now", "current", "currently", "right now"):
+        for period, start, end in zip(periods, starts, ends):
+            if start <= local_now < end:
+                return period
+        return periods[0]
+    if phrase in ("today", "this morning", "this afternoon"):
+        return periods[0]
+    if phrase in ("tonight", "this evening", "overnight"):
+        return first(lambda p, s: not p["isDaytime"]) or periods[0]
+
+    night = phrase.endswith(" night")
+    day = phrase[: -len(" night")] if night else phrase
+    if day.startswith("this ") or day.startswith("next "):
+        day = day[5:]
+    if day == "weekend":
+        day = "saturday"
+    if day == "tomorrow":
+        target = today + timedelta(days=1)
+    elif day in WEEKDAYS:
+        days_ahead = (WEEKDAYS.index(day) - today.weekday()) % 7
+        target = today + timedelta(days=days_ahead)
+    else:
+        named = first(lambda p, s: p["name"].lower() == phrase)
+        return named or periods[0]
+    return first(lambda p, s: s.date() == target and p["isDaytime"] != night) or periods[0]
+
+
+class WeatherClient:
+    """
+    api.weather.gov access with two caches:
+    grid mappings (/points) persisted for weeks, keyed by rounded coordinates, and
+    forecasts held in memory until the server's Cache-Control/Expires says they are
+    stale, then revalidated with a conditional GET.
+    """
+
+    def __init__(self, grid_cache, timeout=10, max_concurrency=NWS_MAX_CONCURRENCY):
+        self.grid_cache = grid_cache
+        self.timeout = timeout
+        # Per-host politeness: however many lookups fan out, only this many hit NWS at once
+        self._host_slots = threading.BoundedSemaphore(max_concurrency)
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept": "application/geo+json"})
+        self._forecasts = {}
+        self._lock = threading.Lock()
+
+    def forecast_url(self, latitude, longitude):
+        key = f"{round(float(latitude), GRID_PRECISION)},{round(float(longitude), GRID_PRECISION)}"
+        url = self.grid_cache.get(key)
+        if url is not None:
+            return url
+        points_url = f"{NWS_BASE_URL}/points/{key}"
+        logging.info(f"Making request to: {points_url}")
+        with self._host_slots:
+            response = self.session.get(points_url, timeout=self.timeout)
+        logging.info(f"NWS points response status: {response.status_code}")
+        if response.status_code != 200:
+            logging.error(f"Failed to fetch grid points: {response.status_code} - {response.text[:200]}")
+            return None
+        url = response.json()["properties"]["forecast"]
+        self.grid_cache.set(key, url)
+        return url
+
+    def forecast_periods(self, url):
+        now = time.time()
+        with self._lock:
+            entry = self._forecasts.get(url)
+        if entry is not None and entry["expires"] > now:
+            return entry["periods"]
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        logging.info(f"Fetching forecast from: {url}")
+        try:
+            with self._host_slots:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            logging.error(f"Failed to fetch forecast, serving the stale one: {e}")
+            return entry["periods"]
+        logging.info(f"NWS forecast response status: {response.status_code}")
+
+        if response.status_code == 304 and entry is not None:
+            entry = dict(entry, expires=forecast_expiry(response.headers, now))
+        elif response.status_code == 200:
+            entry = {
+                "periods": response.json()["properties"]["periods"],
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "expires": forecast_expiry(response.headers, now),
+            }
+        else:
+            logging.error(f"Failed to fetch forecast: {response.status_code} - {response.text[:200]}")
+            # Serve the stale forecast rather than nothing if we have one
+            return entry["periods"] if entry is not None else None
+
+        with self._lock:
+            self._forecasts[url] = entry
+        return entry["periods"]
+
+    def get_forecast(self, latitude, longitude, time_phrase=None):
+        url = self.forecast_url(latitude, longitude)
+        if url is None:
+            return None
+        return select_period(self.forecast_periods(url), time_phrase)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_weather_client():
+    """Process-wide WeatherClient; grid mappings persist at WEATHER_CACHE_PATH, NWS_MAX_CONCURRENCY caps parallel requests."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            path = os.environ.get("WEATHER_CACHE_PATH", os.path.join(tempfile.gettempdir(), "bolt_app_weather.sqlite3"))
+            max_concurrency = int(os.environ.get("NWS_MAX_CONCURRENCY", NWS_MAX_CONCURRENCY))
+            _client = WeatherClient(PersistentTTLCache(path, table="nws_grid", ttl=GRID_TTL), max_concurrency=max_concurrency)
+    return _client
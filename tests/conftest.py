@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The bot modules live next to the scripts that use them and import each other by bare name
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src", "bolt_app"))
@@ -0,0 +1,138 @@
+import time
+import logging
+import functools
+import pytest
+import openai
+import slack_bolt
+from fakes import FakeOpenAI
+import async_runtime
+
+CHAT_ANSWER = "Arr, that be a fine question matey"
+# Mentions the weather without asking about it, so no local classifier can settle the intent
+QUESTION = "what is the meaning of life on a cold night at sea"
+
+
+@pytest.fixture(scope="module")
+def app():
+    # app.py builds its Slack app and OpenAI clients at import; skip the auth.test
+    # round trip and point the clients at a local fake instead. Streaming and the
+    # answer cache stay off unless a test turns them on.
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("SLACK_BOT_TOKEN", "xoxb-test")
+        patch.setenv("SLACK_SIGNING_SECRET", "secret")
+        patch.setenv("OPENAI_API_KEY", "sk-test")
+        patch.setenv("STREAM_REPLIES", "false")
+        patch.setenv("CHAT_CACHE_INTENTS", "")
+        patch.delenv("INTENT_MODEL_PATH", raising=False)
+        patch.setattr(slack_bolt, "App", functools.partial(slack_bolt.App, token_verification_enabled=False))
+        import app
+        yield app
+
+@pytest.fixture
+def openai_server(app, monkeypatch):
+    intents = {"intent": '{"intent": "chat"}'}
+
+    def respond(messages):
+        return intents["intent"] if messages[0]["content"] == app.INTENT_SYSTEM_PROMPT else CHAT_ANSWER
+
+    server = FakeOpenAI(respond).start()
+    server.intents = intents
+    monkeypatch.setattr(app, "client", openai.OpenAI(api_key="sk-test", base_url=server.api_url, max_retries=0))
+    monkeypatch.setattr(app, "async_client", openai.AsyncOpenAI(api_key="sk-test", base_url=server.api_url, max_retries=0))
+    yield server
+    server.stop()
+
+
+class Channel:
+    """`say` and `context.client` for one handler call: records posts and edits."""
+
+    def __init__(self, fail_first_post=False):
+        self.posts = []
+        self.edits = []
+        self.fail_first_post = fail_first_post
+        self.client = self
+
+    def say(self, text):
+        if self.fail_first_post:
+            self.fail_first_post = False
+            raise RuntimeError("channel_not_found")
+        self.posts.append(text)
+        return {"channel": "C1", "ts": f"{len(self.posts)}.000000"}
+
+    def chat_update(self, channel, ts, text):
+        self.edits.append(text)
+
+def mention(app, text, channel):
+    body = {"event": {"type": "app_mention", "text": f"<@B1> {text}", "bot_id": "b1"}}
+    app.handle_app_mention_events(body, channel.say, channel)
+
+
+def test_chat_answer_without_extras(app, openai_server):
+    channel = Channel()
+    mention(app, QUESTION, channel)
+    assert channel.posts == [CHAT_ANSWER]
+    assert len(openai_server.requests) == 2
+
+def test_speculative_chat_answers_in_one_round_trip(app, openai_server, monkeypatch):
+    monkeypatch.setattr(app, "SPECULATIVE_CHAT", True)
+    hits = app.speculation_stats.chat_hits
+    channel = Channel()
+    mention(app, QUESTION, channel)
+    assert channel.posts == [CHAT_ANSWER]
+    assert len(openai_server.requests) == 2
+    assert app.speculation_stats.chat_hits == hits + 1
+
+def test_speculative_answer_is_discarded_for_weather(app, openai_server):
+    openai_server.intents["intent"] = '{"intent": "weather", "locations": ["Denver"], "time": "today"}'
+    discarded = app.speculation_stats.discarded
+    intent, answer = async_runtime.run(app.speculative_intent_and_chat("weather in denver"), timeout=30)
+    assert '"weather"' in intent and answer is None
+    assert app.speculation_stats.discarded == discarded + 1
+
+def test_streamed_reply_edits_one_message(app, openai_server, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_REPLIES", True)
+    monkeypatch.setattr(app, "STREAM_UPDATE_INTERVAL", 0.0)
+    channel = Channel()
+    mention(app, QUESTION, channel)
+    assert channel.posts == [":hourglass_flowing_sand: Thinking..."]
+    assert channel.edits[-1] == CHAT_ANSWER
+    assert all(edit.endswith(" ▌") for edit in channel.edits[:-1])
+
+def test_broken_stream_keeps_the_partial_answer(app, openai_server, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_REPLIES", True)
+    monkeypatch.setattr(app, "STREAM_UPDATE_INTERVAL", 0.0)
+    openai_server.fail_stream_after = 3
+    channel = Channel()
+    mention(app, QUESTION, channel)
+    assert len(channel.posts) == 1
+    assert channel.edits[-1].startswith("Arr, that be ")
+    assert "lost my train of thought" in channel.edits[-1]
+
+def test_stream_errors_are_logged_before_the_fallback(app, openai_server, monkeypatch, caplog):
+    monkeypatch.setattr(app, "STREAM_REPLIES", True)
+    channel = Channel(fail_first_post=True)
+    with caplog.at_level(logging.ERROR):
+        mention(app, QUESTION, channel)
+    assert "channel_not_found" in caplog.text
+    assert channel.posts == ["Sorry, I couldn't process your question at the moment."]
+
+def test_intent_locations(app):
+    assert app.intent_locations({"location": "Denver"}) == ["Denver"]
+    assert app.intent_locations({"locations": ["Denver", " Denver ", "Boston", ""]}) == ["Denver", "Boston"]
+    assert app.intent_locations({"locations": []}) == ["University Heights, San Diego"]
+
+def test_weather_locations_are_looked_up_concurrently(app, openai_server, monkeypatch):
+    openai_server.intents["intent"] = '{"intent": "weather", "locations": ["Denver", "Boston", "Austin"], "time": "today"}'
+
+    def weather_report(location, time_phrase):
+        time.sleep(0.2)
+        return None if location == "Boston" else f"Weather in {location}"
+
+    monkeypatch.setattr(app, "weather_report", weather_report)
+    channel = Channel()
+    started = time.monotonic()
+    mention(app, "weather in denver, boston and austin", channel)
+    assert time.monotonic() - started < 0.5
+    assert channel.posts == [
+        "Weather in Denver\n\nSorry, I couldn't fetch the weather for Boston at the moment.\n\nWeather in Austin"
+    ]
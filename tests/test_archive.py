@@ -0,0 +1,73 @@
+import os
+import glob
+import time
+import pytest
+import archive
+import report
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def message_row(bot="Bot", ts="1.000001", status="dispatched"):
+    body = {"type": "event_callback", "event_time": int(time.time())}
+    event = {"type": "message", "channel": "C1", "user": "U1", "ts": ts, "text": "hello"}
+    return archive.row_for(bot, body, event, status, dedup_key=("T1", "C1", ts, "message", ""), ingest_us=12.5)
+
+def parts(root, pattern="part-*.parquet"):
+    return glob.glob(os.path.join(root, "**", pattern), recursive=True)
+
+
+def test_open_parts_are_hidden_until_closed(tmp_path):
+    root = str(tmp_path)
+    archiver = archive.Archiver(root, batch_rows=1, flush_seconds=60, roll_seconds=60)
+    try:
+        archiver.record(message_row())
+        assert wait_for(lambda: parts(root, "_part-*.parquet.inprogress"))
+        assert parts(root) == []
+        # The report can run while the writer is still open; it just doesn't see that part yet
+        assert len(report.load(root)) == 0
+    finally:
+        archiver.close()
+    assert parts(root, "_part-*") == []
+    [part] = parts(root)
+    assert f"{os.sep}bot=Bot{os.sep}" in part
+    assert len(report.load(root)) == 1
+
+def test_parts_roll_on_the_flush_interval(tmp_path):
+    root = str(tmp_path)
+    archiver = archive.Archiver(root, flush_seconds=0.1, roll_seconds=0.1)
+    try:
+        archiver.record(message_row(ts="1.1"))
+        assert wait_for(lambda: len(parts(root)) == 1)
+        archiver.record(message_row(ts="1.2"))
+        assert wait_for(lambda: len(parts(root)) == 2)
+        assert len(report.load(root)) == 2
+    finally:
+        archiver.close()
+
+def test_part_names_are_unique_per_instance(tmp_path):
+    root = str(tmp_path)
+    for _ in range(2):
+        archiver = archive.Archiver(root, batch_rows=1)
+        archiver.record(message_row())
+        archiver.close()
+    assert len(set(parts(root))) == 2
+
+def test_close_is_a_drain(tmp_path):
+    archiver = archive.Archiver(str(tmp_path))
+    archiver.record(message_row())
+    assert archiver.close(timeout=5) == []
+    assert archiver.close(timeout=5) == []
+    assert len(report.load(str(tmp_path))) == 1
+
+def test_arrow_format(tmp_path):
+    archiver = archive.Archiver(str(tmp_path), fmt="arrow")
+    archiver.record(message_row())
+    archiver.close()
+    assert len(report.load(str(tmp_path), fmt="arrow")) == 1
+    with pytest.raises(ValueError):
+        archive.Archiver(str(tmp_path), fmt="csv")
@@ -0,0 +1,145 @@
+import os
+import hashlib
+import threading
+import pytest
+import cloudinary
+from slack_sdk import WebClient
+from fakes import FakeSlack, FakeCloudinary
+from cache import PersistentTTLCache
+import attachments
+
+
+@pytest.fixture(scope="module")
+def slack():
+    server = FakeSlack().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def client(slack):
+    return WebClient(token="xoxb-test", base_url=slack.api_url)
+
+@pytest.fixture
+def cdn(monkeypatch):
+    server = FakeCloudinary().start()
+    monkeypatch.setenv("CLOUDINARY_URL", server.cloudinary_url)
+    cloudinary.reset_config()
+    yield server
+    server.stop()
+
+def make_stage(**kwargs):
+    return attachments.AttachmentStage(PersistentTTLCache(":memory:", table="attachments"), **kwargs)
+
+def message_with(*files):
+    return {"type": "message", "subtype": "file_share", "channel": "C1", "ts": "1.000001", "files": list(files)}
+
+
+def test_large_files_are_uploaded_in_chunks(slack, client, cdn):
+    content = os.urandom(200_000)
+    stage = make_stage(chunk_size=64 * 1024)
+
+    event = stage.enrich(message_with(slack.add_file(content, "report.PDF", "application/pdf")), client)
+
+    [entry] = event["cdn_files"]
+    sha256 = hashlib.sha256(content).hexdigest()
+    public_id = f"slack/{sha256}.pdf"
+    assert entry["sha256"] == sha256
+    assert entry["size"] == len(content)
+    assert entry["url"].endswith(public_id)
+    assert "thumbnail_url" not in entry
+    assert cdn.uploads == 1
+    assert cdn.chunks == 4
+    assert cdn.largest_chunk <= 64 * 1024
+    assert cdn.assets[("raw", public_id)] == content
+
+def test_same_content_is_uploaded_once(slack, client, cdn):
+    content = os.urandom(10_000)
+    first = slack.add_file(content, "a.bin", "application/octet-stream")
+    second = slack.add_file(content, "b.bin", "application/octet-stream")
+    stage = make_stage()
+
+    url = stage.enrich(message_with(first), client)["cdn_files"][0]["url"]
+    assert stage.enrich(message_with(second), client)["cdn_files"][0]["url"] == url
+    assert cdn.uploads == 1
+
+    # A file seen before isn't even downloaded again
+    downloads = slack.downloads
+    assert stage.enrich(message_with(first), client)["cdn_files"][0]["url"] == url
+    assert slack.downloads == downloads
+
+def test_content_already_on_cloudinary_is_not_uploaded_again(slack, client, cdn):
+    content = os.urandom(10_000)
+    url = make_stage().enrich(message_with(slack.add_file(content, "a.bin")), client)["cdn_files"][0]["url"]
+
+    # A new instance (empty local cache) finds the asset by its content-addressed public ID
+    entry = make_stage().enrich(message_with(slack.add_file(content, "b.bin")), client)["cdn_files"][0]
+    assert entry["url"] == url
+    assert cdn.uploads == 1
+
+def test_images_get_a_bounded_thumbnail_url(slack, client, cdn):
+    content = os.urandom(5_000)
+    file = slack.add_file(content, "cat.png", "image/png")
+
+    entry = make_stage(thumbnail=(320, 200)).enrich(message_with(file), client)["cdn_files"][0]
+
+    thumbnail = entry["thumbnail_url"]
+    assert thumbnail.startswith("https://")
+    assert "c_limit,f_auto,h_200,q_auto,w_320" in thumbnail
+    assert thumbnail.endswith(f"slack/{hashlib.sha256(content).hexdigest()}")
+    assert "thumbnail_url" not in make_stage(thumbnail=None).enrich(message_with(file), client)["cdn_files"][0]
+
+def test_files_over_the_limit_are_left_out(slack, client, cdn):
+    event = message_with(slack.add_file(os.urandom(5_000), "big.bin"))
+
+    assert make_stage(max_bytes=1_000).enrich(event, client) is event
+    assert cdn.uploads == 0
+
+def test_parse_thumbnail():
+    assert attachments.parse_thumbnail("400x300") == (400, 300)
+    assert attachments.parse_thumbnail("256") == (256, 256)
+    assert attachments.parse_thumbnail("") is None
+
+def test_files_are_stored_off_the_listener_thread(slack, client, cdn):
+    stage = make_stage(workers=1)
+    forwarded = []
+    done = threading.Event()
+
+    def forward(event):
+        forwarded.append((event, threading.current_thread().name))
+        done.set()
+
+    assert stage.submit({"event": "1"}, message_with(slack.add_file(os.urandom(1_000))), client, forward)
+    assert done.wait(10)
+    [(event, thread)] = forwarded
+    assert thread.startswith("attachments")
+    assert len(event["cdn_files"]) == 1
+
+def test_drain_hands_back_files_not_yet_started(slack, client, cdn):
+    stage = make_stage(workers=1)
+    release = threading.Event()
+    stage.submit({"event": "blocker"}, message_with(), client, lambda event: release.wait(10))
+    stage.submit({"event": "queued"}, message_with(slack.add_file(os.urandom(1_000))), client, lambda event: None)
+
+    assert stage.drain(0.05) == [{"event": "queued"}]
+    assert not stage.submit({"event": "late"}, message_with(), client, lambda event: None)
+    release.set()
+
+def test_failed_lookups_still_forward_the_event(client, cdn):
+    forwarded = []
+    event = {"type": "file_shared", "file_id": "F_MISSING", "channel_id": "C1"}
+    stage = make_stage()
+    stage.submit({}, event, client, forwarded.append)
+    stage.drain(10)
+    assert forwarded == [event]
+
+def test_disabled_stage_is_decided_once(monkeypatch):
+    monkeypatch.delenv("CLOUDINARY_URL", raising=False)
+    monkeypatch.setattr(attachments, "_stage", None)
+    monkeypatch.setattr(attachments, "_stage_loaded", False)
+    cloudinary.reset_config()
+    assert attachments.get_stage() is None
+
+    resets = []
+    monkeypatch.setattr(cloudinary, "reset_config", lambda: resets.append(1))
+    assert attachments.get_stage() is None
+    assert resets == []
@@ -0,0 +1,41 @@
+from cache import PersistentTTLCache
+
+
+def test_get_set_delete():
+    cache = PersistentTTLCache(":memory:")
+    assert cache.get("k", "missing") == "missing"
+    cache.set("k", {"a": [1, 2]})
+    assert cache.get("k") == {"a": [1, 2]}
+    cache.delete("k")
+    assert cache.get("k") is None
+
+def test_entries_expire():
+    cache = PersistentTTLCache(":memory:", ttl=60)
+    cache.set("old", 1, ttl=-1)
+    cache.set("new", 2)
+    assert cache.get("old") is None
+    assert cache.purge_expired() == 1
+    assert cache.get("new") == 2
+
+def test_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    PersistentTTLCache(path, table="forecasts").set("k", "v")
+    assert PersistentTTLCache(path, table="forecasts").get("k") == "v"
+    assert PersistentTTLCache(path, table="other").get("k") is None
+
+def test_memory_is_bounded_and_falls_through_to_disk():
+    cache = PersistentTTLCache(":memory:", max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a") == "A"
+    assert list(cache._memory) == ["c", "a"]
+
+def test_expired_rows_are_purged_on_write():
+    cache = PersistentTTLCache(":memory:", purge_every=3)
+    cache.set("old", 1, ttl=-1)
+    cache.set("new", 2)
+    assert cache._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 2
+    cache.set("newer", 3)
+    assert cache._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 2
+    assert "old" not in cache._memory
@@ -0,0 +1,60 @@
+import time
+from callbacks import CallbackRegistry, result_text
+
+
+def mention(ts, thread_ts=None):
+    event = {"type": "app_mention", "channel": "C1", "ts": ts}
+    if thread_ts:
+        event["thread_ts"] = thread_ts
+    return event
+
+
+def test_result_text_shapes():
+    assert result_text("plain") == "plain"
+    assert result_text({"text": "a"}) == "a"
+    assert result_text({"result": "b"}) == "b"
+    assert result_text({"message": {"text": "c"}}) == "c"
+    assert result_text({"outputs": [{"outputs": [{"results": {"message": {"text": "d"}}}]}]}) == "d"
+    assert result_text({"outputs": []}) is None
+    assert result_text({"text": 3}) is None
+
+def test_correlate_and_resolve_once():
+    registry = CallbackRegistry("http://bot:8090/")
+    fields = registry.correlate(mention("1.1", thread_ts="1.0"))
+    assert fields["callback_url"] == f"http://bot:8090/callback/{fields['correlation_id']}"
+    pending = registry.resolve(fields["correlation_id"])
+    assert (pending.channel, pending.thread_ts) == ("C1", "1.0")
+    assert registry.resolve(fields["correlation_id"]) is None
+
+def test_entries_expire_after_the_ttl():
+    registry = CallbackRegistry("http://bot", ttl=0.05)
+    old = registry.correlate(mention("1.1"))["correlation_id"]
+    time.sleep(0.1)
+    new = registry.correlate(mention("1.2"))["correlation_id"]
+    assert registry.resolve(old) is None
+    assert registry.resolve(new) is not None
+
+def test_max_entries_drops_the_oldest():
+    registry = CallbackRegistry("http://bot", max_entries=2)
+    ids = [registry.correlate(mention(f"1.{i}"))["correlation_id"] for i in range(3)]
+    assert registry.active() == 2
+    assert registry.resolve(ids[0]) is None
+
+def test_restore_keeps_creation_order_for_expiry():
+    registry = CallbackRegistry("http://bot", ttl=0.15)
+    first = registry.correlate(mention("1.1"))["correlation_id"]
+    time.sleep(0.1)
+    second = registry.correlate(mention("1.2"))["correlation_id"]
+    registry.restore(first, registry.resolve(first))  # its reply could not be posted
+    time.sleep(0.08)
+    # `first` is past its TTL and must not shield anything behind it
+    assert registry.resolve("unknown") is None
+    assert registry.active() == 1
+    assert registry.resolve(second) is not None
+
+def test_discard():
+    registry = CallbackRegistry("http://bot")
+    correlation_id = registry.correlate(mention("1.1"))["correlation_id"]
+    registry.discard(correlation_id)
+    registry.discard(correlation_id)
+    assert registry.active() == 0
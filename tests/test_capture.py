@@ -0,0 +1,43 @@
+import replay
+from capture import CaptureWriter, read_capture, scrub
+
+
+def envelope(ts, token="xoxb-1234-abcd"):
+    return {
+        "type": "event_callback",
+        "token": "verification-token",
+        "event": {"type": "app_mention", "text": f"hi, my token is {token}", "event_ts": ts},
+        "response_url": "https://hooks.slack.com/actions/T1/1/secret",
+        "authorizations": [{"user_id": "U1", "api_key": "sk-123"}],
+    }
+
+def test_scrub_redacts_secrets():
+    body = scrub(envelope("1.000001"))
+    assert body["token"] == "REDACTED"
+    assert body["response_url"] == "REDACTED"
+    assert body["authorizations"] == [{"user_id": "U1", "api_key": "REDACTED"}]
+    assert body["event"]["text"] == "hi, my token is xoxb-REDACTED"
+    assert body["event"]["event_ts"] == "1.000001"
+
+def test_capture_round_trip(tmp_path):
+    path = str(tmp_path / "traffic.jsonl.gz")
+    for _ in range(2):  # each writer appends its own gzip member
+        writer = CaptureWriter(path, flush_interval=0.01)
+        writer.write({"t": 1.0, "bot": "bot1", "body": scrub(envelope("1.000001"))})
+        writer.close()
+    records = list(read_capture(path))
+    assert len(records) == 2
+    assert records[0]["body"]["response_url"] == "REDACTED"
+
+def test_replayed_duplicates_get_distinct_keys(tmp_path):
+    path = str(tmp_path / "traffic.jsonl.gz")
+    writer = CaptureWriter(path, flush_interval=0.01)
+    for t, ts in ((1.0, "1.000001"), (1.5, "1.000001"), (3.0, "2.000001")):
+        writer.write({"t": t, "bot": "bot1", "body": envelope(ts)})
+    writer.close()
+
+    records = replay.load_records(path)
+    assert [r["key"] for r in records] == ["1.000001", "1.000001-1", "2.000001"]
+    assert replay.schedule(records, 2.0, "original") == [0.0, 0.25, 1.0]
+    assert replay.schedule(records, 1.0, "even") == [0.0, 1.0, 2.0]
+    assert replay.schedule(records, None, "original") == [0.0, 0.0, 0.0]
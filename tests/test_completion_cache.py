@@ -0,0 +1,62 @@
+import time
+import threading
+import pytest
+import completion_cache
+from cache import PersistentTTLCache
+from completion_cache import CompletionCache, cache_key
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(completion_cache, "_cache", None)
+    yield
+    completion_cache._cache = None
+
+def test_caching_is_opt_in(monkeypatch, fresh_cache):
+    monkeypatch.delenv("CHAT_CACHE_INTENTS", raising=False)
+    assert not completion_cache.get_completion_cache().allows("chat")
+
+def test_intents_come_from_the_environment(monkeypatch, fresh_cache):
+    monkeypatch.setenv("CHAT_CACHE_INTENTS", "chat, faq")
+    cache = completion_cache.get_completion_cache()
+    assert cache.allows("chat") and cache.allows("faq")
+    assert not cache.allows("weather")
+
+def test_questions_are_normalized():
+    assert cache_key("m", "p", "What is Slack?") == cache_key("m", "p", "  what IS   slack ")
+    assert cache_key("m", "p", "What is Slack?") != cache_key("m", "other", "What is Slack?")
+
+def test_lru_is_bounded_and_backed_by_the_store():
+    store = PersistentTTLCache(":memory:", table="completions")
+    cache = CompletionCache(max_entries=1, store=store, intents=["chat"])
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert list(cache._entries) == ["b"]
+    assert cache.get("a") == "A"
+
+def test_concurrent_misses_share_one_call():
+    cache = CompletionCache(intents=["chat"])
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["answer"] * 4 and len(calls) == 1
+
+def test_failures_are_not_cached():
+    cache = CompletionCache(intents=["chat"])
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", lambda: (_ for _ in ()).throw(RuntimeError("down")))
+    assert cache.get_or_compute("k", lambda: "ok") == "ok"
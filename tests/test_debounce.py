@@ -0,0 +1,44 @@
+import time
+import threading
+from debounce import SessionDebouncer
+
+
+class Flushes:
+    def __init__(self):
+        self.calls = []
+        self.done = threading.Event()
+
+    def __call__(self, session_id, events):
+        self.calls.append((session_id, list(events), time.monotonic()))
+        self.done.set()
+
+
+def test_a_burst_is_flushed_once():
+    flushes = Flushes()
+    debouncer = SessionDebouncer(flushes, window=0.1, max_wait=2)
+    for n in range(3):
+        debouncer.submit("C1-1", n)
+        time.sleep(0.02)
+    debouncer.submit("C2-1", "other")
+    assert flushes.done.wait(2)
+    time.sleep(0.2)
+    assert sorted((session, events) for session, events, _ in flushes.calls) == [("C1-1", [0, 1, 2]), ("C2-1", ["other"])]
+
+def test_max_wait_bounds_a_busy_session():
+    flushes = Flushes()
+    debouncer = SessionDebouncer(flushes, window=0.1, max_wait=0.25)
+    started = time.monotonic()
+    while not flushes.done.is_set() and time.monotonic() - started < 2:
+        debouncer.submit("C1-1", "typing")
+        time.sleep(0.03)
+    assert flushes.done.is_set()
+    assert flushes.calls[0][2] - started < 0.5
+
+def test_flush_all_forwards_what_is_pending():
+    flushes = Flushes()
+    debouncer = SessionDebouncer(flushes, window=60, max_wait=60)
+    debouncer.submit("C1-1", "a")
+    debouncer.flush_all()
+    assert [(session, events) for session, events, _ in flushes.calls] == [("C1-1", ["a"])]
+    time.sleep(0.05)
+    assert len(flushes.calls) == 1
@@ -0,0 +1,83 @@
+import time
+import threading
+import digest
+from digest import DigestAggregator
+
+
+def message(channel, ts, text="hello"):
+    return {"type": "message", "channel": channel, "ts": ts, "user": "U1", "text": text}
+
+class Sent(list):
+    """A send() that records batches and lets a test wait for them."""
+
+    def __init__(self):
+        super().__init__()
+        self.cond = threading.Condition()
+
+    def __call__(self, batch):
+        with self.cond:
+            self.append(batch)
+            self.cond.notify_all()
+
+    def wait_for(self, count, timeout=5):
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self) >= count, timeout)
+
+
+def test_only_plain_messages_are_digested():
+    assert digest.wants(message("C1", "1.0"))
+    assert not digest.wants(dict(message("C1", "1.0"), subtype="message_changed"))
+    assert not digest.wants({"type": "app_mention", "text": "hi"})
+
+def test_tumbling_window_closes_when_full():
+    sent = Sent()
+    aggregator = DigestAggregator(sent, max_messages=3, max_seconds=60)
+    for i in range(4):
+        aggregator.add(message("C1", f"{i}.0"))
+    aggregator.add(message("C2", "9.0"))
+    assert sent.wait_for(1)
+    [batch] = sent
+    assert (batch["channel"], batch["count"], batch["first_ts"], batch["last_ts"]) == ("C1", 3, "0.0", "2.0")
+
+    assert aggregator.flush_all(timeout=5) == []
+    assert sorted((b["channel"], b["count"]) for b in sent[1:]) == [("C1", 1), ("C2", 1)]
+
+def test_tumbling_window_closes_with_age():
+    sent = Sent()
+    aggregator = DigestAggregator(sent, max_messages=100, max_seconds=0.2)
+    aggregator.add(message("C1", "1.0"))
+    assert sent.wait_for(1)
+    assert sent[0]["count"] == 1
+    aggregator.flush_all(timeout=5)
+
+def test_sliding_window_sends_the_latest_messages():
+    sent = Sent()
+    aggregator = DigestAggregator(sent, mode="sliding", max_messages=2, max_seconds=60, slide_seconds=0.2)
+    for i in range(3):
+        aggregator.add(message("C1", f"{i}.0"))
+    assert sent.wait_for(1)
+    assert [m["ts"] for m in sent[0]["messages"]] == ["1.0", "2.0"]
+    time.sleep(0.5)
+    assert len(sent) == 1  # nothing new arrived, nothing resent
+    aggregator.flush_all(timeout=5)
+
+def test_memory_cap_flushes_the_largest_channel_early():
+    sent = Sent()
+    aggregator = DigestAggregator(sent, max_messages=100, max_seconds=60, memory_cap=1000)
+    aggregator.add(message("C1", "1.0", "x" * 100))
+    aggregator.add(message("C2", "2.0", "y" * 900))
+    assert sent.wait_for(1)
+    assert sent[0]["channel"] == "C2"
+    aggregator.flush_all(timeout=5)
+
+def test_windows_that_miss_the_deadline_are_returned_for_the_spool():
+    release = threading.Event()
+    aggregator = DigestAggregator(lambda batch: release.wait(5), max_messages=1, max_seconds=60)
+    aggregator.add(message("C1", "1.0"))  # closes at once and blocks the sender
+    aggregator.add(message("C2", "2.0"))  # queued behind it
+    aggregator.max_messages = 100
+    aggregator.add(message("C3", "3.0"))
+
+    leftovers = aggregator.flush_all(timeout=0.1)
+    release.set()
+    assert [entry["digest"]["channel"] for entry in leftovers] == ["C3"]
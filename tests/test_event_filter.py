@@ -0,0 +1,39 @@
+import pytest
+from event_filter import EventFilter, DEFAULT_RULES
+
+SELF = ("UBOT", "BBOT")
+
+
+def test_default_rules_drop_noise_and_own_messages():
+    events = EventFilter(DEFAULT_RULES)
+    assert events.match({"type": "message", "user": "UBOT", "text": "hi"}, SELF) == ("drop", "own-messages")
+    assert events.match({"type": "message", "bot_id": "BOTHER", "text": "hi"}, SELF) == ("drop", "bot-messages")
+    assert events.match({"type": "message", "subtype": "channel_join", "user": "U1"}, SELF) == ("drop", "message-noise")
+    assert events.match({"type": "message", "user": "U1", "text": "hi"}, SELF) == ("allow", None)
+    assert events.match({"type": "app_mention", "user": "U1", "text": "<@UBOT> hi"}, SELF) == ("allow", None)
+
+def test_object_fields_never_match():
+    events = EventFilter(DEFAULT_RULES)
+    # user_change carries the whole user object; channel_created the whole channel
+    assert events.match({"type": "user_change", "user": {"id": "UBOT"}}, SELF) == ("allow", None)
+    rules = [{"action": "drop", "channel": "C1"}]
+    assert EventFilter(rules).match({"type": "channel_created", "channel": {"id": "C1"}}) == ("allow", None)
+
+def test_first_matching_rule_decides():
+    rules = [
+        {"name": "vip", "action": "allow", "channel": ["C1", "C2"], "text": "(?i)urgent"},
+        {"name": "rest", "action": "drop", "type": "message"},
+    ]
+    events = EventFilter(rules, default="allow")
+    assert events.match({"type": "message", "channel": "C2", "text": "URGENT: help"}) == ("allow", "vip")
+    assert events.match({"type": "message", "channel": "C2", "text": "lunch?"}) == ("drop", "rest")
+    assert events.match({"type": "reaction_added", "channel": "C2"}) == ("allow", None)
+
+def test_presence_checks():
+    events = EventFilter([{"name": "threaded", "action": "drop", "subtype": True}], default="allow")
+    assert events.match({"type": "message", "subtype": "bot_message"}) == ("drop", "threaded")
+    assert events.match({"type": "message"}) == ("allow", None)
+
+def test_unknown_action_is_rejected():
+    with pytest.raises(ValueError):
+        EventFilter([{"action": "ignore"}])
@@ -0,0 +1,36 @@
+import os
+import argparse
+import threading
+import pytest
+import metrics
+import ftbench
+
+
+def test_striped_counters_add_up_across_threads():
+    before = metrics.get("test_striped_total", bot="a")
+
+    def count():
+        for _ in range(1000):
+            metrics.inc("test_striped_total", bot="a")
+
+    threads = [threading.Thread(target=count) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.get("test_striped_total", bot="a") == before + 8000
+    assert 'test_striped_total{bot="a"}' in metrics.render()
+
+@pytest.mark.parametrize("no_bolt", [True, False])
+def test_each_event_is_forwarded_once_however_many_bots_see_it(no_bolt):
+    def run(bots):
+        args = argparse.Namespace(bots=bots, cores=len(os.sched_getaffinity(0)), events=200, text_size=50,
+                                  no_bolt=no_bolt)
+        return ftbench.work(args)
+
+    # Copies of channel messages are forwarded once between the bots; mentions are per bot
+    mentions = sum(body["event"]["type"] == "app_mention" for body in ftbench.event_stream(200))
+    alone, together = run(1), run(4)
+    assert together["events"] == 4 * alone["events"] == 800
+    assert together["forwarded"] == alone["forwarded"] + 3 * mentions
+    assert together["bolt"] is not no_bolt
@@ -0,0 +1,40 @@
+import geocoding
+from cache import PersistentTTLCache
+
+
+class CountingGeocoder(geocoding.Geocoder):
+    def __init__(self, answers, **kwargs):
+        super().__init__(PersistentTTLCache(":memory:", table="geocode"), min_interval=0, **kwargs)
+        self.answers = answers
+        self.fetched = []
+
+    def _fetch(self, location):
+        self.fetched.append(location)
+        return self.answers.get(location)
+
+
+def test_normalize_location():
+    assert geocoding.normalize_location("  New   York, NY! ") == "new york ny"
+
+def test_hits_are_cached():
+    geocoder = CountingGeocoder({"Paris": ("48.85", "2.35")})
+    assert geocoder.lookup("Paris") == ("48.85", "2.35")
+    assert geocoder.lookup("paris!") == ("48.85", "2.35")
+    assert geocoder.fetched == ["Paris"]
+
+def test_no_match_is_cached_briefly():
+    geocoder = CountingGeocoder({"Atlantis": ()}, negative_ttl=60)
+    assert geocoder.lookup("Atlantis") is None
+    assert geocoder.lookup("Atlantis") is None
+    assert geocoder.fetched == ["Atlantis"]
+
+    geocoder = CountingGeocoder({"Atlantis": ()}, negative_ttl=-1)
+    geocoder.lookup("Atlantis")
+    geocoder.lookup("Atlantis")
+    assert geocoder.fetched == ["Atlantis", "Atlantis"]
+
+def test_failed_requests_are_not_cached():
+    geocoder = CountingGeocoder({})
+    assert geocoder.lookup("Paris") is None
+    assert geocoder.lookup("Paris") is None
+    assert geocoder.fetched == ["Paris", "Paris"]
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from fakes import FakeLangflow
+import inflight
+from inflight import InflightRegistry
+
+
+async def answer_after(seconds, value="done"):
+    await asyncio.sleep(seconds)
+    return value
+
+class Results:
+    def __init__(self):
+        self.done = threading.Event()
+        self.results = []
+
+    def __call__(self, run, result):
+        self.results.append((run.generation, result))
+        self.done.set()
+
+
+def test_newer_run_supersedes_the_older_one():
+    runs, results = InflightRegistry(name="test"), Results()
+    first = runs.start("C1-1.0", "1.0", answer_after(5, "stale"), results)
+    second = runs.start("C1-1.0", "2.0", answer_after(0.01, "fresh"), results)
+    assert results.done.wait(5)
+    assert first.superseded == "newer" and first.future.cancelled()
+    assert results.results == [(second.generation, "fresh")]
+    assert runs.active() == 0
+
+def test_edit_supersedes_only_the_run_for_that_message():
+    runs, results = InflightRegistry(name="test"), Results()
+    run = runs.start("C1-1.0", ["1.0", "1.5"], answer_after(5), results)
+    assert runs.supersede("C1-1.0", "9.9", reason="edited") is None
+    assert runs.is_current(run)
+    assert runs.supersede("C1-1.0", "1.5", reason="edited") is run
+    assert not runs.is_current(run)
+    assert run.superseded == "edited"
+
+def test_is_current_is_false_once_a_newer_run_started():
+    runs = InflightRegistry(name="test")
+    run = runs.start("C1-1.0", "1.0", answer_after(0), lambda run, result: None)
+    run.future.result(5)
+    assert runs.is_current(run)
+    runs.start("C1-1.0", "2.0", answer_after(5), lambda run, result: None)
+    assert not runs.is_current(run)
+    runs.drain(0)
+
+def test_drain_spools_only_runs_langflow_never_received():
+    flow = FakeLangflow(latency="fixed:1").start()
+    try:
+        runs = InflightRegistry(name="test")
+        sent = threading.Event()
+        runs.start("C1-1.0", "1.0", inflight.post_json(flow.run_url(), {"n": 1}, {}, sent=sent),
+                   lambda run, result: None, payload={"n": 1}, sent=sent)
+        assert sent.wait(5)
+        never_sent = threading.Event()
+        runs.start("C2-1.0", "1.0", answer_after(5), lambda run, result: None, payload={"n": 2}, sent=never_sent)
+        assert runs.drain(0.1) == [{"n": 2}]
+    finally:
+        flow.stop()
@@ -0,0 +1,69 @@
+from routing import Router
+from ingest import IngestHub, dedup_key
+
+
+class Recorder:
+    """Destination stand-in that records what it was given."""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.sent = []
+
+    def submit(self, data, bot_name):
+        self.sent.append((bot_name, data))
+        return True
+
+
+def hub_with(**destinations_by_bot):
+    hub = IngestHub()
+    for bot_name, destinations in destinations_by_bot.items():
+        hub.register(bot_name, Router(bot_name, {d.name: d for d in destinations}, [{"to": [d.name for d in destinations]}],
+                                      explicit=False))
+    return hub
+
+def message(ts="1.000001", **fields):
+    return {"type": "message", "channel": "C1", "ts": ts, "user": "U1", "text": "hi", **fields}
+
+BODY = {"team_id": "T1"}
+
+
+def test_copies_sharing_a_flow_are_forwarded_once():
+    shared_a, shared_b = Recorder("flow", "http://flow"), Recorder("flow", "http://flow")
+    hub = hub_with(A=[shared_a], B=[shared_b])
+    assert hub.receive("A", BODY, message(), dict) == "dispatched"
+    assert hub.receive("B", BODY, message(), dict) == "duplicate"
+    assert len(shared_a.sent) == 1 and shared_b.sent == []
+    assert hub.report() == [("C1", 1, 1)]
+
+def test_each_bot_forwards_only_its_own_copy():
+    a, b_shared, b_own = Recorder("flow", "http://flow"), Recorder("flow", "http://flow"), Recorder("own", "http://own")
+    hub = hub_with(A=[a], B=[b_shared, b_own])
+    hub.receive("A", BODY, message(), dict)
+    assert hub.receive("B", BODY, message(), dict) == "dispatched"
+    assert [bot for bot, _ in a.sent] == ["A"]
+    assert b_shared.sent == [] and [bot for bot, _ in b_own.sent] == ["B"]
+    # A redelivery to B is a duplicate, not a second forward
+    assert hub.receive("B", BODY, message(), dict) == "duplicate"
+    assert len(b_own.sent) == 1
+
+def test_mentions_are_never_deduplicated():
+    a, b = Recorder("flow", "http://flow"), Recorder("flow", "http://flow")
+    hub = hub_with(A=[a], B=[b])
+    mention = message(type="app_mention")
+    assert hub.receive("A", BODY, mention, dict) == "dispatched"
+    assert hub.receive("B", BODY, mention, dict) == "dispatched"
+
+def test_claim_and_ttl():
+    hub = IngestHub(ttl=0)
+    assert hub.claim(BODY, message())
+    assert hub.claim(BODY, message())  # expired immediately
+    hub = IngestHub()
+    assert hub.claim(BODY, message()) and not hub.claim(BODY, message())
+
+def test_dedup_key():
+    assert dedup_key(BODY, message()) == ("T1", "C1", "1.000001", "message", "")
+    assert dedup_key(BODY, message(subtype="message_changed"))[-1] == "message_changed"
+    # Payloads without an event are keyed on their own id, never on each other
+    assert dedup_key({"trigger_id": "X1"}, {}) == ("payload", "X1")
+    assert dedup_key({}, {}) != dedup_key({}, {})
@@ -0,0 +1,51 @@
+import json
+import logging
+import pytest
+import intent_classifier
+from intent_classifier import NaiveBayes, IntentClassifier
+
+SAMPLES = [
+    ("what's the weather in denver tomorrow", "weather"),
+    ("will it rain in boston today", "weather"),
+    ("forecast for seattle this weekend", "weather"),
+    ("how hot is it in austin", "weather"),
+    ("tell me a joke", "chat"),
+    ("write a poem about cats", "chat"),
+    ("how do i reset my password", "chat"),
+    ("explain recursion to me", "chat"),
+]
+
+
+@pytest.fixture
+def reset_classifier(monkeypatch):
+    monkeypatch.setattr(intent_classifier, "_classifier", None)
+    monkeypatch.setattr(intent_classifier, "_loaded", False)
+
+def test_extract_locations():
+    assert intent_classifier.extract_locations("weather in denver, boston and austin") == ["Denver", "Boston", "Austin"]
+    assert intent_classifier.extract_locations("weather in sf") is None
+
+def test_confident_answers_only():
+    classifier = IntentClassifier(NaiveBayes.train(SAMPLES), threshold=0.5)
+    assert classifier.classify("will it rain in denver tomorrow")["locations"] == ["Denver"]
+    assert classifier.classify("tell me a joke about cats") == {"intent": "chat"}
+    assert IntentClassifier(NaiveBayes.train(SAMPLES), threshold=1.01).classify("tell me a joke") is None
+    assert IntentClassifier().classify("tell me a joke") is None
+
+def test_model_round_trips_through_json(tmp_path):
+    model = NaiveBayes.train(SAMPLES)
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps(model.to_dict()))
+    assert NaiveBayes.load(str(path)).predict("tell me a joke") == model.predict("tell me a joke")
+
+def test_failed_load_is_remembered(monkeypatch, tmp_path, caplog, reset_classifier):
+    monkeypatch.setenv("INTENT_MODEL_PATH", str(tmp_path / "missing.json"))
+    with caplog.at_level(logging.ERROR):
+        assert intent_classifier.get_classifier() is None
+        assert intent_classifier.get_classifier() is None
+    assert len(caplog.records) == 1
+
+def test_unset_path_is_remembered(monkeypatch, reset_classifier):
+    monkeypatch.delenv("INTENT_MODEL_PATH", raising=False)
+    assert intent_classifier.get_classifier() is None
+    assert intent_classifier._loaded
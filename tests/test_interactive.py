@@ -0,0 +1,96 @@
+import time
+import pytest
+from slack_sdk import WebClient
+from slack_sdk.socket_mode.request import SocketModeRequest
+from fakes import FakeSlack, FakeLangflow
+import interactive
+
+
+@pytest.fixture(scope="module")
+def slack():
+    server = FakeSlack().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def make_dispatcher(slack):
+    servers, dispatchers = [], []
+
+    def make(error_rate=0.0, **kwargs):
+        flow = FakeLangflow(latency="fixed:0.01", error_rate=error_rate).start()
+        servers.append(flow)
+        dispatcher = interactive.Dispatcher("bot", flow.run_url(), WebClient(token="xoxb-test", base_url=slack.api_url),
+                                            on_event=lambda payload: None, **kwargs)
+        dispatchers.append(dispatcher)
+        return dispatcher
+
+    yield make
+    for dispatcher in dispatchers:
+        dispatcher.drain(5)
+    for server in servers:
+        server.stop()
+
+class SocketClient:
+    def __init__(self):
+        self.acks = []
+
+    def send_socket_mode_response(self, response):
+        self.acks.append(response)
+
+def slash_command(slack, key):
+    return SocketModeRequest(type="slash_commands", envelope_id=f"env-{key}", payload={
+        "command": "/ask", "text": "hello", "user_id": "U1", "channel_id": "C1", "response_url": slack.response_url(key),
+    })
+
+def responses_for(slack, key, count=1, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        found = [body for k, body in slack.responses if k == key]
+        if len(found) >= count:
+            return found
+        time.sleep(0.01)
+    return [body for k, body in slack.responses if k == key]
+
+
+def test_request_kind():
+    assert interactive.request_kind("events_api", {}) == "events"
+    assert interactive.request_kind("interactive", {"type": "message_action"}) == "shortcuts"
+    assert interactive.request_kind("interactive", {"type": "block_suggestion"}) is None
+
+def test_slash_command_is_acked_then_answered(slack, make_dispatcher):
+    client = SocketClient()
+    make_dispatcher().handle(client, slash_command(slack, "answered"))
+    [ack] = client.acks
+    assert ack.envelope_id == "env-answered"
+    assert ack.payload == {"response_type": "ephemeral", "text": "Working…"}
+    [response] = responses_for(slack, "answered")
+    assert response["replace_original"] is True
+    assert response["text"] != "Sorry, something went wrong. Please try again."
+
+def test_failed_flow_tells_the_user(slack, make_dispatcher):
+    make_dispatcher(error_rate=1.0, error_text="That didn't work").handle(SocketClient(), slash_command(slack, "failed"))
+    [response] = responses_for(slack, "failed")
+    assert response == {"response_type": "ephemeral", "text": "That didn't work", "replace_original": True}
+
+def test_block_actions_get_no_interim_post(slack, make_dispatcher):
+    request = SocketModeRequest(type="interactive", envelope_id="env-click", payload={
+        "type": "block_actions", "user": {"id": "U1"}, "channel": {"id": "C1"},
+        "actions": [{"action_id": "approve", "value": "yes"}], "response_url": slack.response_url("click"),
+    })
+    client = SocketClient()
+    make_dispatcher().handle(client, request)
+    assert client.acks[0].payload is None
+    [response] = responses_for(slack, "click")
+    assert response["replace_original"] is False
+
+def test_draining_dispatcher_stops_acking(slack, make_dispatcher):
+    dispatcher = make_dispatcher()
+    assert dispatcher.drain(1) == []
+    client = SocketClient()
+    dispatcher.handle(client, slash_command(slack, "late"))
+    assert client.acks == []
+
+def test_pool_sizes():
+    assert interactive.pool_sizes("block_actions=8, events=2") == {"block_actions": 8, "events": 2}
+    with pytest.raises(ValueError):
+        interactive.pool_sizes("buttons=3")
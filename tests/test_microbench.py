@@ -0,0 +1,33 @@
+import io
+import microbench
+
+
+def results(**stages):
+    return {"results": {key: {"ns_per_op": ns, "peak_bytes_per_op": peak} for key, (ns, peak) in stages.items()}}
+
+def test_compare_gates_time_and_memory():
+    baseline = results(fast=(1000, 10_000), lean=(1000, 10_000), noisy=(1000, 100), gone=(1000, 0))
+    current = results(fast=(1200, 10_000), lean=(1000, 12_000), noisy=(1000, 300))
+    rows, regressions = microbench.compare(baseline, current, threshold=10, alloc_threshold=10)
+    assert regressions == ["fast", "lean"]
+    assert [row[0] for row in rows] == ["fast", "lean", "noisy"]
+
+def test_old_result_files_are_still_comparable():
+    baseline = {"results": {"stage": {"ns_per_op": 1000, "alloc_bytes_per_op": 10_000}}}
+    _, regressions = microbench.compare(baseline, results(stage=(1000, 10_500)), threshold=10)
+    assert regressions == []
+
+def test_every_stage_runs_against_the_bolt_app():
+    app = microbench.build_bolt_app()
+    sink = io.StringIO()
+    for body in microbench.synthetic_payloads().values():
+        stages = microbench.stages_for(body, app, sink)
+        assert {"json_dumps", "data_build", "bolt_dispatch", "log_everything"} <= set(stages)
+        for fn in stages.values():
+            fn()
+    assert "Incoming payload" in sink.getvalue()
+
+def test_measure_reports_time_and_peak_memory():
+    result = microbench.measure(lambda: bytearray(100_000), repeat=1)
+    assert result["ns_per_op"] > 0
+    assert result["peak_bytes_per_op"] >= 100_000
@@ -0,0 +1,48 @@
+import hmac
+import json
+import hashlib
+from passthrough import verify, routing_header
+
+SECRET = b"8f742231b10e8888abcd99yyyzzz85a5"
+NOW = 1_700_000_000
+
+
+def sign(body, timestamp=NOW, secret=SECRET):
+    base = f"v0:{timestamp}:".encode() + body
+    return "v0=" + hmac.new(secret, base, hashlib.sha256).hexdigest()
+
+def envelope(event, **fields):
+    return json.dumps({"token": "x", "team_id": "T1", "type": "event_callback", "event": event,
+                       "event_id": "Ev1", **fields}).encode()
+
+
+def test_verify():
+    body = envelope({"type": "app_mention", "text": "hi"})
+    assert verify(SECRET, str(NOW), sign(body), body, now=NOW)
+    assert not verify(SECRET, str(NOW), sign(body), body + b" ", now=NOW)
+    assert not verify(SECRET, str(NOW), sign(body, secret=b"other"), body, now=NOW)
+    assert not verify(SECRET, str(NOW - 301), sign(body, NOW - 301), body, now=NOW)
+    assert not verify(SECRET, "not-a-number", sign(body), body, now=NOW)
+    assert not verify(SECRET, None, None, body, now=NOW)
+
+def test_routing_header_scans_the_common_layout():
+    body = envelope({"type": "app_mention", "channel": "C1", "text": 'quote "subtype": "x"'})
+    assert routing_header(body) == {"envelope_type": "event_callback", "event_id": "Ev1", "type": "app_mention",
+                                    "channel": "C1", "subtype": ""}
+
+def test_routing_header_takes_the_event_subtype():
+    body = envelope({"type": "message", "subtype": "message_changed", "channel": "C1",
+                     "message": {"subtype": "bot_message"}, "previous_message": {"text": "x"}})
+    header = routing_header(body)
+    assert (header["type"], header["subtype"], header["channel"]) == ("message", "message_changed", "C1")
+
+def test_routing_header_falls_back_for_other_layouts():
+    # "type" not first in the event object, and a reaction's channel under "item"
+    body = json.dumps({"type": "event_callback", "event_id": "Ev2",
+                       "event": {"user": "U1", "type": "reaction_added", "item": {"channel": "C3"}}}).encode()
+    assert routing_header(body) == {"envelope_type": "event_callback", "event_id": "Ev2", "type": "reaction_added",
+                                    "channel": "C3", "subtype": ""}
+
+def test_routing_header_url_verification():
+    header = routing_header(json.dumps({"type": "url_verification", "challenge": "abc"}).encode())
+    assert header["envelope_type"] == "url_verification"
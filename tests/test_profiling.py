@@ -0,0 +1,75 @@
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import profiling
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not profiling.handle_admin_request(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"OK")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+def get(url, token=None):
+    request = urllib.request.Request(url, headers={"X-Admin-Token": token} if token else {})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+
+def test_debug_endpoints_do_not_exist_without_a_token(server, monkeypatch):
+    monkeypatch.delenv("PROFILING_TOKEN", raising=False)
+    assert get(f"{server}/debug/memory/start", token="anything") == (404, "Not Found\n")
+    assert get(f"{server}/health")[0] == 200
+
+def test_wrong_token_is_rejected(server, monkeypatch):
+    monkeypatch.setenv("PROFILING_TOKEN", "s3cret")
+    assert get(f"{server}/debug/memory/start")[0] == 401
+    assert get(f"{server}/debug/memory/start", token="s3cre")[0] == 401
+
+def test_cpu_profile_sees_busy_threads(server, monkeypatch):
+    monkeypatch.setenv("PROFILING_TOKEN", "s3cret")
+    stop = threading.Event()
+
+    def spin_for_the_profiler():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=spin_for_the_profiler, name="busy")
+    worker.start()
+    try:
+        status, body = get(f"{server}/debug/profile/cpu?seconds=0.3&hz=0", token="s3cret")
+    finally:
+        stop.set()
+        worker.join()
+    assert status == 200
+    assert any(line.startswith("busy;") and "spin_for_the_profiler" in line for line in body.splitlines())
+
+def test_bad_parameters_are_a_400(server, monkeypatch):
+    monkeypatch.setenv("PROFILING_TOKEN", "s3cret")
+    assert get(f"{server}/debug/profile/cpu?seconds=soon", token="s3cret")[0] == 400
+
+def test_memory_diff_needs_a_baseline(server, monkeypatch):
+    monkeypatch.setenv("PROFILING_TOKEN", "s3cret")
+    assert get(f"{server}/debug/memory/diff", token="s3cret")[0] == 409
+    assert get(f"{server}/debug/memory/start?frames=5", token="s3cret")[0] == 200
+    try:
+        status, body = get(f"{server}/debug/memory/diff?limit=3", token="s3cret")
+        assert status == 200 and body.startswith("top 3 allocation sites")
+    finally:
+        assert get(f"{server}/debug/memory/stop", token="s3cret") == (200, "tracing stopped\n")
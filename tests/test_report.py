@@ -0,0 +1,63 @@
+import os
+import glob
+import time
+import archive
+import report
+
+
+def write_archive(root, rows):
+    archiver = archive.Archiver(root)
+    for row in rows:
+        archiver.record(row)
+    archiver.close()
+
+def event_row(bot, channel, duplicate=False, handler_us=100.0):
+    body = {"type": "event_callback", "event_time": time.time() - 0.05}
+    event = {"type": "message", "channel": channel, "user": "U1", "ts": "1.000001", "text": "hi"}
+    return archive.row_for(bot, body, event, "duplicate" if duplicate else "dispatched",
+                           duplicate=duplicate, ingest_us=10.0, handler_us=handler_us)
+
+
+def test_archive_round_trip(tmp_path):
+    root = str(tmp_path)
+    write_archive(root, [
+        event_row("A", "C1"), event_row("A", "C1", duplicate=True), event_row("B", "C2"),
+        archive.forward_row("A", "chat", "ok", 200, 120.0), archive.forward_row("A", "chat", "error", 500, 80.0),
+    ])
+
+    df = report.load(root)
+    assert len(df) == 5
+    assert set(df["bot"]) == {"A", "B"}
+    assert len(report.load(root, bots=["B"])) == 1
+
+    sections = report.analyze(df)
+    summary = sections["Summary"]["value"]
+    assert summary["events"] == 3 and summary["forward requests"] == 2
+    duplicates = sections["Duplicates by channel"]
+    assert duplicates.loc["C1", "duplicates"] == 1
+    errors = sections["Langflow errors"]
+    assert errors.loc[("A", "chat"), "failure %"] == 50
+    assert ("handler (µs)", "A") in sections["Latency by stage"].index
+
+    markdown = report.render(sections, "Test report", "markdown")
+    assert markdown.startswith("# Test report") and "## Langflow errors" in markdown
+    assert "<h2>Summary</h2>" in report.render(sections, "Test report", "html")
+
+def test_date_range_skips_other_partitions(tmp_path):
+    root = str(tmp_path)
+    write_archive(root, [event_row("A", "C1")])
+    assert len(report.load(root, start="2000-01-01", end="2000-01-31")) == 0
+
+def test_truncated_parts_are_skipped(tmp_path, caplog):
+    root = str(tmp_path)
+    write_archive(root, [event_row("A", "C1"), event_row("A", "C2")])
+    [good] = glob.glob(os.path.join(root, "**", "part-*.parquet"), recursive=True)
+    # What a crash mid-write used to leave behind: a part without its footer
+    with open(good, "rb") as f:
+        data = f.read()
+    with open(os.path.join(os.path.dirname(good), "part-crashed-0000.parquet"), "wb") as f:
+        f.write(data[: len(data) // 2])
+
+    df = report.load(root)
+    assert len(df) == 2
+    assert "Skipping unreadable archive file" in caplog.text
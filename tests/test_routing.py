@@ -0,0 +1,68 @@
+import time
+import pytest
+from fakes import FakeLangflow
+from routing import Destination, Router, event_channel
+
+
+def router_for(routes):
+    destinations = {name: Destination(name, f"http://127.0.0.1:9/{name}") for name in ("chat", "analytics", "edits")}
+    return Router("Bot", destinations, routes)
+
+def names(destinations):
+    return [d.name for d in destinations]
+
+
+def test_lookup_matches_exact_and_wildcard_fields():
+    router = router_for([
+        {"type": "app_mention", "to": ["chat", "analytics"]},
+        {"type": "message", "channel": "C1", "to": ["analytics"]},
+        {"type": "message", "subtype": "message_changed", "to": ["edits"]},
+        {"type": "message", "subtype": "", "to": ["chat"]},
+    ])
+    assert names(router.lookup({"type": "app_mention", "channel": "C9"})) == ["chat", "analytics"]
+    assert names(router.lookup({"type": "message", "channel": "C1"})) == ["analytics", "chat"]  # most specific first
+    assert names(router.lookup({"type": "message", "channel": "C2", "subtype": "message_changed"})) == ["edits"]
+    assert names(router.lookup({"type": "reaction_added", "item": {"channel": "C1"}})) == []
+
+def test_unknown_destination_is_rejected():
+    with pytest.raises(ValueError):
+        router_for([{"to": ["nowhere"]}])
+
+def test_event_channel_reads_reaction_items():
+    assert event_channel({"item": {"channel": "C7"}}) == "C7"
+    assert event_channel({"type": "team_join"}) == ""
+
+def test_route_posts_to_each_matching_destination():
+    flow = FakeLangflow().start()
+    try:
+        destinations = {name: Destination(name, flow.run_url()) for name in ("chat", "analytics")}
+        router = Router("Bot", destinations, [{"type": "app_mention", "to": ["chat", "analytics"]}])
+        assert router.route({"type": "app_mention"}, {"input_value": "hi"}) == 2
+        assert router.route({"type": "message"}, {"input_value": "hi"}) == 0
+        deadline = time.monotonic() + 5
+        while flow.requests < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert flow.requests == 2
+    finally:
+        flow.stop()
+
+def test_drain_returns_unstarted_forwards_for_replay():
+    flow = FakeLangflow(latency="fixed:0.3").start()
+    try:
+        router = Router("Bot", {"chat": Destination("chat", flow.run_url(), concurrency=1)}, [{"to": ["chat"]}])
+        router.route({"type": "message"}, {"n": 1})
+        router.route({"type": "message"}, b'{"n": 2}')
+        time.sleep(0.1)
+        spooled = router.drain(2)
+        assert spooled == [{"bot": "Bot", "destination": "chat", "body": '{"n": 2}'}]
+        assert flow.requests == 1
+        assert router.route({"type": "message"}, {"n": 3}) == 0  # nothing new once draining
+
+        fresh = Router("Bot", {"chat": Destination("chat", flow.run_url())}, [{"to": ["chat"]}])
+        assert fresh.replay(spooled[0])
+        deadline = time.monotonic() + 5
+        while flow.requests < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert flow.requests == 2
+    finally:
+        flow.stop()
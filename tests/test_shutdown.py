@@ -0,0 +1,90 @@
+import os
+import time
+import threading
+import shutdown
+from shutdown import ShutdownCoordinator, SpoolingExecutor
+
+
+class Handler:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+def test_envelopes_are_refused_while_draining():
+    coordinator = ShutdownCoordinator("bot")
+    reject = coordinator.middleware()
+    assert reject(next=lambda: "handled") == "handled"
+    coordinator.draining.set()
+    assert reject(next=lambda: "handled").status == 503
+
+def test_drains_run_in_order_within_one_deadline(tmp_path):
+    coordinator = ShutdownCoordinator("bot", deadline=1.0, spool_dir=str(tmp_path))
+    handler = Handler()
+    coordinator.add_handler(handler)
+    calls = []
+
+    def slow(timeout):
+        calls.append(("slow", timeout))
+        time.sleep(0.3)
+        return [{"n": 1}]
+
+    coordinator.add_drain("slow", slow)
+    coordinator.add_drain("fast", lambda timeout: calls.append(("fast", timeout)) or [{"n": 2}])
+    coordinator.add_drain("broken", lambda timeout: 1 / 0)
+    coordinator.drain()
+    coordinator.wait()
+
+    assert [label for label, _ in calls] == ["slow", "fast"]
+    assert calls[0][1] <= 1.0 and calls[1][1] <= 0.75
+    assert handler.closed.is_set()
+    [spooled] = os.listdir(tmp_path)
+    assert spooled.startswith("bot-")
+
+    replayed = []
+    assert shutdown.replay_spool(str(tmp_path), "bot", replayed.append) == 2
+    assert replayed == [{"n": 1}, {"n": 2}]
+    assert os.listdir(tmp_path) == []
+    assert shutdown.replay_spool(str(tmp_path), "bot", replayed.append) == 0
+
+def test_tracked_forwards_that_outlive_the_deadline_are_spooled(tmp_path):
+    coordinator = ShutdownCoordinator("bot", deadline=0.1, spool_dir=str(tmp_path))
+    inside, release = threading.Event(), threading.Event()
+
+    def forward():
+        with coordinator.track({"data": "slow"}):
+            inside.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=forward)
+    worker.start()
+    inside.wait(5)
+    coordinator.drain()
+    release.set()
+    worker.join()
+
+    replayed = []
+    shutdown.replay_spool(str(tmp_path), "bot", replayed.append)
+    assert replayed == [{"data": "slow"}]
+
+def test_spool_files_of_other_bots_are_left_alone(tmp_path):
+    ShutdownCoordinator("other", spool_dir=str(tmp_path)).spool([{"n": 1}])
+    assert shutdown.replay_spool(str(tmp_path), "bot", lambda entry: None) == 0
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_executor_hands_back_jobs_that_never_started():
+    executor = SpoolingExecutor(1)
+    started, release = threading.Event(), threading.Event()
+    done = []
+    executor.submit({"job": 1}, lambda: (started.set(), release.wait(5), done.append(1)))
+    executor.submit({"job": 2}, done.append, 2)
+    started.wait(5)
+
+    assert executor.stop() == [{"job": 2}]
+    assert not executor.submit({"job": 3}, done.append, 3)
+    assert not executor.wait(0.05)
+    release.set()
+    assert executor.wait(5)
+    assert done == [1]
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import pytest
+import weather
+from fakes import FakeNWS
+from cache import PersistentTTLCache
+from weather import WeatherClient, forecast_expiry, select_period
+
+PACIFIC = timezone(timedelta(hours=-7))
+
+
+def forecast(start=datetime(2026, 10, 19, 6, tzinfo=PACIFIC), count=6):
+    """Alternating day/night periods from 6am Monday, the way NWS names them."""
+    periods = []
+    for i in range(count):
+        begins = start + timedelta(hours=12 * i)
+        daytime = i % 2 == 0
+        name = ("Today" if daytime else "Tonight") if i < 2 else begins.strftime("%A") + ("" if daytime else " Night")
+        periods.append({
+            "name": name, "isDaytime": daytime, "startTime": begins.isoformat(),
+            "endTime": (begins + timedelta(hours=12)).isoformat(), "temperature": 60 + i,
+            "temperatureUnit": "F", "windSpeed": "5 mph", "windDirection": "W", "shortForecast": "Sunny",
+        })
+    return periods
+
+@pytest.fixture
+def nws(monkeypatch):
+    server = FakeNWS(forecast()).start()
+    monkeypatch.setattr(weather, "NWS_BASE_URL", server.base_url)
+    yield server
+    server.stop()
+
+def make_client(**kwargs):
+    return WeatherClient(PersistentTTLCache(":memory:", table="nws_grid"), **kwargs)
+
+
+@pytest.mark.parametrize("phrase, name", [
+    ("today", "Today"),
+    ("tonight", "Tonight"),
+    ("tomorrow", "Tuesday"),
+    ("tomorrow night", "Tuesday Night"),
+    ("wednesday", "Wednesday"),
+    ("this weekend", "Today"),  # beyond the forecast: the first period
+    ("Tuesday Night", "Tuesday Night"),
+    (None, "Today"),
+])
+def test_select_period(phrase, name):
+    now = datetime(2026, 10, 19, 9, tzinfo=PACIFIC)
+    assert select_period(forecast(), phrase, now=now)["name"] == name
+
+def test_select_period_now_uses_the_current_period():
+    now = datetime(2026, 10, 19, 20, tzinfo=PACIFIC)
+    assert select_period(forecast(), "now", now=now)["name"] == "Tonight"
+    assert select_period([], "now") is None
+
+def test_forecast_expiry():
+    now = 1000.0
+    assert forecast_expiry({"Cache-Control": "public, max-age=300"}, now) == 1300.0
+    assert forecast_expiry({"Cache-Control": "no-cache, max-age=300"}, now) == now
+    assert forecast_expiry({
+        "Expires": "Mon, 19 Oct 2026 12:10:00 GMT", "Date": "Mon, 19 Oct 2026 12:00:00 GMT",
+    }, now) == 1600.0
+    assert forecast_expiry({}, now) == now + weather.DEFAULT_FORECAST_TTL
+
+def test_nearby_places_share_a_grid_lookup(nws):
+    client = make_client()
+    assert client.forecast_url("32.74811", "-117.13130") == client.forecast_url("32.7479", "-117.1311")
+    assert [path for path, _ in nws.requests] == ["/points/32.75,-117.13"]
+
+def test_forecasts_are_cached_then_revalidated(nws):
+    client = make_client()
+    url = client.forecast_url("32.75", "-117.13")
+    assert client.forecast_periods(url) == nws.periods
+    assert client.forecast_periods(url) == nws.periods
+    assert len(nws.requests) == 2  # points + one forecast
+
+    nws.max_age = 0
+    client._forecasts.clear()
+    client.forecast_periods(url)
+    client.forecast_periods(url)
+    assert nws.requests[-2][1] is None
+    assert nws.requests[-1][1] is not None  # a conditional GET, answered with 304
+    assert client.forecast_periods(url) == nws.periods
+
+def test_stale_forecast_is_served_when_nws_fails(nws):
+    nws.max_age = 0
+    client = make_client()
+    url = client.forecast_url("32.75", "-117.13")
+    periods = client.forecast_periods(url)
+    nws.status = 503
+    assert client.forecast_periods(url) == periods
+    assert make_client().forecast_periods(url) is None
+
+def test_concurrent_lookups_respect_the_host_limit(nws):
+    nws.latency = 0.05
+    client = make_client(max_concurrency=2)
+    places = [(32.75 + i, -117.13) for i in range(6)]
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        periods = list(pool.map(lambda place: client.get_forecast(*place, "tonight"), places))
+    assert [p["name"] for p in periods] == ["Tonight"] * 6
+    assert nws.peak == 2